@@ -0,0 +1,75 @@
+from functools import partial
+
+from django.conf import settings
+from django.contrib import admin
+from django.core.paginator import Paginator
+from django.db import transaction
+from django.db.models import ForeignKey
+from django.forms import ModelChoiceField
+from django.utils.functional import cached_property
+
+from core.db import estimate_count, pk_chunks
+
+
+class EstimatedCountPaginator(Paginator):
+    """Пагинатор, который не считает большие таблицы целиком.
+
+    Для нефильтрованного списка берётся оценка числа строк; точный
+    COUNT(*) выполняется, только если таблица меньше
+    ADMIN_COUNT_ESTIMATE_THRESHOLD или к списку применён фильтр.
+    """
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if not queryset.query.where:
+            estimate = estimate_count(queryset.model, queryset.db)
+            if estimate > settings.ADMIN_COUNT_ESTIMATE_THRESHOLD:
+                return estimate
+        return super().count
+
+
+class CachedChoicesFormSetMixin:
+    """Строит варианты выбора внешних ключей один раз на весь формсет."""
+
+    def __init__(self, *args, **kwargs):
+        self.cached_choices = {}
+        super().__init__(*args, **kwargs)
+
+    def _construct_form(self, i, **kwargs):
+        form = super()._construct_form(i, **kwargs)
+        for name, field in form.fields.items():
+            if isinstance(field, ModelChoiceField):
+                if name not in self.cached_choices:
+                    self.cached_choices[name] = list(field.choices)
+                field.choices = self.cached_choices[name]
+        return form
+
+
+class LargeTableAdmin(admin.ModelAdmin):
+    """Список объектов, который остаётся быстрым на миллионах строк.
+
+    Не считает таблицу целиком, а в редактируемых колонках показывает
+    обычный список выбора, общий для всех строк страницы. Массовое
+    удаление идёт порциями, каждая в своей транзакции.
+    """
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    def changelist_formfield(self, db_field, request, **kwargs):
+        # Автодополнение в каждой строке стоило бы запроса на строку.
+        if isinstance(db_field, ForeignKey):
+            return db_field.formfield(**kwargs)
+        return self.formfield_for_dbfield(db_field, request, **kwargs)
+
+    def get_changelist_formset(self, request, **kwargs):
+        kwargs.setdefault('formfield_callback',
+                          partial(self.changelist_formfield, request=request))
+        formset = super().get_changelist_formset(request, **kwargs)
+        return type(formset.__name__,
+                    (CachedChoicesFormSetMixin, formset), {})
+
+    def delete_queryset(self, request, queryset):
+        for chunk in pk_chunks(queryset):
+            with transaction.atomic():
+                self.model._default_manager.filter(pk__in=chunk).delete()
@@ -1,5 +1,12 @@
 from django.apps import AppConfig
+from django.db.backends.signals import connection_created
 
 
 class CoreConfig(AppConfig):
     name = 'core'
+
+    def ready(self):
+        from core.db import configure_sqlite
+        from core.slow_queries import install_slow_query_log
+        connection_created.connect(configure_sqlite)
+        connection_created.connect(install_slow_query_log)
@@ -0,0 +1,110 @@
+import functools
+import random
+import time
+
+from django.conf import settings
+from django.db import OperationalError, connections, transaction
+from django.db.models import Max
+
+
+def sqlite_pragmas():
+    """PRAGMA-настройки, с которыми открывается каждое соединение SQLite."""
+    return (
+        ('journal_mode', 'WAL'),
+        ('synchronous', 'NORMAL'),
+        ('busy_timeout', settings.SQLITE_BUSY_TIMEOUT),
+        ('temp_store', 'MEMORY'),
+        ('cache_size', settings.SQLITE_CACHE_SIZE),
+    )
+
+
+def apply_pragmas(cursor, pragmas):
+    for name, value in pragmas:
+        cursor.execute(f'PRAGMA {name} = {value}')
+
+
+def configure_sqlite(sender, connection, **kwargs):
+    """Включает WAL и настраивает новое соединение с SQLite.
+
+    В режиме WAL читатели не блокируют писателя, а busy_timeout
+    заставляет SQLite ждать освобождения блокировки вместо мгновенной
+    ошибки «database is locked».
+    """
+    if connection.vendor != 'sqlite':
+        return
+    if connection.settings_dict['NAME'] in ('', ':memory:') or (
+            'mode=memory' in connection.settings_dict['NAME']):
+        return
+    with connection.cursor() as cursor:
+        apply_pragmas(cursor, sqlite_pragmas())
+
+
+def is_locked_error(error):
+    return 'locked' in str(error) or 'busy' in str(error)
+
+
+def retry_on_locked(func):
+    """Выполняет функцию в транзакции и повторяет её при блокировке базы.
+
+    Число попыток ограничено DB_WRITE_RETRIES, между попытками
+    выдерживается экспоненциально растущая пауза со случайным разбросом.
+    """
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        delay = settings.DB_WRITE_BACKOFF
+        for attempt in range(settings.DB_WRITE_RETRIES):
+            try:
+                with transaction.atomic():
+                    return func(*args, **kwargs)
+            except OperationalError as error:
+                if (not is_locked_error(error)
+                        or attempt == settings.DB_WRITE_RETRIES - 1
+                        or transaction.get_connection().in_atomic_block):
+                    raise
+            time.sleep(delay * (1 + random.random()))
+            delay *= 2
+    return wrapper
+
+
+def estimate_count(model, using='default'):
+    """Приблизительное число строк таблицы без полного COUNT(*).
+
+    PostgreSQL хранит оценку в pg_class, SQLite — в sqlite_stat1 после
+    ANALYZE; если статистики нет, берётся наибольший первичный ключ.
+    """
+    connection = connections[using]
+    table = model._meta.db_table
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute(
+                'SELECT reltuples FROM pg_class WHERE relname = %s', [table])
+            row = cursor.fetchone()
+            if row and row[0] > 0:
+                return int(row[0])
+        elif connection.vendor == 'sqlite':
+            cursor.execute("SELECT 1 FROM sqlite_master "
+                           "WHERE type = 'table' AND name = 'sqlite_stat1'")
+            if cursor.fetchone():
+                cursor.execute(
+                    'SELECT stat FROM sqlite_stat1 WHERE tbl = %s LIMIT 1',
+                    [table])
+                row = cursor.fetchone()
+                if row:
+                    return int(row[0].split()[0])
+    return model._default_manager.using(using).aggregate(
+        Max('pk'))['pk__max'] or 0
+
+
+def pk_chunks(queryset, size=None):
+    """Первичные ключи выборки списками по BULK_CHUNK_SIZE.
+
+    Порции выбираются по ключу, а не через OFFSET, поэтому каждая стоит
+    одного индексного запроса, даже если строки первых порций уже
+    изменились или удалены.
+    """
+    size = size or settings.BULK_CHUNK_SIZE
+    pks = queryset.order_by('pk').values_list('pk', flat=True)
+    chunk = list(pks[:size])
+    while chunk:
+        yield chunk
+        chunk = list(pks.filter(pk__gt=chunk[-1])[:size])
@@ -0,0 +1,73 @@
+import re
+from urllib.parse import quote, unquote
+
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+HOLE_RE = re.compile(r'<!--hole:(\w+)((?::[^:>]*)*)-->')
+
+_fragments = {}
+_prefetchers = {}
+
+
+def fragment(name, prefetch=None):
+    """Регистрирует функцию, которая рендерит персональный фрагмент.
+
+    Функция получает запрос и строковые аргументы из заглушки.
+    prefetch(request, args_list) fill_holes вызывает один раз со
+    списком аргументов всех заглушек фрагмента на странице, чтобы
+    данные для них загрузились одним запросом.
+    """
+    def decorator(func):
+        _fragments[name] = func
+        if prefetch is not None:
+            _prefetchers[name] = prefetch
+        return func
+    return decorator
+
+
+def placeholder(name, *args):
+    return mark_safe(
+        f'<!--hole:{name}'
+        + ''.join(f':{quote(str(arg), safe="")}' for arg in args)
+        + '-->'
+    )
+
+
+def render_hole(request, name, *args):
+    """Фрагмент для текущего пользователя или заглушка на его месте.
+
+    Заглушки ставятся, когда страница рендерится для общего кеша
+    (request.punch_holes), и заполняются потом через fill_holes.
+    """
+    if getattr(request, 'punch_holes', False):
+        return placeholder(name, *args)
+    return mark_safe(_fragments[name](request, *args))
+
+
+def fill_holes(request, content):
+    """Подставляет в общую страницу фрагменты текущего пользователя."""
+    rendered = {}
+    prefetch = {}
+    for match in HOLE_RE.finditer(content):
+        if match.group(1) in _prefetchers:
+            prefetch.setdefault(match.group(1), []).append(
+                [unquote(arg) for arg in match.group(2).split(':')[1:]])
+    for name, args_list in prefetch.items():
+        _prefetchers[name](request, args_list)
+
+    def replace(match):
+        if match.group(0) not in rendered:
+            args = [unquote(arg) for arg in match.group(2).split(':')[1:]]
+            rendered[match.group(0)] = str(
+                _fragments[match.group(1)](request, *args)
+            )
+        return rendered[match.group(0)]
+
+    return HOLE_RE.sub(replace, content)
+
+
+@fragment('nav')
+def nav(request, view_name):
+    return render_to_string('includes/nav_user.html',
+                            {'view_name': view_name}, request=request)
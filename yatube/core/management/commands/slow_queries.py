@@ -0,0 +1,58 @@
+from collections import Counter
+
+from django.core.management.base import BaseCommand
+
+from core.slow_queries import read_entries
+
+SORT_KEYS = {
+    'total': lambda stats: stats['total'],
+    'max': lambda stats: stats['max'],
+    'count': lambda stats: stats['count'],
+}
+
+
+class Command(BaseCommand):
+    help = ('Сводка журнала медленных запросов всех процессов: самые '
+            'дорогие виды запросов с местом вызова и планом.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limit', type=int, default=20,
+                            help='Сколько видов запросов показать.')
+        parser.add_argument('--sort', choices=tuple(SORT_KEYS),
+                            default='total',
+                            help='Порядок: общее время, максимум или число.')
+
+    def handle(self, *args, **options):
+        groups = {}
+        for entry in read_entries():
+            stats = groups.setdefault(entry['fingerprint'], {
+                'sql': entry['sql'],
+                'count': 0,
+                'total': 0,
+                'max': 0,
+                'origins': Counter(),
+            })
+            stats['count'] += 1
+            stats['total'] += entry['duration_ms']
+            stats['max'] = max(stats['max'], entry['duration_ms'])
+            stats['origins'][(entry['origin'], entry['template'])] += 1
+            if entry['plan']:
+                stats['plan'] = entry['plan']
+        worst = sorted(groups.items(), key=lambda item: SORT_KEYS[
+            options['sort']](item[1]), reverse=True)[:options['limit']]
+        for key, stats in worst:
+            self.stdout.write(
+                f'{key}  запросов: {stats["count"]}  '
+                f'всего: {stats["total"]:.1f} мс  '
+                f'среднее: {stats["total"] / stats["count"]:.1f} мс  '
+                f'максимум: {stats["max"]:.1f} мс'
+            )
+            self.stdout.write(f'  {stats["sql"]}')
+            for (code, template), count in stats['origins'].most_common(3):
+                self.stdout.write(
+                    f'  {count} × {code or "?"}'
+                    + (f', шаблон {template}' if template else ''))
+            for line in stats.get('plan', ()):
+                self.stdout.write(f'  план: {line}')
+        if not worst:
+            self.stdout.write('Медленных запросов нет')
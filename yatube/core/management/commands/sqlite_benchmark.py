@@ -0,0 +1,119 @@
+import os
+import sqlite3
+import statistics
+import tempfile
+import threading
+import time
+
+from django.core.management.base import BaseCommand
+
+from core.db import apply_pragmas, is_locked_error, sqlite_pragmas
+
+SCHEMA = (
+    'CREATE TABLE post (id INTEGER PRIMARY KEY AUTOINCREMENT, '
+    'author_id INTEGER NOT NULL, text TEXT NOT NULL)'
+)
+
+
+class Command(BaseCommand):
+    help = ('Нагрузочный тест SQLite: пропускная способность записи и '
+            'задержка чтения при конкурентных читателях и писателях.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--readers', type=int, default=8)
+        parser.add_argument('--writers', type=int, default=4)
+        parser.add_argument('--seconds', type=float, default=5)
+
+    def handle(self, *args, **options):
+        for mode, pragmas in (
+                ('journal=DELETE', (('journal_mode', 'DELETE'),)),
+                ('journal=WAL + PRAGMA', sqlite_pragmas())):
+            result = self.run(pragmas, options)
+            self.stdout.write(
+                f'{mode:<22} записей/с: {result["writes"]:>8.0f}  '
+                f'блокировок: {result["locked"]:>5}  '
+                f'чтение p50: {result["p50"]:.2f} мс  '
+                f'p99: {result["p99"]:.2f} мс'
+            )
+
+    def run(self, pragmas, options):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'bench.sqlite3')
+            self.prepare(path, pragmas)
+            stop = time.monotonic() + options['seconds']
+            stats = {'writes': 0, 'locked': 0, 'latency': [],
+                     'lock': threading.Lock()}
+            threads = (
+                [threading.Thread(target=self.writer,
+                                  args=(path, pragmas, stop, stats, number))
+                 for number in range(options['writers'])]
+                + [threading.Thread(target=self.reader,
+                                    args=(path, pragmas, stop, stats))
+                   for _ in range(options['readers'])]
+            )
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        latency = sorted(stats['latency']) or [0]
+        return {
+            'writes': stats['writes'] / options['seconds'],
+            'locked': stats['locked'],
+            'p50': statistics.median(latency),
+            'p99': latency[min(len(latency) - 1, int(len(latency) * 0.99))],
+        }
+
+    def prepare(self, path, pragmas):
+        connection = sqlite3.connect(path)
+        apply_pragmas(connection, pragmas)
+        connection.execute(SCHEMA)
+        connection.executemany(
+            'INSERT INTO post (author_id, text) VALUES (?, ?)',
+            ((number % 100, 'текст' * 20) for number in range(10000))
+        )
+        connection.commit()
+        connection.close()
+
+    def writer(self, path, pragmas, stop, stats, number):
+        connection = sqlite3.connect(path, timeout=0.1, isolation_level=None)
+        apply_pragmas(connection, pragmas)
+        writes = locked = 0
+        while time.monotonic() < stop:
+            try:
+                connection.execute('BEGIN IMMEDIATE')
+                connection.execute(
+                    'INSERT INTO post (author_id, text) VALUES (?, ?)',
+                    (number, 'новый пост')
+                )
+                connection.execute('COMMIT')
+                writes += 1
+            except sqlite3.OperationalError as error:
+                if not is_locked_error(error):
+                    raise
+                if connection.in_transaction:
+                    connection.execute('ROLLBACK')
+                locked += 1
+        connection.close()
+        with stats['lock']:
+            stats['writes'] += writes
+            stats['locked'] += locked
+
+    def reader(self, path, pragmas, stop, stats):
+        connection = sqlite3.connect(path, timeout=0.1)
+        apply_pragmas(connection, pragmas)
+        latency = []
+        while time.monotonic() < stop:
+            started = time.perf_counter()
+            try:
+                connection.execute(
+                    'SELECT id, author_id, text FROM post '
+                    'ORDER BY id DESC LIMIT 10'
+                ).fetchall()
+            except sqlite3.OperationalError as error:
+                if not is_locked_error(error):
+                    raise
+            latency.append((time.perf_counter() - started) * 1000)
+        connection.close()
+        with stats['lock']:
+            stats['latency'].extend(latency)
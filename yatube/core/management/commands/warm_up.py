@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+
+from core.warmup import warm_up
+
+
+class Command(BaseCommand):
+    help = ('Создаёт миниатюры самых посещаемых страниц и кладёт '
+            'страницы в кеш.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limit', type=int,
+                            help='Сколько страниц прогреть '
+                                 '(по умолчанию WARMUP_PAGES).')
+        parser.add_argument('--concurrency', type=int,
+                            help='Сколько страниц рендерить одновременно '
+                                 '(по умолчанию WARMUP_CONCURRENCY).')
+        parser.add_argument('--days', type=int,
+                            help='За сколько дней брать статистику '
+                                 '(по умолчанию WARMUP_DAYS).')
+
+    def handle(self, *args, **options):
+        results = warm_up(options['limit'], options['concurrency'],
+                          options['days'])
+        for path, warmed in results:
+            if options['verbosity'] > 1:
+                self.stdout.write(f'{path}: {"ok" if warmed else "нет"}')
+        warmed = sum(warmed for path, warmed in results)
+        self.stdout.write(f'Прогрето страниц: {warmed}, '
+                          f'пропущено: {len(results) - warmed}')
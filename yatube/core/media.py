@@ -0,0 +1,143 @@
+import mimetypes
+import os
+import re
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, Http404, HttpResponse
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+IMMUTABLE_MAX_AGE = 60 * 60 * 24 * 365
+
+
+def media_file(path):
+    """Абсолютный путь к файлу внутри MEDIA_ROOT и его stat.
+
+    Выход за пределы MEDIA_ROOT и каталоги дают 404.
+    """
+    try:
+        full_path = safe_join(settings.MEDIA_ROOT, path)
+        stat = os.stat(full_path)
+    except (SuspiciousFileOperation, OSError, ValueError):
+        raise Http404
+    if not os.path.isfile(full_path):
+        raise Http404
+    return full_path, stat
+
+
+def cache_control(path):
+    """Миниатюры sorl лежат под именами-хешами и никогда не меняются."""
+    if path.startswith(settings.MEDIA_IMMUTABLE_PREFIXES):
+        return f'public, max-age={IMMUTABLE_MAX_AGE}, immutable'
+    return f'public, max-age={settings.MEDIA_CACHE_MAX_AGE}'
+
+
+def byte_range(header, size):
+    """Диапазон (начало, конец включительно) из заголовка Range.
+
+    None — отдать файл целиком (заголовка нет, он непонятен, конец
+    раньше начала или диапазонов несколько), False — диапазон вне файла.
+    """
+    match = RANGE_RE.match(header.replace(' ', ''))
+    if match is None or match.groups() == ('', ''):
+        return None
+    start, end = match.groups()
+    if not start:
+        # bytes=-N — последние N байт.
+        start, end = max(size - int(end), 0), size - 1
+    else:
+        start = int(start)
+        if end and int(end) < start:
+            # Такой заголовок RFC 7233 велит не замечать.
+            return None
+        end = min(int(end), size - 1) if end else size - 1
+    if start > end or start >= size:
+        return False
+    return start, end
+
+
+class RangeFile:
+    """Файл, читаемый с позиции start не дальше length байт."""
+
+    def __init__(self, file, start, length):
+        self.file = file
+        self.file.seek(start)
+        self.remaining = length
+
+    def read(self, size=-1):
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.file.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def close(self):
+        self.file.close()
+
+
+def media_response(request, path):
+    """Отдаёт файл из MEDIA_ROOT.
+
+    С MEDIA_SENDFILE файл отдаёт веб-сервер по заголовку
+    X-Accel-Redirect (nginx) или X-Sendfile (Apache) с путём в
+    URL-кодировке, приложение только проверяет путь и ставит заголовки
+    кеширования. Иначе целый файл уходит через FileResponse, который
+    WSGI-сервер передаёт sendfile без копирования, а запросы Range
+    получают ответ 206 с куском файла.
+    """
+    full_path, stat = media_file(path)
+    content_type = (mimetypes.guess_type(full_path)[0]
+                    or 'application/octet-stream')
+    if settings.MEDIA_SENDFILE == 'x-accel-redirect':
+        response = HttpResponse(content_type=content_type)
+        response['X-Accel-Redirect'] = quote(settings.MEDIA_ACCEL_PREFIX
+                                             + path.lstrip('/'))
+    elif settings.MEDIA_SENDFILE == 'x-sendfile':
+        response = HttpResponse(content_type=content_type)
+        response['X-Sendfile'] = quote(full_path)
+    else:
+        return serve_file(request, path, full_path, stat, content_type)
+    response['Cache-Control'] = cache_control(path)
+    return response
+
+
+def serve_file(request, path, full_path, stat, content_type):
+    # Размер и время изменения в наносекундах меняются при любой
+    # перезаписи файла, поэтому ETag можно считать сильным.
+    etag = quote_etag(f'{stat.st_size:x}-{stat.st_mtime_ns:x}')
+    headers = {
+        'ETag': etag,
+        'Last-Modified': http_date(stat.st_mtime),
+        'Cache-Control': cache_control(path),
+        'Accept-Ranges': 'bytes',
+    }
+    response = get_conditional_response(request, etag, int(stat.st_mtime))
+    if response is not None:
+        for name, value in headers.items():
+            response[name] = value
+        return response
+    requested = None
+    if_range = request.META.get('HTTP_IF_RANGE')
+    if if_range is None or if_range == etag:
+        requested = byte_range(request.META.get('HTTP_RANGE', ''),
+                               stat.st_size)
+    if requested is False:
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f'bytes */{stat.st_size}'
+        return response
+    file = open(full_path, 'rb')
+    if requested is None:
+        response = FileResponse(file, content_type=content_type)
+    else:
+        start, end = requested
+        response = FileResponse(RangeFile(file, start, end - start + 1),
+                                status=206, content_type=content_type)
+        response['Content-Length'] = end - start + 1
+        response['Content-Range'] = f'bytes {start}-{end}/{stat.st_size}'
+    for name, value in headers.items():
+        response[name] = value
+    return response
@@ -0,0 +1,117 @@
+from django.conf import settings
+
+from core.profiling import profile_request, should_profile
+from core.ratelimit import take_token, too_many_requests
+from core.routers import use_replica
+
+
+class ReplicaMiddleware:
+    """Выбирает базу для чтения на время запроса.
+
+    Страницы ленты читаются с реплик. После записи через одно из
+    представлений REPLICA_WRITE_VIEWS клиент получает cookie, и пока она
+    жива, все его чтения идут в основную базу — так пользователь сразу
+    видит свои изменения, даже если реплика ещё отстаёт.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        try:
+            response = self.get_response(request)
+        finally:
+            use_replica(False)
+        if getattr(request, 'pin_to_primary', False):
+            response.set_cookie(settings.REPLICA_PIN_COOKIE, '1',
+                                max_age=settings.REPLICA_PIN_SECONDS)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        view_name = request.resolver_match.view_name
+        if view_name in settings.REPLICA_WRITE_VIEWS:
+            request.pin_to_primary = True
+        if (view_name in settings.REPLICA_READ_VIEWS
+                and settings.REPLICA_PIN_COOKIE not in request.COOKIES):
+            # Сессия и пользователь всегда читаются из основной базы.
+            # Остальным представлениям, например отдаче медиафайлов,
+            # сессия может быть не нужна вовсе.
+            request.user.is_authenticated
+            use_replica(True)
+        else:
+            use_replica(False)
+
+
+class RateLimitMiddleware:
+    """Ограничивает частоту запросов к представлениям из RATE_LIMITS.
+
+    Вошедший пользователь расходует жетоны своей корзины и корзины
+    своего IP, аноним — только IP. Отказ не доходит до представления
+    и стоит пары чтений из кеша.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        return self.get_response(request)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        view_name = request.resolver_match.view_name
+        limits = settings.RATE_LIMITS.get(view_name)
+        if limits is None or not self.is_charged(request):
+            return None
+        # Отказ по корзине пользователя не должен расходовать жетоны IP,
+        # общего для многих пользователей за одним адресом.
+        if 'user' in limits and request.user.is_authenticated:
+            wait = take_token(f'{view_name}:user:{request.user.pk}',
+                              *limits['user'])
+            if wait:
+                return too_many_requests(wait)
+        if 'ip' in limits:
+            wait = take_token(f'{view_name}:ip:{self.client_ip(request)}',
+                              *limits['ip'])
+            if wait:
+                return too_many_requests(wait)
+        return None
+
+    @staticmethod
+    def client_ip(request):
+        """Адрес клиента для корзины IP.
+
+        Каждый из RATE_LIMIT_PROXY_HOPS доверенных прокси дописывает
+        адрес, с которого к нему пришли, в конец X-Forwarded-For, поэтому
+        адрес клиента — на этом месте справа. Левее стоит то, что клиент
+        прислал сам. Без прокси берётся REMOTE_ADDR.
+        """
+        hops = settings.RATE_LIMIT_PROXY_HOPS
+        forwarded = [
+            address.strip() for address
+            in request.META.get('HTTP_X_FORWARDED_FOR', '').split(',')
+            if address.strip()
+        ]
+        if hops and len(forwarded) >= hops:
+            return forwarded[-hops]
+        return request.META.get('REMOTE_ADDR', '')
+
+    @staticmethod
+    def is_charged(request):
+        if (request.method not in ('GET', 'HEAD')
+                or request.resolver_match.view_name
+                in settings.RATE_LIMIT_GET_WRITES):
+            return True
+        page = request.GET.get('page', '')
+        return page.isdigit() and int(page) > settings.RATE_LIMIT_FREE_PAGES
+
+
+class ProfilingMiddleware:
+    """Профилирует запрос по параметру PROFILE_TRIGGER_PARAM от сотрудника
+    или выборочно с частотой PROFILE_SAMPLE_RATE (см. core.profiling)."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if should_profile(request):
+            return profile_request(request, self.get_response)
+        return self.get_response(request)
@@ -0,0 +1,27 @@
+# Generated by Django 2.2.16 on 2026-10-19 10:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PageHit',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('path', models.CharField(max_length=255)),
+                ('day', models.DateField()),
+                ('hits', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='pagehit',
+            constraint=models.UniqueConstraint(fields=('path', 'day'), name='unique_page_hit'),
+        ),
+    ]
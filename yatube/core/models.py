@@ -0,0 +1,20 @@
+from django.db import models
+
+
+class PageHit(models.Model):
+    """Число обращений к общей кешируемой странице за день.
+
+    По этой статистике команда warm_up выбирает страницы для прогрева.
+    """
+    path = models.CharField(max_length=255)
+    day = models.DateField()
+    hits = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = (
+            models.UniqueConstraint(fields=('path', 'day'),
+                                    name='unique_page_hit'),
+        )
+
+    def __str__(self) -> str:
+        return f'{self.path} {self.day}: {self.hits}'
@@ -0,0 +1,120 @@
+import functools
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+
+from core.holes import fill_holes
+from core.routers import cache_timeout
+from core.warmup import record_hit
+
+
+def page_key(request):
+    path = hashlib.md5(request.get_full_path().encode()).hexdigest()
+    return f'page:{path}'
+
+
+def surrogate_key(key):
+    return f'surrogate:{key}'
+
+
+def add_surrogate_keys(request, *keys):
+    """Помечает ответ ключами, по которым его можно будет сбросить."""
+    if hasattr(request, 'surrogate_keys'):
+        request.surrogate_keys.update(keys)
+
+
+def purge_surrogate_keys(*keys):
+    """Сбрасывает все закешированные страницы с любым из ключей.
+
+    Каждому ключу записывается время сброса; страница считается
+    актуальной, только если все её ключи сброшены до её рендера.
+    """
+    now = time.time_ns()
+    cache.set_many({surrogate_key(key): now for key in keys}, None)
+
+
+def surrogate_version(key):
+    """Время последнего сброса ключа — версия всего, что им помечено.
+
+    Пропавший из кеша ключ заводится заново с текущим временем.
+    """
+    version = cache.get(surrogate_key(key))
+    if version is None:
+        cache.add(surrogate_key(key), time.time_ns(), None)
+        version = cache.get(surrogate_key(key))
+    return version
+
+
+def _fresh(keys, rendered):
+    versions = cache.get_many([surrogate_key(key) for key in keys])
+    return all(
+        versions.get(surrogate_key(key), rendered + 1) <= rendered
+        for key in keys
+    )
+
+
+def cache_shared_page(view):
+    """Кеширует страницу целиком, одну копию на всех посетителей.
+
+    Персональные части страницы рендерятся заглушками (см. core.holes)
+    и заполняются для каждого запроса отдельно, поэтому общий кеш
+    подходит и анонимам, и вошедшим пользователям.
+
+    Представление перечисляет данные, из которых собрана страница, через
+    add_surrogate_keys; изменение любого из них сбрасывает страницу
+    через purge_surrogate_keys, поэтому срок жизни кеша может быть долгим.
+    """
+    @functools.wraps(view)
+    def wrapper(request, *args, **kwargs):
+        # Только что писавший клиент должен сразу увидеть свои изменения.
+        if (request.method not in ('GET', 'HEAD')
+                or settings.REPLICA_PIN_COOKIE in request.COOKIES):
+            return view(request, *args, **kwargs)
+        key = page_key(request)
+        entry = cache.get(key)
+        if entry is not None and _fresh(entry['keys'], entry['rendered']):
+            response = HttpResponse(fill_holes(request, entry['content']),
+                                    content_type=entry['content_type'])
+            keys = entry['keys']
+        else:
+            response, keys = render_shared(request, view, key, *args,
+                                           **kwargs)
+        if not request.user.is_authenticated:
+            response['Surrogate-Key'] = ' '.join(keys)
+        if response.status_code == 200:
+            record_hit(request)
+        return response
+    return wrapper
+
+
+def render_shared(request, view, key, *args, **kwargs):
+    rendered = time.time_ns()
+    request.surrogate_keys = set()
+    request.punch_holes = True
+    try:
+        response = view(request, *args, **kwargs)
+    finally:
+        request.punch_holes = False
+    keys = sorted(request.surrogate_keys)
+    timeout = cache_timeout(settings.PAGE_CACHE_TIMEOUT)
+    # Ключ, которого нет в кеше, мог быть вытеснен после сброса, поэтому
+    # заводится заново с текущим временем: старые страницы с ним
+    # станут неактуальны.
+    for surrogate in keys:
+        cache.add(surrogate_key(surrogate), rendered, None)
+    if response.streaming:
+        return response, keys
+    content = response.content.decode(response.charset)
+    if (response.status_code == 200 and not response.cookies
+            and _fresh(keys, rendered)):
+        cache.set(key, {
+            'content': content,
+            'content_type': response['Content-Type'],
+            'keys': keys,
+            'rendered': rendered,
+        }, timeout)
+    response.content = fill_holes(request, content)
+    return response, keys
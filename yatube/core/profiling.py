@@ -0,0 +1,122 @@
+import cProfile
+import io
+import json
+import os
+import pstats
+import random
+import threading
+import time
+import tracemalloc
+import uuid
+
+from django.conf import settings
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from core.slow_queries import normalize
+
+# tracemalloc один на процесс, поэтому профилируется один запрос за раз.
+_lock = threading.Lock()
+
+
+def should_profile(request):
+    """Профилировать ли запрос: по параметру от сотрудника или выборочно."""
+    if (settings.PROFILE_TRIGGER_PARAM in request.GET
+            and request.user.is_staff):
+        return True
+    return random.random() < settings.PROFILE_SAMPLE_RATE
+
+
+def profile_path(name, extension):
+    return os.path.join(settings.PROFILE_DIR, f'{name}.{extension}')
+
+
+def profile_request(request, get_response):
+    """Выполняет запрос под cProfile и tracemalloc и сохраняет результат.
+
+    Если другой запрос уже профилируется, этот выполняется как обычно.
+    """
+    if not _lock.acquire(blocking=False):
+        return get_response(request)
+    try:
+        profiler = cProfile.Profile()
+        tracemalloc.start()
+        started = time.perf_counter()
+        with CaptureQueriesContext(connection) as queries:
+            profiler.enable()
+            try:
+                response = get_response(request)
+            finally:
+                profiler.disable()
+        duration = time.perf_counter() - started
+        snapshot = tracemalloc.take_snapshot()
+    finally:
+        tracemalloc.stop()
+        _lock.release()
+    name = save_profile(request, response, profiler, snapshot,
+                        queries.captured_queries, duration)
+    response['X-Profile-Id'] = name
+    return response
+
+
+def save_profile(request, response, profiler, snapshot, queries, duration):
+    """Сохраняет профиль в PROFILE_DIR: .prof для pstats и .json с
+    адресом, временем, запросами к базе и местами выделения памяти.
+
+    Запросы к базе сохраняются без значений параметров: в них бывают
+    ключи сессий и хеши паролей.
+    """
+    os.makedirs(settings.PROFILE_DIR, exist_ok=True)
+    now = timezone.now()
+    name = f'{now:%Y%m%d-%H%M%S}-{uuid.uuid4().hex[:8]}'
+    profiler.dump_stats(profile_path(name, 'prof'))
+    stats = io.StringIO()
+    pstats.Stats(profiler, stream=stats).sort_stats(
+        'cumulative').print_stats(settings.PROFILE_TOP_FUNCTIONS)
+    allocations = snapshot.filter_traces((
+        tracemalloc.Filter(False, tracemalloc.__file__),
+    )).statistics('lineno')[:settings.PROFILE_TOP_ALLOCATIONS]
+    match = request.resolver_match
+    with open(profile_path(name, 'json'), 'w', encoding='utf-8') as file:
+        json.dump({
+            'name': name,
+            'created': now.isoformat(),
+            'url': request.get_full_path(),
+            'method': request.method,
+            'view': match.view_name if match else None,
+            'status': response.status_code,
+            'duration_ms': round(duration * 1000, 2),
+            'queries': [{'sql': normalize(query['sql']),
+                         'time': query['time']} for query in queries],
+            'allocations': [{
+                'where': f'{stat.traceback[0].filename}:'
+                         f'{stat.traceback[0].lineno}',
+                'size': stat.size,
+                'count': stat.count,
+            } for stat in allocations],
+            'stats': stats.getvalue(),
+        }, file, ensure_ascii=False)
+    return name
+
+
+def load_profile(name):
+    try:
+        with open(profile_path(name, 'json'), encoding='utf-8') as file:
+            return json.load(file)
+    except FileNotFoundError:
+        return None
+
+
+def list_profiles():
+    """Последние PROFILE_LIST_LIMIT профилей, от новых к старым."""
+    try:
+        names = sorted((
+            filename[:-len('.json')]
+            for filename in os.listdir(settings.PROFILE_DIR)
+            if filename.endswith('.json')
+        ), reverse=True)[:settings.PROFILE_LIST_LIMIT]
+    except FileNotFoundError:
+        return []
+    profiles = (load_profile(name) for name in names)
+    return [profile for profile in profiles if profile]
@@ -0,0 +1,31 @@
+import math
+import time
+
+from django.core.cache import cache
+from django.http import HttpResponse
+
+
+def take_token(key, capacity, period):
+    """Берёт жетон из корзины key.
+
+    Корзина вмещает capacity жетонов и наполняется целиком за period
+    секунд. Возвращает 0, если жетон взят, иначе — сколько секунд ждать
+    следующего. Чтение и запись не атомарны, поэтому при гонке
+    конкурентные запросы могут взять на жетон-другой больше.
+    """
+    rate = capacity / period
+    now = time.time()
+    tokens, updated = cache.get(f'ratelimit:{key}', (capacity, now))
+    tokens = min(capacity, tokens + (now - updated) * rate)
+    if tokens < 1:
+        return (1 - tokens) / rate
+    cache.set(f'ratelimit:{key}', (tokens - 1, now), period)
+    return 0
+
+
+def too_many_requests(wait):
+    response = HttpResponse('Слишком много запросов, повторите позже.\n',
+                            content_type='text/plain; charset=utf-8',
+                            status=429)
+    response['Retry-After'] = max(1, math.ceil(wait))
+    return response
@@ -0,0 +1,48 @@
+import random
+import threading
+
+from django.conf import settings
+
+_state = threading.local()
+
+
+def use_replica(value):
+    """Разрешает или запрещает чтение с реплик в текущем потоке."""
+    _state.replica = value
+
+
+def reading_replica():
+    """Читает ли текущий поток с реплик."""
+    return bool(settings.DATABASE_REPLICAS
+                and getattr(_state, 'replica', False))
+
+
+def cache_timeout(timeout):
+    """Срок кеширования данных, прочитанных в текущем потоке.
+
+    Реплика может отставать, и сброс мог прийти раньше, чем до неё
+    доехали данные, поэтому прочитанное с неё живёт в кеше не дольше
+    REPLICA_PIN_SECONDS.
+    """
+    return settings.REPLICA_PIN_SECONDS if reading_replica() else timeout
+
+
+class ReplicaRouter:
+    """Отправляет чтения ленты на реплики, а всё остальное — на основную базу.
+
+    Какие запросы можно читать с реплики, решает ReplicaMiddleware.
+    """
+
+    def db_for_read(self, model, **hints):
+        if reading_replica():
+            return random.choice(settings.DATABASE_REPLICAS)
+        return 'default'
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == 'default'
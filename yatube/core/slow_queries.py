@@ -0,0 +1,172 @@
+import hashlib
+import json
+import os
+import re
+import sys
+import threading
+import time
+from collections import deque
+
+from django.conf import settings
+
+NUMBER_RE = re.compile(r'\b\d+\b')
+STRING_RE = re.compile(r"'(?:[^']|'')*'")
+PLACEHOLDER_RE = re.compile(r'%s|\?')
+IN_LIST_RE = re.compile(r'\bIN \((?:\?, )*\?\)')
+SPACE_RE = re.compile(r'\s+')
+
+_state = threading.local()
+
+
+def normalize(sql):
+    """Текст запроса без значений: одинаковые запросы с разными
+    параметрами дают одну и ту же строку."""
+    sql = STRING_RE.sub('?', sql)
+    sql = NUMBER_RE.sub('?', sql)
+    sql = PLACEHOLDER_RE.sub('?', sql)
+    sql = IN_LIST_RE.sub('IN (...)', sql)
+    return SPACE_RE.sub(' ', sql).strip()
+
+
+def fingerprint(normalized):
+    return hashlib.md5(normalized.encode()).hexdigest()[:12]
+
+
+def param_shape(params, many):
+    """Типы параметров вместо значений; для executemany — первой строки."""
+    if many:
+        params = list(params or [])
+        return {'rows': len(params),
+                'first': param_shape(params[0], False) if params else []}
+    if isinstance(params, dict):
+        return {key: type(value).__name__ for key, value in params.items()}
+    return [type(value).__name__ for value in params or ()]
+
+
+def origin():
+    """Место в коде проекта и строка шаблона, откуда пришёл запрос."""
+    code = template = None
+    frame = sys._getframe(2)
+    while frame is not None and not (code and template):
+        node = frame.f_locals.get('self')
+        if (template is None and frame.f_code.co_name == 'render_annotated'
+                and getattr(node, 'token', None) is not None):
+            template = f'{node.origin.template_name}:{node.token.lineno}'
+        filename = frame.f_code.co_filename
+        if (code is None and filename.startswith(settings.BASE_DIR)
+                and filename != __file__):
+            code = (f'{os.path.relpath(filename, settings.BASE_DIR)}:'
+                    f'{frame.f_lineno} ({frame.f_code.co_name})')
+        frame = frame.f_back
+    return code, template
+
+
+def explain(connection, sql, params, many):
+    """План запроса SQLite; для остальных баз и записей — None.
+
+    В транзакции, которую уже нужно откатить, EXPLAIN не выполняется.
+    """
+    if (many or connection.vendor != 'sqlite'
+            or not sql.lstrip().upper().startswith('SELECT')
+            or connection.in_atomic_block and connection.needs_rollback):
+        return None
+    _state.explaining = True
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+            return [row[-1] for row in cursor.fetchall()]
+    except Exception as error:
+        return [f'EXPLAIN не выполнен: {error}']
+    finally:
+        _state.explaining = False
+
+
+class SlowQueryLog:
+    """Кольцевой журнал медленных запросов процесса.
+
+    Последние SLOW_QUERY_LOG_SIZE записей держатся в памяти и
+    дописываются в файл процесса в SLOW_QUERY_LOG_DIR; когда файл
+    вырастает вдвое, он перезаписывается содержимым кольца. Команда
+    slow_queries собирает файлы всех процессов.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.entries = deque(maxlen=settings.SLOW_QUERY_LOG_SIZE)
+        self.written = 0
+
+    @property
+    def path(self):
+        return os.path.join(settings.SLOW_QUERY_LOG_DIR,
+                            f'slow-{os.getpid()}.jsonl')
+
+    def add(self, entry):
+        line = json.dumps(entry, ensure_ascii=False, default=str) + '\n'
+        with self.lock:
+            self.entries.append(line)
+            os.makedirs(settings.SLOW_QUERY_LOG_DIR, exist_ok=True)
+            if self.written >= 2 * self.entries.maxlen:
+                with open(self.path, 'w', encoding='utf-8') as file:
+                    file.writelines(self.entries)
+                self.written = len(self.entries)
+            else:
+                with open(self.path, 'a', encoding='utf-8') as file:
+                    file.write(line)
+                self.written += 1
+
+
+slow_query_log = SlowQueryLog()
+
+
+def read_entries():
+    """Записи журналов всех процессов из SLOW_QUERY_LOG_DIR."""
+    try:
+        filenames = os.listdir(settings.SLOW_QUERY_LOG_DIR)
+    except FileNotFoundError:
+        return
+    for filename in filenames:
+        if not filename.endswith('.jsonl'):
+            continue
+        path = os.path.join(settings.SLOW_QUERY_LOG_DIR, filename)
+        with open(path, encoding='utf-8') as file:
+            for line in file:
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    # Строка, которую процесс ещё дописывает.
+                    continue
+
+
+def log_slow_queries(execute, sql, params, many, context):
+    """Обёртка execute: записывает запросы дольше SLOW_QUERY_THRESHOLD_MS.
+
+    Быстрые запросы стоят двух вызовов perf_counter. Упавший запрос не
+    записывается: ошибку пробросит execute, а план и время у него
+    бессмысленны.
+    """
+    started = time.perf_counter()
+    result = execute(sql, params, many, context)
+    duration = (time.perf_counter() - started) * 1000
+    threshold = settings.SLOW_QUERY_THRESHOLD_MS
+    if (threshold is not None and duration >= threshold
+            and not getattr(_state, 'explaining', False)):
+        normalized = normalize(sql)
+        code, template = origin()
+        slow_query_log.add({
+            'time': time.time(),
+            'duration_ms': round(duration, 3),
+            'fingerprint': fingerprint(normalized),
+            'sql': normalized,
+            'params': param_shape(params, many),
+            'origin': code,
+            'template': template,
+            'plan': explain(context['connection'], sql, params, many),
+        })
+    return result
+
+
+def install_slow_query_log(sender, connection, **kwargs):
+    """Подключает журнал к новому соединению (сигнал connection_created)."""
+    if (settings.SLOW_QUERY_THRESHOLD_MS is not None
+            and log_slow_queries not in connection.execute_wrappers):
+        connection.execute_wrappers.append(log_slow_queries)
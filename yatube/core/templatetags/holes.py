@@ -0,0 +1,11 @@
+from django import template
+
+from core.holes import render_hole
+
+register = template.Library()
+
+
+@register.simple_tag(takes_context=True)
+def hole(context, name, *args):
+    """Персональный фрагмент страницы, см. core.holes.render_hole."""
+    return render_hole(context['request'], name, *args)
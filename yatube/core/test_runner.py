@@ -0,0 +1,14 @@
+from django.core.cache import cache
+from django.test.runner import DiscoverRunner
+
+
+class TestRunner(DiscoverRunner):
+    """Запускает тесты с пустым кешем.
+
+    Файловый кеш переживает процесс: без очистки корзины ограничения
+    частоты и страницы прошлого прогона попали бы в новый.
+    """
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        cache.clear()
@@ -0,0 +1,103 @@
+import os
+import shutil
+import tempfile
+
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+SMALL_GIF = (b'\x47\x49\x46\x38\x39\x61\x02\x00'
+             b'\x01\x00\x80\x00\x00\x00\x00\x00'
+             b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+             b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+             b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+             b'\x0A\x00\x3B')
+MEDIA_TEST_ROOT = tempfile.mkdtemp()
+
+
+@override_settings(MEDIA_ROOT=MEDIA_TEST_ROOT)
+class MediaServingTests(TestCase):
+    def setUp(self):
+        os.makedirs(os.path.join(MEDIA_TEST_ROOT, 'cache', 'ab'),
+                    exist_ok=True)
+        os.makedirs(os.path.join(MEDIA_TEST_ROOT, 'posts'), exist_ok=True)
+        with open(os.path.join(MEDIA_TEST_ROOT, 'posts', 'small.gif'),
+                  'wb') as file:
+            file.write(SMALL_GIF)
+        with open(os.path.join(MEDIA_TEST_ROOT, 'cache', 'ab',
+                               'thumb.jpg'), 'wb') as file:
+            file.write(b'0123456789')
+
+    def tearDown(self):
+        shutil.rmtree(MEDIA_TEST_ROOT, ignore_errors=True)
+
+    def get(self, path, **headers):
+        return self.client.get(reverse('media', args=[path]), **headers)
+
+    def test_file_served_with_validators(self):
+        response = self.get('posts/small.gif')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), SMALL_GIF)
+        self.assertEqual(response['Content-Type'], 'image/gif')
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        self.assertFalse(response['ETag'].startswith('W/'))
+        self.assertNotIn('immutable', response['Cache-Control'])
+        self.assertFalse(response.has_header('Vary'))
+        cached = self.get('posts/small.gif',
+                          HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(cached.status_code, 304)
+
+    def test_thumbnail_is_immutable(self):
+        response = self.get('cache/ab/thumb.jpg')
+        self.assertIn('immutable', response['Cache-Control'])
+
+    def test_range_requests(self):
+        cases = (
+            ('bytes=2-5', 206, b'2345', 'bytes 2-5/10'),
+            ('bytes=7-', 206, b'789', 'bytes 7-9/10'),
+            ('bytes=-2', 206, b'89', 'bytes 8-9/10'),
+            ('bytes=0-1,4-5', 200, b'0123456789', None),
+            ('bytes=5-2', 200, b'0123456789', None),
+        )
+        for header, status, content, content_range in cases:
+            with self.subTest(header=header):
+                response = self.get('cache/ab/thumb.jpg', HTTP_RANGE=header)
+                self.assertEqual(response.status_code, status)
+                self.assertEqual(b''.join(response.streaming_content),
+                                 content)
+                self.assertEqual(response.get('Content-Range'), content_range)
+        response = self.get('cache/ab/thumb.jpg', HTTP_RANGE='bytes=20-')
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response['Content-Range'], 'bytes */10')
+        response = self.get('cache/ab/thumb.jpg', HTTP_RANGE='bytes=2-5',
+                            HTTP_IF_RANGE='"stale"')
+        self.assertEqual(response.status_code, 200)
+
+    def test_missing_and_outside_files(self):
+        for path in ('posts/missing.gif', '../settings.py', 'posts'):
+            with self.subTest(path=path):
+                self.assertEqual(self.get(path).status_code, 404)
+
+    @override_settings(MEDIA_SENDFILE='x-accel-redirect')
+    def test_accel_redirect(self):
+        response = self.get('cache/ab/thumb.jpg')
+        self.assertEqual(response['X-Accel-Redirect'],
+                         '/protected-media/cache/ab/thumb.jpg')
+        self.assertEqual(response.content, b'')
+        self.assertIn('immutable', response['Cache-Control'])
+
+    @override_settings(MEDIA_SENDFILE='x-accel-redirect')
+    def test_accel_redirect_quotes_path(self):
+        with open(os.path.join(MEDIA_TEST_ROOT, 'posts', 'кот 1.gif'),
+                  'wb') as file:
+            file.write(SMALL_GIF)
+        response = self.get('posts/кот 1.gif')
+        self.assertEqual(response['X-Accel-Redirect'],
+                         '/protected-media/posts/%D0%BA%D0%BE%D1%82%201.gif')
+
+    @override_settings(MEDIA_SENDFILE='x-sendfile')
+    def test_sendfile_quotes_path(self):
+        with open(os.path.join(MEDIA_TEST_ROOT, 'posts', 'a b.gif'),
+                  'wb') as file:
+            file.write(SMALL_GIF)
+        response = self.get('posts/a b.gif')
+        self.assertTrue(response['X-Sendfile'].endswith('/posts/a%20b.gif'))
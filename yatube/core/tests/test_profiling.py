@@ -0,0 +1,71 @@
+import shutil
+import tempfile
+
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from posts.models import Group, Post
+from users.forms import User
+
+PROFILE_ROOT = tempfile.mkdtemp()
+
+
+@override_settings(PROFILE_DIR=PROFILE_ROOT)
+class ProfilingTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.staff = User.objects.create(username='Staff', is_staff=True)
+        cls.user = User.objects.create(username='User')
+        cls.post = Post.objects.create(author=cls.user, text='Пост')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(PROFILE_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        self.staff_client = Client()
+        self.staff_client.force_login(self.staff)
+        self.user_client = Client()
+        self.user_client.force_login(self.user)
+
+    def test_staff_profiles_request(self):
+        """Сотрудник профилирует запрос и видит результат в списке."""
+        url = reverse('posts:post_detail', kwargs={'post_id': self.post.pk})
+        response = self.staff_client.get(url + '?_profile')
+        name = response['X-Profile-Id']
+        response = self.staff_client.get(reverse('core:profile_list'))
+        self.assertContains(response, url)
+        response = self.staff_client.get(
+            reverse('core:profile_detail', args=[name]))
+        self.assertEqual(response.context['profile']['view'],
+                         'posts:post_detail')
+        self.assertTrue(response.context['profile']['queries'])
+        self.assertTrue(response.context['profile']['allocations'])
+        response = self.staff_client.get(
+            reverse('core:profile_download', args=[name]))
+        self.assertEqual(response['Content-Disposition'],
+                         f'attachment; filename="{name}.prof"')
+
+    def test_queries_saved_without_params(self):
+        """В профиль попадают запросы без значений параметров."""
+        group = Group.objects.create(title='Группа', slug='secret-slug')
+        url = reverse('posts:group_list', args=[group.slug])
+        response = self.staff_client.get(url + '?_profile')
+        response = self.staff_client.get(reverse(
+            'core:profile_detail', args=[response['X-Profile-Id']]))
+        queries = [query['sql']
+                   for query in response.context['profile']['queries']]
+        self.assertTrue(any('posts_group' in sql for sql in queries))
+        self.assertFalse(any(group.slug in sql for sql in queries))
+
+    def test_only_staff_can_profile(self):
+        """Обычный пользователь не запускает профилирование и не видит
+        профили."""
+        response = self.user_client.get(reverse('posts:index') + '?_profile')
+        self.assertNotIn('X-Profile-Id', response)
+        response = self.user_client.get(reverse('core:profile_list'))
+        self.assertEqual(response.status_code, 302)
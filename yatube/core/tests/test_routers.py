@@ -0,0 +1,20 @@
+from django.conf import settings
+from django.test import SimpleTestCase, override_settings
+
+from core.routers import cache_timeout, use_replica
+
+
+class CacheTimeoutTests(SimpleTestCase):
+    def tearDown(self):
+        use_replica(False)
+
+    @override_settings(DATABASE_REPLICAS=['replica'])
+    def test_replica_reads_cached_briefly(self):
+        """Прочитанное с реплики кешируется не дольше закрепления."""
+        self.assertEqual(cache_timeout(3600), 3600)
+        use_replica(True)
+        self.assertEqual(cache_timeout(3600), settings.REPLICA_PIN_SECONDS)
+
+    def test_without_replicas_timeout_kept(self):
+        use_replica(True)
+        self.assertEqual(cache_timeout(3600), 3600)
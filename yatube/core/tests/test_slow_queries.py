@@ -0,0 +1,75 @@
+import shutil
+import tempfile
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import DatabaseError, connection, transaction
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from core.slow_queries import (explain, normalize, read_entries,
+                               slow_query_log)
+from posts.models import Post
+from users.forms import User
+
+SLOW_QUERY_ROOT = tempfile.mkdtemp()
+
+
+@override_settings(SLOW_QUERY_THRESHOLD_MS=0,
+                   SLOW_QUERY_LOG_DIR=SLOW_QUERY_ROOT)
+class SlowQueriesCommandTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create(username='Author')
+        cls.post = Post.objects.create(author=cls.author, text='Пост')
+
+    def tearDown(self):
+        shutil.rmtree(SLOW_QUERY_ROOT, ignore_errors=True)
+        slow_query_log.entries.clear()
+        slow_query_log.written = 0
+
+    def test_slow_queries_logged_with_plan_and_origin(self):
+        """Запрос попадает в журнал с планом, местом вызова и шаблоном."""
+        cache.clear()
+        self.client.get(reverse('posts:post_detail',
+                                kwargs={'post_id': self.post.pk}))
+        entries = list(read_entries())
+        self.assertTrue(entries)
+        counts = [entry for entry in entries
+                  if entry['sql'].startswith('SELECT COUNT(*)')
+                  and 'FROM "posts_post"' in entry['sql']]
+        self.assertTrue(counts)
+        self.assertEqual(counts[0]['params'], ['int'])
+        self.assertIn('posts/post_detail.html:',
+                      str([entry['template'] for entry in counts]))
+        self.assertTrue(counts[0]['origin'])
+        self.assertTrue(counts[0]['plan'])
+        out = StringIO()
+        call_command('slow_queries', '--limit', '1', stdout=out)
+        self.assertEqual(out.getvalue().count('запросов:'), 1)
+        # Среди самых долгих могут оказаться служебные запросы без плана.
+        out = StringIO()
+        call_command('slow_queries', '--limit', '1000', stdout=out)
+        self.assertIn('план:', out.getvalue())
+
+    def test_failed_query_not_logged(self):
+        """Упавший запрос не попадает в журнал и не объясняется."""
+        with self.assertRaises(DatabaseError):
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT * FROM missing_table')
+        self.assertFalse([entry for entry in read_entries()
+                          if 'missing_table' in entry['sql']])
+
+    def test_no_explain_in_broken_transaction(self):
+        with transaction.atomic():
+            transaction.set_rollback(True)
+            self.assertIsNone(explain(connection, 'SELECT 1', (), False))
+
+    def test_normalize_drops_values(self):
+        self.assertEqual(
+            normalize("SELECT * FROM t WHERE a IN (%s, %s) AND b = 'x'\n"
+                      "LIMIT 10"),
+            'SELECT * FROM t WHERE a IN (...) AND b = ? LIMIT ?'
+        )
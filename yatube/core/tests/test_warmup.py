@@ -0,0 +1,93 @@
+import os
+import shutil
+import tempfile
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import RequestFactory, TestCase, override_settings
+from django.urls import reverse
+from sorl.thumbnail import default as thumbnail_default
+
+from core.models import PageHit
+from core.page_cache import page_key
+from core.warmup import hit_counter
+from posts.models import Group, Post
+from users.forms import User
+
+WARMUP_MEDIA_ROOT = tempfile.mkdtemp()
+
+
+@override_settings(MEDIA_ROOT=WARMUP_MEDIA_ROOT, WARMUP_FLUSH_HITS=1)
+class WarmUpCommandTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create(username='Author')
+        cls.group = Group.objects.create(title='Группа', slug='group',
+                                         description='Описание')
+        cls.post = Post.objects.create(
+            author=cls.author,
+            group=cls.group,
+            text='Пост',
+            image=SimpleUploadedFile(
+                'small.gif',
+                b'GIF89a\x02\x00\x01\x00\x80\x00\x00\x00\x00\x00'
+                b'\xff\xff\xff!\xf9\x04\x00\x00\x00\x00\x00,\x00'
+                b'\x00\x00\x00\x02\x00\x01\x00\x00\x02\x02\x0c'
+                b'\n\x00;',
+                content_type='image/gif'
+            )
+        )
+        cls.group_url = reverse('posts:group_list', args=[cls.group.slug])
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(WARMUP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        hit_counter.hits.clear()
+
+    def test_shared_page_hits_counted(self):
+        self.client.get(self.group_url)
+        self.client.get(self.group_url)
+        self.client.get(reverse('posts:index'))
+        self.client.get(reverse('posts:group_list', args=['missing']))
+        hits = dict(PageHit.objects.values_list('path', 'hits'))
+        self.assertEqual(hits, {self.group_url: 2, reverse('posts:index'): 1})
+
+    def test_hits_keyed_by_path_and_page(self):
+        """Посторонние параметры не дробят счётчики, номер страницы —
+        часть адреса."""
+        index = reverse('posts:index')
+        self.client.get(index, {'utm_source': 'mail'})
+        self.client.get(index, {'page': 'x'})
+        self.client.get(index, {'page': 2, 'ref': 'feed'})
+        hits = dict(PageHit.objects.values_list('path', 'hits'))
+        self.assertEqual(hits, {index: 2, f'{index}?page=2': 1})
+
+    def test_warm_up_renders_top_pages_and_thumbnails(self):
+        """Прогрев кладёт в кеш самые посещаемые страницы и создаёт
+        миниатюры, а сам в статистику не попадает."""
+        for _ in range(3):
+            self.client.get(self.group_url)
+        self.client.get(reverse('posts:index'))
+        self.client.get(reverse('posts:group_index'))
+        cache.clear()
+        thumbnail_default.kvstore.clear()
+        shutil.rmtree(os.path.join(WARMUP_MEDIA_ROOT, 'cache'),
+                      ignore_errors=True)
+        out = StringIO()
+        call_command('warm_up', '--limit', '2', '--concurrency', '1',
+                     stdout=out)
+        self.assertIn('Прогрето страниц: 2', out.getvalue())
+        self.assertIsNotNone(cache.get(page_key(
+            RequestFactory().get(self.group_url))))
+        self.assertIsNone(cache.get(page_key(
+            RequestFactory().get(reverse('posts:group_index')))))
+        self.assertTrue(os.listdir(os.path.join(WARMUP_MEDIA_ROOT, 'cache')))
+        self.assertEqual(
+            PageHit.objects.get(path=self.group_url).hits, 3)
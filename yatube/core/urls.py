@@ -0,0 +1,14 @@
+from django.urls import path
+
+from core import views
+
+
+app_name = 'core'
+
+urlpatterns = [
+    path('profiles/', views.profile_list, name='profile_list'),
+    path('profiles/<slug:name>/', views.profile_detail,
+         name='profile_detail'),
+    path('profiles/<slug:name>/download/', views.profile_download,
+         name='profile_download'),
+]
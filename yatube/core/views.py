@@ -1,4 +1,10 @@
+from django.contrib.admin.views.decorators import staff_member_required
+from django.http import FileResponse, Http404
 from django.shortcuts import render
+from django.views.decorators.http import require_safe
+
+from core.media import media_response
+from core.profiling import list_profiles, load_profile, profile_path
 
 
 def page_not_found(request, exception):
@@ -15,3 +21,32 @@ def permission_denied(request, exception):
 
 def csrf_failure(request, reason=''):
     return render(request, 'core/403csrf.html')
+
+
+@require_safe
+def media(request, path):
+    return media_response(request, path)
+
+
+@staff_member_required
+def profile_list(request):
+    return render(request, 'core/profile_list.html', {
+        'profiles': list_profiles()
+    })
+
+
+@staff_member_required
+def profile_detail(request, name):
+    profile = load_profile(name)
+    if profile is None:
+        raise Http404
+    return render(request, 'core/profile_detail.html', {'profile': profile})
+
+
+@staff_member_required
+def profile_download(request, name):
+    try:
+        file = open(profile_path(name, 'prof'), 'rb')
+    except FileNotFoundError:
+        raise Http404
+    return FileResponse(file, as_attachment=True, filename=f'{name}.prof')
@@ -0,0 +1,132 @@
+import datetime
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.db import DatabaseError, connections
+from django.db.models import F, Sum
+from django.http import Http404
+from django.test import RequestFactory
+from django.urls import Resolver404, resolve
+from django.utils import timezone
+
+from core.models import PageHit
+
+
+class HitCounter:
+    """Счётчик обращений к страницам, копящийся в памяти процесса.
+
+    В базу счётчики уходят пачкой раз в WARMUP_FLUSH_SECONDS или после
+    WARMUP_FLUSH_HITS обращений, поэтому статистика почти ничего не
+    добавляет к стоимости запроса.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.hits = Counter()
+        self.flushed = time.monotonic()
+
+    def add(self, path):
+        if len(path) > PageHit._meta.get_field('path').max_length:
+            return
+        with self.lock:
+            self.hits[path] += 1
+            if (sum(self.hits.values()) < settings.WARMUP_FLUSH_HITS
+                    and time.monotonic() - self.flushed
+                    < settings.WARMUP_FLUSH_SECONDS):
+                return
+            hits, self.hits = self.hits, Counter()
+            self.flushed = time.monotonic()
+        try:
+            self.save(hits)
+        except DatabaseError:
+            # Статистика не должна ронять страницу: счётчики уйдут
+            # со следующей пачкой.
+            with self.lock:
+                self.hits.update(hits)
+
+    @staticmethod
+    def save(hits):
+        day = timezone.localdate()
+        PageHit.objects.bulk_create(
+            (PageHit(path=path, day=day) for path in hits),
+            ignore_conflicts=True
+        )
+        for path, count in hits.items():
+            PageHit.objects.filter(path=path, day=day).update(
+                hits=F('hits') + count)
+
+
+hit_counter = HitCounter()
+
+
+def hit_path(request):
+    """Адрес страницы для статистики: путь и номер страницы, без
+    остальных параметров, чтобы метки и мусор в запросе не дробили
+    счётчики."""
+    page = request.GET.get('page', '')
+    return f'{request.path}?page={page}' if page.isdigit() else request.path
+
+
+def record_hit(request):
+    """Учитывает обращение к общей странице; прогрев не считается."""
+    if not getattr(request, 'warming', False):
+        hit_counter.add(hit_path(request))
+
+
+def since(days=None):
+    return timezone.localdate() - datetime.timedelta(
+        days=days or settings.WARMUP_DAYS)
+
+
+def top_paths(limit=None, days=None):
+    """Самые посещаемые страницы за последние WARMUP_DAYS дней."""
+    return list(
+        PageHit.objects.filter(day__gt=since(days))
+        .values('path')
+        .annotate(total=Sum('hits'))
+        .order_by('-total', 'path')
+        .values_list('path', flat=True)[:limit or settings.WARMUP_PAGES]
+    )
+
+
+def warm_path(path):
+    """Рендерит страницу как для анонима: страница ложится в кеш,
+    миниатюры её картинок создаются. Возвращает False, если страницы
+    больше нет."""
+    request = RequestFactory().get(path)
+    request.user = AnonymousUser()
+    request.warming = True
+    try:
+        request.resolver_match = resolve(request.path_info)
+        func, args, kwargs = request.resolver_match
+        response = func(request, *args, **kwargs)
+    except (Http404, Resolver404):
+        return False
+    return response.status_code == 200
+
+
+def _warm_in_thread(path):
+    try:
+        return warm_path(path)
+    finally:
+        connections.close_all()
+
+
+def warm_up(limit=None, concurrency=None, days=None):
+    """Прогревает самые посещаемые страницы, не больше concurrency
+    одновременно. Возвращает пары (адрес, прогрета ли страница).
+
+    Кеш общий для всех процессов сайта, поэтому страницы, прогретые
+    командой warm_up, сразу отдаются всеми воркерами.
+    """
+    PageHit.objects.filter(day__lte=since(days)).delete()
+    paths = top_paths(limit, days)
+    concurrency = concurrency or settings.WARMUP_CONCURRENCY
+    if concurrency <= 1:
+        return [(path, warm_path(path)) for path in paths]
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        return list(zip(paths, executor.map(_warm_in_thread, paths)))
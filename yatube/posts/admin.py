@@ -1,20 +1,100 @@
-from django.contrib import admin
+from django import forms
+from django.contrib import admin, messages
+from django.contrib.admin.helpers import ActionForm
+from django.contrib.auth.admin import UserAdmin
 
+from core.admin import LargeTableAdmin
+from posts.bulk import move_posts
+from posts.deletion import schedule_group_deletion, schedule_user_deletion
 from posts.models import Group, Post, Comment, Follow
+from users.forms import User
 
 
-class PostAdmin(admin.ModelAdmin):
+class PostActionForm(ActionForm):
+    group = forms.ModelChoiceField(
+        Group.objects.all(),
+        required=False,
+        label='Группа',
+        empty_label='без группы'
+    )
+
+
+class PostAdmin(LargeTableAdmin):
     list_display = ('pk', 'text', 'pub_date', 'author', 'group',)
     list_editable = ('group',)
+    list_select_related = ('author', 'group')
+    autocomplete_fields = ('author', 'group')
     search_fields = ('text',)
     list_filter = ('pub_date',)
     empty_value_display = '-пусто-'
+    action_form = PostActionForm
+    actions = ('move_to_group',)
+
+    def move_to_group(self, request, queryset):
+        form = self.action_form(request.POST)
+        form.fields['action'].choices = self.get_action_choices(request)
+        if not form.is_valid():
+            self.message_user(request, 'Группа не найдена', messages.ERROR)
+            return
+        moved = move_posts(queryset, form.cleaned_data['group'])
+        self.message_user(request, f'Перенесено постов: {moved}')
+    move_to_group.short_description = 'Перенести в выбранную группу'
+
+
+class QueuedDeletionAdmin(admin.ModelAdmin):
+    """Удаление через очередь run_deletions вместо каскада в запросе.
+
+    Страница подтверждения не собирает все зависимые объекты: удаляется
+    только сам объект, остальное уберёт фоновая команда.
+    """
+    schedule_deletion = None
+
+    def get_deleted_objects(self, objs, request):
+        objs = list(objs)
+        return (objs, {self.model._meta.verbose_name_plural: len(objs)},
+                set(), [])
+
+    def delete_model(self, request, obj):
+        self.schedule_deletion(obj)
+
+    def delete_queryset(self, request, queryset):
+        for obj in queryset:
+            self.schedule_deletion(obj)
+
+
+class QueuedUserAdmin(QueuedDeletionAdmin, UserAdmin):
+    schedule_deletion = staticmethod(schedule_user_deletion)
+
+
+class GroupAdmin(QueuedDeletionAdmin):
+    schedule_deletion = staticmethod(schedule_group_deletion)
+
+    list_display = ('pk', 'title', 'slug',)
+    search_fields = ('title', 'slug',)
+    prepopulated_fields = {'slug': ('title',)}
+
+
+class CommentAdmin(LargeTableAdmin):
+    list_display = ('pk', 'text', 'created', 'author', 'post',)
+    list_select_related = ('author', 'post')
+    autocomplete_fields = ('author', 'post')
+    search_fields = ('text',)
+    list_filter = ('created',)
+
+
+class FollowAdmin(LargeTableAdmin):
+    list_display = ('pk', 'user', 'author',)
+    list_select_related = ('user', 'author')
+    autocomplete_fields = ('user', 'author')
 
 
 admin.site.register(Post, PostAdmin)
 
-admin.site.register(Group)
+admin.site.register(Group, GroupAdmin)
+
+admin.site.register(Comment, CommentAdmin)
 
-admin.site.register(Comment)
+admin.site.register(Follow, FollowAdmin)
 
-admin.site.register(Follow)
+admin.site.unregister(User)
+admin.site.register(User, QueuedUserAdmin)
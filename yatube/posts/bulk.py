@@ -0,0 +1,63 @@
+from collections import defaultdict
+
+from django.db import transaction
+from django.urls import reverse
+
+from core.db import pk_chunks
+from core.page_cache import purge_surrogate_keys
+from posts.feeds import feed_key
+from posts.group_stats import post_added, post_removed
+from posts.models import Post
+from posts.poll import new_posts_tracker
+from posts.sitemaps import invalidate as invalidate_sitemap
+from posts.static_export import mark_stale
+
+
+def move_posts(queryset, group):
+    """Переносит посты в группу порциями по BULK_CHUNK_SIZE.
+
+    update() не вызывает сигналы, поэтому статистика групп, кеш страниц
+    и экспорт обновляются здесь же, в транзакции каждой порции.
+    Возвращает число перенесённых постов.
+    """
+    group_id = group.pk if group else None
+    moved = 0
+    for chunk in pk_chunks(queryset):
+        with transaction.atomic():
+            moved += _move_chunk(chunk, group, group_id)
+    return moved
+
+
+def _move_chunk(chunk, group, group_id):
+    rows = list(Post.objects.filter(pk__in=chunk).exclude(
+        group_id=group_id).values_list(
+        'pk', 'pub_date', 'group_id', 'group__slug', 'author__username'))
+    if not rows:
+        return 0
+    pks = [row[0] for row in rows]
+    Post.objects.filter(pk__in=pks).update(group_id=group_id)
+    removed = defaultdict(list)
+    for _, pub_date, old_group_id, _, _ in rows:
+        if old_group_id:
+            removed[old_group_id].append(pub_date)
+    for old_group_id, dates in removed.items():
+        post_removed(old_group_id, max(dates), len(dates))
+    if group_id:
+        post_added(group_id, max(row[1] for row in rows), len(rows))
+    new_posts_tracker.changed()
+    for moved_group_id in (group_id, *removed):
+        invalidate_sitemap('groups', moved_group_id)
+    slugs = {row[3] for row in rows if row[3]}
+    if group:
+        slugs.add(group.slug)
+    purge_surrogate_keys(
+        'groups', f'group:{group_id}',
+        *(f'group:{pk}' for pk in removed),
+        *(f'post:{pk}' for pk in pks),
+        *(feed_key('group', slug) for slug in slugs)
+    )
+    mark_stale([reverse('posts:index'), reverse('posts:group_index')]
+               + [reverse('posts:group_list', args=[slug]) for slug in slugs]
+               + [reverse('posts:profile', args=[row[4]]) for row in rows]
+               + [reverse('posts:post_detail', args=[pk]) for pk in pks])
+    return len(rows)
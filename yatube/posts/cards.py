@@ -0,0 +1,178 @@
+import logging
+from urllib.parse import quote
+
+from django.conf import settings
+from django.middleware.csrf import get_token
+from django.template.defaultfilters import date
+from django.template.loader import get_template
+from django.urls import get_script_prefix, reverse
+from django.utils.html import conditional_escape
+from django.utils.http import RFC3986_SUBDELIMS
+from django.utils.safestring import mark_safe
+from django.utils.timezone import template_localtime
+from sorl.thumbnail import get_thumbnail
+
+from core.holes import render_hole
+from posts.reactions import load_reactions
+
+logger = logging.getLogger(__name__)
+
+CARD_TEMPLATE = 'posts/includes/posts_list.html'
+PLACEHOLDER = 'card-placeholder'
+NUMERIC_PLACEHOLDER = 918273645
+
+
+class UrlPattern:
+    """Один раз разворачивает URL и дальше только подставляет аргумент.
+
+    Аргумент экранируется так же, как это делает reverse(). Для URL
+    с числовым аргументом нужен numeric=True.
+    """
+
+    cache = {}
+
+    def __init__(self, name, numeric=False):
+        key = (name, get_script_prefix())
+        if key not in self.cache:
+            placeholder = str(NUMERIC_PLACEHOLDER if numeric else PLACEHOLDER)
+            self.cache[key] = reverse(name, args=[placeholder]).split(
+                placeholder
+            )
+        self.prefix, self.suffix = self.cache[key]
+
+    def __call__(self, arg):
+        return conditional_escape(
+            self.prefix
+            + quote(str(arg), safe=RFC3986_SUBDELIMS + '/~:@')
+            + self.suffix
+        )
+
+
+def thumbnail(image):
+    """Повторяет тег {% thumbnail %} из шаблона карточки."""
+    if not image:
+        return ''
+    try:
+        im = get_thumbnail(image, '960x339', crop='center', upscale=True)
+    except Exception:
+        logger.exception('Thumbnail tag failed')
+        return ''
+    if not im:
+        return ''
+    return ('\n  <img class="card-img my-2" src="'
+            f'{conditional_escape(im.url)}">\n')
+
+
+def card_follow(user, following_ids, author_id, username):
+    """Ссылка подписки на автора в карточке поста."""
+    if not user.is_authenticated or user.pk == author_id:
+        return ''
+    if author_id in following_ids:
+        link = (f'<a href="{UrlPattern("posts:profile_unfollow")(username)}">'
+                'Отписаться</a>')
+    else:
+        link = (f'<a href="{UrlPattern("posts:profile_follow")(username)}">'
+                'Подписаться</a>')
+    return f'\n    <li>\n      \n        {link}\n      \n    </li>\n  '
+
+
+def card_reactions(request, total, liked, post_id):
+    """Число лайков поста и кнопка лайка для вошедшего пользователя.
+
+    Лайк — POST-форма с CSRF-токеном; фрагмент персональный, поэтому
+    токен не попадает в общую страницу. next возвращает на страницу.
+    """
+    html = f'<li>Нравится: {total}</li>'
+    if not request.user.is_authenticated:
+        return html
+    if liked:
+        url, label = UrlPattern('posts:post_unlike', numeric=True), 'Убрать'
+    else:
+        url, label = UrlPattern('posts:post_like', numeric=True), 'Нравится'
+    return (
+        f'{html}\n  <li>\n    <form method="post" action="{url(post_id)}">\n'
+        '      <input type="hidden" name="csrfmiddlewaretoken" '
+        f'value="{get_token(request)}">\n'
+        '      <input type="hidden" name="next" '
+        f'value="{conditional_escape(request.get_full_path())}">\n'
+        '      <button type="submit" class="btn btn-link p-0">'
+        f'{label}</button>\n    </form>\n  </li>'
+    )
+
+
+def render_compiled(posts, request):
+    """Собирает HTML карточек постов без движка шаблонов.
+
+    Возвращает список карточек; склеенные вместе, они совпадают с циклом
+    по include posts/includes/posts_list.html. Ссылка подписки — это
+    персональный фрагмент card_follow, лайки — card_reactions.
+    """
+    group_url = UrlPattern('posts:group_list')
+    detail_url = UrlPattern('posts:post_detail', numeric=True)
+    dates = {}
+    cards = []
+    posts = list(posts)
+    for number, post in enumerate(posts, 1):
+        author = post.author
+        pub_date = template_localtime(post.pub_date)
+        if pub_date.date() not in dates:
+            dates[pub_date.date()] = conditional_escape(
+                date(pub_date, 'd E Y')
+            )
+        parts = [
+            '\n\n<ul>\n  <li>Автор: ',
+            conditional_escape(author.get_full_name()),
+            '</li>\n  <li>Дата публикации: ',
+            dates[pub_date.date()],
+            '</li>\n  ',
+            render_hole(request, 'card_follow', post.author_id,
+                        author.username),
+            '\n  ',
+            render_hole(request, 'card_reactions', post.pk),
+            '\n</ul>\n',
+            thumbnail(post.image),
+            '\n<p>',
+            post.preview_html,
+            '</p>\n',
+        ]
+        if post.is_truncated:
+            parts.append(f'\n  <a href="{detail_url(post.pk)}">'
+                         'читать дальше</a>\n')
+        parts.append('\n')
+        if post.group_id:
+            parts.append(
+                f'  \n  <a href="{group_url(post.group.slug)}">'
+                'все записи группы</a>\n'
+            )
+        parts.append('\n')
+        if number != len(posts):
+            parts.append('<hr>')
+        parts.append('\n')
+        cards.append(mark_safe(''.join(parts)))
+    return cards
+
+
+def render_template(posts, context):
+    """Рендерит карточки шаблоном, как {% include %} внутри цикла."""
+    template = get_template(CARD_TEMPLATE).template
+    posts = list(posts)
+    cards = []
+    with context.push():
+        for number, post in enumerate(posts, 1):
+            context['post'] = post
+            context['forloop'] = {'last': number == len(posts)}
+            cards.append(template.render(context))
+    return cards
+
+
+def render_cards(posts, context):
+    """Рендерит карточки ленты выбранным в FEED_CARD_RENDERER способом."""
+    posts = list(posts)
+    request = context['request']
+    if not getattr(request, 'punch_holes', False):
+        # Лайки всех карточек страницы — одним запросом, а не по одному
+        # в каждом фрагменте.
+        load_reactions(request, [post.pk for post in posts])
+    if settings.FEED_CARD_RENDERER == 'compiled':
+        return render_compiled(posts, context['request'])
+    return render_template(posts, context)
@@ -0,0 +1,91 @@
+from django.conf import settings
+from django.core.paginator import Paginator
+from django.db.models.functions import Substr
+
+from posts.models import Comment
+
+# Символов base36 на уровень: 36 ** 7 — больше 78 млрд комментариев.
+COMMENT_PATH_STEP = 7
+# Больше любого символа пути: [prefix, prefix + PATH_END) — все потомки.
+PATH_END = '~'
+DIGITS = '0123456789abcdefghijklmnopqrstuvwxyz'
+
+
+def path_segment(pk):
+    segment = ''
+    while pk:
+        pk, digit = divmod(pk, 36)
+        segment = DIGITS[digit] + segment
+    return segment.rjust(COMMENT_PATH_STEP, '0')
+
+
+def attach_to_thread(comment):
+    """Заполняет глубину нового комментария и путь его родителя.
+
+    Ответ глубже COMMENT_MAX_DEPTH прикрепляется к предку на последнем
+    уровне; предок находится по пути, а если он удалён, ответ остаётся
+    на его месте в ветке без родителя.
+    """
+    if comment.parent_id is None:
+        comment.path, comment.depth = '', 0
+        return
+    parent = comment.parent
+    if parent.depth >= settings.COMMENT_MAX_DEPTH:
+        comment.path = parent.path[
+            :settings.COMMENT_MAX_DEPTH * COMMENT_PATH_STEP]
+        ancestor_id = int(comment.path[-COMMENT_PATH_STEP:], 36)
+        comment.parent_id = (
+            ancestor_id if Comment.objects.filter(pk=ancestor_id).exists()
+            else None
+        )
+    else:
+        comment.path = parent.path
+    comment.depth = len(comment.path) // COMMENT_PATH_STEP
+
+
+def path_range(post_id, first, last):
+    """Ветки с корнями от first до last включительно — один диапазон
+    по индексу (post, path)."""
+    return Comment.objects.filter(
+        post=post_id, path__gte=first, path__lt=last + PATH_END
+    ).select_related('author').order_by('path')
+
+
+def subtree(comment):
+    """Комментарий со всеми ответами в порядке обхода в глубину."""
+    return path_range(comment.post_id, comment.path, comment.path)
+
+
+def with_tombstones(comments):
+    """Список комментариев, где ответ удалённого комментария помечен
+    tombstone: перед ним рисуется заглушка на месте родителя, одна на
+    всех его ответов."""
+    comments = list(comments)
+    removed = set()
+    for comment in comments:
+        parent_path = comment.path[:-COMMENT_PATH_STEP]
+        comment.tombstone = (comment.depth > 0 and comment.parent_id is None
+                             and parent_path not in removed)
+        if comment.tombstone:
+            removed.add(parent_path)
+    return comments
+
+
+def thread_page(request, post):
+    """Страница веток: COMMENT_THREADS_PER_PAGE веток со всеми ответами,
+    плоским списком для отрисовки в цикле.
+
+    Ветка — общий первый сегмент пути, поэтому ответы удалённого
+    комментария верхнего уровня остаются в своей ветке.
+    """
+    roots = Comment.objects.filter(post=post).annotate(
+        root=Substr('path', 1, COMMENT_PATH_STEP)
+    ).order_by('root').values_list('root', flat=True).distinct()
+    page = Paginator(roots, settings.COMMENT_THREADS_PER_PAGE).get_page(
+        request.GET.get('page'))
+    paths = list(page.object_list)
+    page.object_list = (
+        with_tombstones(path_range(post.pk, paths[0], paths[-1]))
+        if paths else []
+    )
+    return page
@@ -0,0 +1,113 @@
+import time
+
+from django.conf import settings
+from django.db import transaction
+from django.urls import reverse
+
+from core.db import pk_chunks, retry_on_locked
+from core.page_cache import purge_surrogate_keys
+from posts.bulk import move_posts
+from posts.feeds import feed_key
+from posts.models import (Comment, Deletion, Follow, Group, Reaction,
+                          ReactionCounter, Recommendation)
+from posts.reactions import remove_user_reactions
+from posts.sitemaps import invalidate as invalidate_sitemap
+from posts.static_export import mark_stale
+from users.forms import User
+
+
+def schedule_user_deletion(user):
+    """Скрывает пользователя сразу и ставит его удаление в очередь.
+
+    Неактивный пользователь не может войти, а его страницы и посты
+    отвечают 404 и пропадают из лент. Посты и остальные связанные записи
+    удаляет run_deletions.
+    """
+    with transaction.atomic():
+        User.objects.filter(pk=user.pk).update(is_active=False)
+        Deletion.objects.get_or_create(kind=Deletion.USER, object_id=user.pk)
+    posts = list(user.posts.values_list('pk', 'group__slug'))
+    slugs = {slug for _, slug in posts if slug}
+    purge_surrogate_keys(
+        'posts', f'author:{user.pk}', f'followers:{user.pk}',
+        f'following:{user.pk}', feed_key('site'),
+        feed_key('author', user.username),
+        *(f'post:{pk}' for pk, _ in posts),
+        *(feed_key('group', slug) for slug in slugs)
+    )
+    invalidate_sitemap('profiles', user.pk)
+    invalidate_sitemap('posts', *(pk for pk, _ in posts))
+    mark_stale([reverse('posts:index'),
+                reverse('posts:profile', args=[user.username])]
+               + [reverse('posts:post_detail', args=[pk]) for pk, _ in posts]
+               + [reverse('posts:group_list', args=[slug]) for slug in slugs])
+
+
+def schedule_group_deletion(group):
+    """Скрывает группу сразу и ставит её удаление в очередь.
+
+    Сохранение группы сбрасывает её страницы через сигнал group_saved.
+    """
+    with transaction.atomic():
+        group.deleted = True
+        group.save(update_fields=('deleted',))
+        Deletion.objects.get_or_create(kind=Deletion.GROUP,
+                                       object_id=group.pk)
+
+
+@retry_on_locked
+def delete_chunk(queryset, chunk):
+    queryset.model._default_manager.filter(pk__in=chunk).delete()
+
+
+def delete_in_chunks(queryset, pause=0):
+    """Удаляет выборку порциями, каждую в своей короткой транзакции.
+
+    Между порциями можно выдержать паузу, чтобы пропустить писателей.
+    """
+    for chunk in pk_chunks(queryset):
+        delete_chunk(queryset, chunk)
+        time.sleep(pause)
+
+
+def delete_user(user_id, pause=0):
+    user = User.objects.filter(pk=user_id).first()
+    if user is None:
+        return
+    # Сначала зависимые записи, чтобы каскад при удалении постов и
+    # самого пользователя был маленьким.
+    delete_in_chunks(Comment.objects.filter(author=user_id), pause)
+    delete_in_chunks(Comment.objects.filter(post__author=user_id), pause)
+    delete_in_chunks(Follow.objects.filter(user=user_id), pause)
+    delete_in_chunks(Follow.objects.filter(author=user_id), pause)
+    delete_in_chunks(Recommendation.objects.filter(user=user_id), pause)
+    delete_in_chunks(Recommendation.objects.filter(author=user_id), pause)
+    remove_user_reactions(user_id, pause)
+    delete_in_chunks(Reaction.objects.filter(post__author=user_id), pause)
+    delete_in_chunks(ReactionCounter.objects.filter(post__author=user_id),
+                     pause)
+    delete_in_chunks(user.posts.all(), pause)
+    retry_on_locked(user.delete)()
+
+
+def delete_group(group_id, pause=0):
+    group = Group.all_objects.filter(pk=group_id).first()
+    if group is None:
+        return
+    # Посты остаются без группы; move_posts идёт порциями и обновляет
+    # статистику и кеш, которые каскад SET_NULL обошёл бы.
+    move_posts(group.posts.all(), None)
+    retry_on_locked(group.delete)()
+
+
+def run_deletions(pause=None):
+    """Выполняет очередь удалений; возвращает число удалённых объектов."""
+    if pause is None:
+        pause = settings.DELETION_PAUSE
+    handlers = {Deletion.USER: delete_user, Deletion.GROUP: delete_group}
+    done = 0
+    for deletion in Deletion.objects.all():
+        handlers[deletion.kind](deletion.object_id, pause)
+        deletion.delete()
+        done += 1
+    return done
@@ -0,0 +1,153 @@
+import hashlib
+
+from django.conf import settings
+from django.contrib.syndication.views import Feed
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.shortcuts import get_object_or_404
+from django.urls import reverse, reverse_lazy
+from django.utils.feedgenerator import Atom1Feed
+from django.utils.text import Truncator
+from django.views.decorators.http import condition
+
+from core.page_cache import surrogate_version
+from core.routers import cache_timeout
+from posts.models import Group, Post
+from users.forms import User
+
+
+def feed_key(kind, name=None):
+    """Ключ сброса ленты: сайта, группы по слагу или автора по имени.
+
+    Имя хешируется, как адрес в page_key: в именах пользователей бывают
+    пробелы и символы, недопустимые в ключах memcached.
+    """
+    if not name:
+        return f'feed:{kind}'
+    return f'feed:{kind}:{hashlib.md5(name.encode()).hexdigest()}'
+
+
+def recent_posts(posts):
+    """Свежие посты для ленты одним запросом по индексу первичного ключа.
+
+    Читаются только поля, которые попадают в ленту; посты скрытых
+    авторов пропускаются.
+    """
+    return posts.filter(author__is_active=True).select_related(
+        'author'
+    ).only(
+        'pk', 'text', 'pub_date', 'preview_html',
+        'author__username', 'author__first_name', 'author__last_name'
+    ).order_by('-pk')[:settings.FEED_POSTS_AMOUNT]
+
+
+class PostsFeed(Feed):
+    def item_title(self, item):
+        return Truncator(item.text).chars(settings.FEED_TITLE_LENGTH)
+
+    def item_description(self, item):
+        return item.preview_html
+
+    def item_link(self, item):
+        return reverse('posts:post_detail', args=[item.pk])
+
+    def item_pubdate(self, item):
+        return item.pub_date
+
+    def item_author_name(self, item):
+        return item.author.get_full_name() or item.author.username
+
+
+class SiteFeed(PostsFeed):
+    title = 'Yatube: новые записи'
+    link = reverse_lazy('posts:index')
+    description = 'Последние записи всех авторов'
+
+    def items(self):
+        return recent_posts(Post.objects.all())
+
+
+class GroupFeed(PostsFeed):
+    def get_object(self, request, slug):
+        return get_object_or_404(Group, slug=slug)
+
+    def title(self, obj):
+        return f'Yatube: {obj.title}'
+
+    def link(self, obj):
+        return reverse('posts:group_list', args=[obj.slug])
+
+    def description(self, obj):
+        return obj.description
+
+    def items(self, obj):
+        return recent_posts(obj.posts.all())
+
+
+class AuthorFeed(PostsFeed):
+    def get_object(self, request, username):
+        return get_object_or_404(User, username=username,
+                                 is_active=True)
+
+    def title(self, obj):
+        return f'Yatube: {obj.get_full_name() or obj.username}'
+
+    def link(self, obj):
+        return reverse('posts:profile', args=[obj.username])
+
+    def description(self, obj):
+        return f'Последние записи пользователя {obj.username}'
+
+    def items(self, obj):
+        return recent_posts(obj.posts.all())
+
+
+class SiteAtomFeed(SiteFeed):
+    feed_type = Atom1Feed
+    subtitle = SiteFeed.description
+
+
+class GroupAtomFeed(GroupFeed):
+    feed_type = Atom1Feed
+
+    def subtitle(self, obj):
+        return self.description(obj)
+
+
+class AuthorAtomFeed(AuthorFeed):
+    feed_type = Atom1Feed
+
+    def subtitle(self, obj):
+        return self.description(obj)
+
+
+def cached_feed(feed, kind):
+    """Представление ленты с кешем и ответом 304 по ETag.
+
+    Версия ленты — время последнего сброса её ключа (feed_key), поэтому
+    ETag и кеш сверяются без обращения к базе: опрос неизменившейся
+    ленты стоит нескольких чтений из кеша.
+    """
+    name = type(feed).__name__
+
+    def version(request, **kwargs):
+        return surrogate_version(feed_key(kind, *kwargs.values()))
+
+    def etag(request, **kwargs):
+        return f'{name}-{version(request, **kwargs)}'
+
+    @condition(etag_func=etag)
+    def view(request, **kwargs):
+        key = '{}:{}:{}:{}'.format(
+            feed_key(kind, *kwargs.values()), name,
+            version(request, **kwargs), request.get_host()
+        )
+        cached = cache.get(key)
+        if cached is None:
+            response = feed(request, **kwargs)
+            cache.set(key, (response.content, response['Content-Type']),
+                      cache_timeout(settings.FEED_CACHE_TIMEOUT))
+            return response
+        content, content_type = cached
+        return HttpResponse(content, content_type=content_type)
+    return view
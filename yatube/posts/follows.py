@@ -0,0 +1,134 @@
+from django.conf import settings
+from django.core.cache import cache
+
+from core.page_cache import purge_surrogate_keys
+from posts.models import Follow, Recommendation
+from users.forms import User
+
+
+def following_key(user_id):
+    return f'following:{user_id}'
+
+
+def get_following_ids(user):
+    """Возвращает множество id авторов, на которых подписан пользователь.
+
+    Множество загружается из базы при первом обращении и дальше
+    живёт в кеше.
+    """
+    if not user.is_authenticated:
+        return frozenset()
+    key = following_key(user.pk)
+    following = cache.get(key)
+    if following is None:
+        following = frozenset(
+            Follow.objects.filter(user=user).values_list(
+                'author_id', flat=True
+            )
+        )
+        cache.set(key, following, settings.FOLLOW_CACHE_TIMEOUT)
+    return following
+
+
+def add_following(user_id, *author_ids):
+    """Добавляет авторов в закешированное множество подписок."""
+    key = following_key(user_id)
+    following = cache.get(key)
+    if following is not None:
+        cache.set(key, following | set(author_ids),
+                  settings.FOLLOW_CACHE_TIMEOUT)
+
+
+def remove_following(user_id, *author_ids):
+    """Убирает авторов из закешированного множества подписок."""
+    key = following_key(user_id)
+    following = cache.get(key)
+    if following is not None:
+        cache.set(key, following - set(author_ids),
+                  settings.FOLLOW_CACHE_TIMEOUT)
+
+
+def purge_follow_pages(user_id, author_ids):
+    purge_surrogate_keys(f'following:{user_id}',
+                         *(f'followers:{pk}' for pk in author_ids))
+
+
+def find_authors(user, usernames):
+    """id авторов по именам одним запросом, без самого пользователя."""
+    authors = dict(User.objects.filter(
+        username__in=usernames, is_active=True
+    ).exclude(pk=user.pk).values_list('username', 'pk'))
+    unknown = [name for name in usernames
+               if name not in authors and name != user.username]
+    return authors, unknown
+
+
+def follow_authors(user, usernames):
+    """Подписывает пользователя на авторов из списка имён.
+
+    Подписки вставляются одним bulk_create, который не вызывает
+    сигналы, поэтому кеш подписок и страниц обновляется здесь, один
+    раз на весь список. Новые подписки определяются по базе, а не по
+    кешу, который мог отстать. Возвращает число новых подписок и имена,
+    которых нет на сайте.
+    """
+    authors, unknown = find_authors(user, usernames)
+    existing = set(Follow.objects.filter(
+        user=user, author__in=authors.values()
+    ).values_list('author_id', flat=True))
+    new_ids = set(authors.values()) - existing
+    Follow.objects.bulk_create(
+        (Follow(user=user, author_id=pk) for pk in new_ids),
+        ignore_conflicts=True
+    )
+    add_following(user.pk, *new_ids)
+    purge_follow_pages(user.pk, new_ids)
+    return len(new_ids), unknown
+
+
+def unfollow_authors(user, usernames):
+    """Отписывает пользователя от авторов из списка имён.
+
+    Подписки удаляются одним запросом без сигналов post_delete, как и
+    в follow_authors: кеш подписок и страниц обновляется здесь, один
+    раз на весь список. Возвращает число удалённых подписок и имена,
+    которых нет на сайте.
+    """
+    authors, unknown = find_authors(user, usernames)
+    follows = Follow.objects.filter(user=user, author__in=authors.values())
+    removed_ids = set(follows.values_list('author_id', flat=True))
+    removed = follows._raw_delete(follows.db)
+    remove_following(user.pk, *removed_ids)
+    purge_follow_pages(user.pk, removed_ids)
+    return removed, unknown
+
+
+def following_filter(user):
+    """Условие для выборки постов из ленты подписок.
+
+    Небольшое множество подставляется в запрос списком, а очень большое
+    заменяется подзапросом, чтобы не упереться в лимит параметров SQLite.
+    """
+    following = get_following_ids(user)
+    if len(following) > settings.FOLLOW_IN_LIMIT:
+        return {
+            'author__in': Follow.objects.filter(user=user).values('author')
+        }
+    return {'author__in': following}
+
+
+def get_recommendations(user):
+    """Рекомендации «кого читать», посчитанные командой recommend_follows.
+
+    Скрытые авторы не показываются, а те, на кого пользователь успел
+    подписаться после пересчёта, отбрасываются по закешированному
+    множеству подписок.
+    """
+    if not user.is_authenticated:
+        return []
+    following = get_following_ids(user)
+    recommendations = Recommendation.objects.filter(
+        user=user, author__is_active=True
+    ).select_related('author')[:settings.RECOMMENDATIONS_AMOUNT]
+    return [recommendation for recommendation in recommendations
+            if recommendation.author_id not in following]
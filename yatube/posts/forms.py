@@ -1,4 +1,7 @@
+import re
+
 from django import forms
+from django.conf import settings
 
 from posts.models import Comment
 from posts.models import Post
@@ -12,9 +15,42 @@ class PostForm(forms.ModelForm):
                   'group': 'Название группы',
                   'image': 'Изображение'}
 
+    def __init__(self, *args, upload_error=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.upload_error = upload_error
+
+    def clean(self):
+        cleaned_data = super().clean()
+        # Загрузка, прерванная ImageUploadHandler.
+        if self.upload_error:
+            self.add_error('image', self.upload_error)
+        return cleaned_data
+
 
 class CommentForm(forms.ModelForm):
     class Meta:
         model = Comment
         fields = ('text',)
         labels = {'text': 'Текст комментария'}
+
+
+class FollowImportForm(forms.Form):
+    usernames = forms.CharField(
+        label='Имена авторов',
+        help_text='Через пробел, запятую или с новой строки',
+        widget=forms.Textarea
+    )
+
+    def clean_usernames(self):
+        names = (name.lstrip('@') for name in
+                 re.split(r'[\s,;]+', self.cleaned_data['usernames']))
+        names = list(dict.fromkeys(name for name in names if name))
+        if len(names) > settings.FOLLOW_IMPORT_LIMIT:
+            raise forms.ValidationError(
+                f'Не больше {settings.FOLLOW_IMPORT_LIMIT} имён за раз')
+        return names
+
+
+class FollowBatchForm(FollowImportForm):
+    action = forms.ChoiceField(choices=(('follow', 'Подписаться'),
+                                        ('unfollow', 'Отписаться')))
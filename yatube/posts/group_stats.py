@@ -0,0 +1,40 @@
+from django.db.models import Count, F, Max, Q
+from django.db.models.functions import Greatest
+
+from posts.models import Group, GroupStats, Post
+
+
+def post_added(group_id, pub_date, count=1):
+    """Учитывает посты, появившиеся в группе; pub_date — самый свежий."""
+    stats = GroupStats.objects.filter(group_id=group_id)
+    stats.update(post_count=F('post_count') + count)
+    stats.filter(
+        Q(last_post_date__lt=pub_date) | Q(last_post_date__isnull=True)
+    ).update(last_post_date=pub_date)
+
+
+def post_removed(group_id, pub_date, count=1):
+    """Учитывает посты, удалённые из группы или перенесённые в другую.
+
+    Дата последней активности пересчитывается, только если ушёл
+    самый свежий пост группы.
+    """
+    stats = GroupStats.objects.filter(group_id=group_id)
+    stats.filter(post_count__gt=0).update(
+        post_count=Greatest(F('post_count') - count, 0))
+    if stats.filter(last_post_date=pub_date).exists():
+        stats.update(last_post_date=Post.objects.filter(
+            group_id=group_id).aggregate(Max('pub_date'))['pub_date__max'])
+
+
+def rebuild_group_stats():
+    """Пересчитывает статистику всех групп с нуля."""
+    groups = Group.objects.annotate(
+        post_count=Count('posts'), last_post_date=Max('posts__pub_date')
+    ).values_list('pk', 'post_count', 'last_post_date')
+    GroupStats.objects.all().delete()
+    GroupStats.objects.bulk_create(
+        GroupStats(group_id=pk, post_count=post_count,
+                   last_post_date=last_post_date)
+        for pk, post_count, last_post_date in groups.iterator()
+    )
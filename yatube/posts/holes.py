@@ -0,0 +1,71 @@
+from django.template.loader import render_to_string
+
+from core.holes import fragment
+from posts.cards import card_follow, card_reactions
+from posts.follows import get_following_ids, get_recommendations
+from posts.forms import CommentForm
+from posts.reactions import load_reactions
+
+
+def request_following_ids(request):
+    """Подписки пользователя, прочитанные из кеша один раз за запрос."""
+    if not hasattr(request, '_following_ids'):
+        request._following_ids = get_following_ids(request.user)
+    return request._following_ids
+
+
+@fragment('card_follow')
+def card_follow_fragment(request, author_id, username):
+    return card_follow(request.user, request_following_ids(request),
+                       int(author_id), username)
+
+
+def prefetch_reactions(request, args_list):
+    load_reactions(request, [int(post_id) for post_id, in args_list])
+
+
+@fragment('card_reactions', prefetch=prefetch_reactions)
+def card_reactions_fragment(request, post_id):
+    post_id = int(post_id)
+    totals, liked = load_reactions(request, [post_id])
+    return card_reactions(request, totals[post_id], post_id in liked,
+                          post_id)
+
+
+@fragment('follow_button')
+def follow_button(request, author_id, username):
+    author_id = int(author_id)
+    return render_to_string('posts/includes/follow_button.html', {
+        'following': (request.user.pk != author_id
+                      and author_id in request_following_ids(request)),
+        'username': username
+    }, request=request)
+
+
+@fragment('edit_link')
+def edit_link(request, post_id, author_id):
+    return render_to_string('posts/includes/edit_link.html', {
+        'post_id': post_id,
+        'author_id': int(author_id)
+    }, request=request)
+
+
+@fragment('comment_form')
+def comment_form(request, post_id):
+    return render_to_string('posts/includes/comment_form.html', {
+        'post_id': post_id,
+        'form': CommentForm()
+    }, request=request)
+
+
+@fragment('switcher')
+def switcher(request, tab=None):
+    return render_to_string('posts/includes/switcher.html', {'tab': tab},
+                            request=request)
+
+
+@fragment('recommendations')
+def recommendations(request):
+    return render_to_string('posts/includes/recommendations.html', {
+        'recommendations': get_recommendations(request.user)
+    }, request=request)
@@ -0,0 +1,76 @@
+import time
+
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.core.management.base import BaseCommand
+from django.template import Context, Template
+from django.test import RequestFactory
+from django.utils import timezone
+
+from posts.cards import render_compiled
+from posts.models import Group, Post
+from users.forms import User
+
+INCLUDE_LOOP = Template(
+    "{% for post in posts %}"
+    "{% include 'posts/includes/posts_list.html' %}"
+    "{% endfor %}"
+)
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает стоимость отрисовки карточки ленты шаблоном '
+            'и скомпилированным рендерером.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=200)
+
+    def handle(self, *args, **options):
+        reader = User(pk=1, username='reader')
+        author = User(pk=2, username='author', first_name='Лев',
+                      last_name='Толстой')
+        group = Group(pk=1, title='Группа', slug='group')
+        posts = [
+            Post(pk=number, author=author, group=group,
+                 pub_date=timezone.now(),
+                 text='Абзац текста поста.\n\n' * 5)
+            for number in range(settings.POSTS_AMOUNT)
+        ]
+        scenarios = (
+            ('index', AnonymousUser(), frozenset()),
+            ('group_posts', reader, frozenset()),
+            ('profile', reader, frozenset()),
+            ('follow', reader, frozenset({author.pk})),
+        )
+        for name, user, following_ids in scenarios:
+            request = self.make_request(user, following_ids, posts)
+            context = {'posts': posts, 'user': user, 'request': request}
+            template = self.measure(
+                lambda: INCLUDE_LOOP.render(Context(context)),
+                options['repeat'], len(posts)
+            )
+            compiled = self.measure(
+                lambda: render_compiled(posts, request),
+                options['repeat'], len(posts)
+            )
+            self.stdout.write(
+                f'{name:<12} шаблон: {template:>7.1f} мкс/карточка  '
+                f'compiled: {compiled:>6.1f} мкс/карточка  '
+                f'ускорение: x{template / compiled:.1f}'
+            )
+
+    def make_request(self, user, following_ids, posts):
+        """Запрос пользователя с уже загруженными подписками и лайками:
+        фрагменты карточек рендерятся без обращения к кешу и базе."""
+        request = RequestFactory().get('/')
+        request.user = user
+        request._following_ids = following_ids
+        request._reactions = ({post.pk: 0 for post in posts}, set())
+        return request
+
+    def measure(self, render, repeat, cards):
+        render()
+        started = time.perf_counter()
+        for _ in range(repeat):
+            render()
+        return (time.perf_counter() - started) / repeat / cards * 1e6
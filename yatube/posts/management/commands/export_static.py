@@ -0,0 +1,41 @@
+from django.core.management.base import BaseCommand
+
+from posts.models import StalePage
+from posts.static_export import all_paths, export_path, mark_stale
+
+BATCH_SIZE = 500
+
+
+class Command(BaseCommand):
+    help = ('Выгружает анонимные страницы в статический HTML. По умолчанию '
+            'перегенерирует только страницы, затронутые изменениями.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true',
+                            help='Выгрузить все страницы заново.')
+
+    def handle(self, *args, **options):
+        if options['all']:
+            StalePage.objects.all().delete()
+            paths = all_paths()
+        else:
+            paths = list(StalePage.objects.values_list('path', flat=True))
+            # Пометки снимаются заранее: всё, что изменится во время
+            # выгрузки, попадёт в следующий запуск.
+            for start in range(0, len(paths), BATCH_SIZE):
+                StalePage.objects.filter(
+                    path__in=paths[start:start + BATCH_SIZE]
+                ).delete()
+        exported = removed = 0
+        for path in paths:
+            try:
+                if export_path(path):
+                    exported += 1
+                else:
+                    removed += 1
+            except Exception:
+                mark_stale([path])
+                raise
+        self.stdout.write(
+            f'Выгружено страниц: {exported}, удалено: {removed}'
+        )
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from posts.group_stats import rebuild_group_stats
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает число постов и дату активности всех групп.'
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            rebuild_group_stats()
+        self.stdout.write('Статистика групп пересчитана')
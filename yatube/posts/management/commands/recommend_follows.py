@@ -0,0 +1,55 @@
+import datetime as dt
+
+import numpy as np
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count
+from django.utils import timezone
+
+from posts.models import Follow, Post, Recommendation
+from posts.recommendations import score_candidates
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает рекомендации «кого читать» для всех пользователей.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--limit', type=int, default=settings.RECOMMENDATIONS_AMOUNT,
+            help='Сколько рекомендаций сохранять на пользователя.'
+        )
+        parser.add_argument(
+            '--days', type=int, default=settings.RECOMMENDATIONS_DAYS,
+            help='За сколько дней учитывать активность авторов.'
+        )
+
+    def handle(self, *args, **options):
+        follows = np.fromiter(
+            (value for pair in Follow.objects.values_list(
+                'user_id', 'author_id').iterator() for value in pair),
+            dtype=np.int64
+        )
+        since = timezone.now() - dt.timedelta(days=options['days'])
+        activity = np.fromiter(
+            (value for pair in Post.objects.filter(
+                pub_date__gte=since).values_list('author').annotate(
+                    Count('id')).order_by().iterator() for value in pair),
+            dtype=np.int64
+        )
+        users, authors, scores = score_candidates(
+            follows, activity, options['limit']
+        )
+        recommendations = [
+            Recommendation(user_id=user, author_id=author, score=score)
+            for user, author, score in zip(
+                users.tolist(), authors.tolist(), scores.tolist()
+            )
+        ]
+        with transaction.atomic():
+            Recommendation.objects.all().delete()
+            Recommendation.objects.bulk_create(recommendations,
+                                               batch_size=500)
+        self.stdout.write(
+            f'Сохранено рекомендаций: {len(recommendations)}'
+        )
@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from core.db import pk_chunks
+from posts.markup import render_post
+from posts.models import Post
+
+
+class Command(BaseCommand):
+    help = 'Заполняет готовый HTML текста и превью у постов.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true',
+                            help='Перерендерить все посты, а не только '
+                                 'посты без HTML.')
+
+    def handle(self, *args, **options):
+        posts = Post.objects.all()
+        if not options['all']:
+            posts = posts.filter(text_html='')
+        rendered = 0
+        for chunk in pk_chunks(posts):
+            batch = list(Post.objects.filter(pk__in=chunk).only('text'))
+            for post in batch:
+                render_post(post)
+            with transaction.atomic():
+                Post.objects.bulk_update(
+                    batch, ('text_html', 'preview_html'))
+            rendered += len(batch)
+        self.stdout.write(f'Отрендерено постов: {rendered}')
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from posts.deletion import run_deletions
+
+
+class Command(BaseCommand):
+    help = ('Удаляет пользователей и группы из очереди удалений, '
+            'порциями в коротких транзакциях.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--pause', type=float,
+                            help='Пауза между порциями в секундах.')
+
+    def handle(self, *args, **options):
+        done = run_deletions(options['pause'])
+        self.stdout.write(f'Удалено объектов: {done}')
@@ -0,0 +1,22 @@
+from django.conf import settings
+from django.template.defaultfilters import linebreaks_filter
+from django.utils.text import Truncator
+
+
+def render_text(text):
+    """HTML текста поста: экранированный, с абзацами и переносами."""
+    return linebreaks_filter(text, autoescape=True)
+
+
+def render_html(text):
+    """HTML текста и превью; превью укорочено до POST_PREVIEW_LENGTH."""
+    text_html = render_text(text)
+    if len(text) > settings.POST_PREVIEW_LENGTH:
+        return text_html, render_text(
+            Truncator(text).chars(settings.POST_PREVIEW_LENGTH))
+    return text_html, text_html
+
+
+def render_post(post):
+    """Заполняет text_html и preview_html поста по его тексту."""
+    post.text_html, post.preview_html = render_html(post.text)
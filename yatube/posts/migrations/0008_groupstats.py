@@ -0,0 +1,37 @@
+# Generated by Django 2.2.16 on 2026-10-19 09:52
+
+from django.db import migrations, models
+from django.db.models import Count, Max
+import django.db.models.deletion
+
+
+def fill_group_stats(apps, schema_editor):
+    Group = apps.get_model('posts', 'Group')
+    GroupStats = apps.get_model('posts', 'GroupStats')
+    groups = Group.objects.annotate(
+        post_count=Count('posts'), last_post_date=Max('posts__pub_date')
+    )
+    GroupStats.objects.bulk_create(
+        GroupStats(group_id=group.pk, post_count=group.post_count,
+                   last_post_date=group.last_post_date)
+        for group in groups.iterator()
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0007_auto_20261019_0947'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GroupStats',
+            fields=[
+                ('group', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to='posts.Group')),
+                ('post_count', models.PositiveIntegerField(default=0)),
+                ('last_post_date', models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+        migrations.RunPython(fill_group_stats, migrations.RunPython.noop),
+    ]
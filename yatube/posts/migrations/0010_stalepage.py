@@ -0,0 +1,19 @@
+# Generated by Django 2.2.16 on 2026-10-19 09:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0009_follow_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StalePage',
+            fields=[
+                ('path', models.CharField(max_length=255, primary_key=True, serialize=False)),
+            ],
+        ),
+    ]
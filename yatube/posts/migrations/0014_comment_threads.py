@@ -0,0 +1,59 @@
+# Generated by Django 2.2.16 on 2026-10-19 10:29
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+BATCH_SIZE = 1000
+DIGITS = '0123456789abcdefghijklmnopqrstuvwxyz'
+
+
+def path_segment(pk):
+    """Копия posts.comments.path_segment на момент миграции."""
+    segment = ''
+    while pk:
+        pk, digit = divmod(pk, 36)
+        segment = DIGITS[digit] + segment
+    return segment.rjust(7, '0')
+
+
+def fill_comment_paths(apps, schema_editor):
+    """Существующие комментарии становятся корнями своих веток."""
+    Comment = apps.get_model('posts', 'Comment')
+    comments = []
+    for comment in Comment.objects.only('pk').iterator():
+        comment.path = path_segment(comment.pk)
+        comments.append(comment)
+        if len(comments) == BATCH_SIZE:
+            Comment.objects.bulk_update(comments, ('path',))
+            comments = []
+    Comment.objects.bulk_update(comments, ('path',))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0013_deletion_queue'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='comment',
+            name='depth',
+            field=models.PositiveSmallIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='comment',
+            name='parent',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='replies', to='posts.Comment'),
+        ),
+        migrations.AddField(
+            model_name='comment',
+            name='path',
+            field=models.CharField(default='', editable=False, max_length=255),
+        ),
+        migrations.RunPython(fill_comment_paths, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['post', 'path'], name='comment_thread'),
+        ),
+    ]
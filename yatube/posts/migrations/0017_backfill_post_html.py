@@ -0,0 +1,54 @@
+from django.conf import settings
+from django.db import migrations, transaction
+from django.template.defaultfilters import linebreaks_filter
+from django.utils.text import Truncator
+
+BATCH_SIZE = 1000
+
+
+def pk_chunks(queryset):
+    """Копия core.db.pk_chunks на момент миграции."""
+    pks = queryset.order_by('pk').values_list('pk', flat=True)
+    chunk = list(pks[:BATCH_SIZE])
+    while chunk:
+        yield chunk
+        chunk = list(pks.filter(pk__gt=chunk[-1])[:BATCH_SIZE])
+
+
+def render_text(text):
+    return linebreaks_filter(text, autoescape=True)
+
+
+def render_html(text):
+    """Копия posts.markup.render_html на момент миграции."""
+    text_html = render_text(text)
+    if len(text) > settings.POST_PREVIEW_LENGTH:
+        return text_html, render_text(
+            Truncator(text).chars(settings.POST_PREVIEW_LENGTH))
+    return text_html, text_html
+
+
+def render_posts(apps, schema_editor):
+    """Заполняет HTML постов, созданных до 0011, порциями, как
+    команда render_posts."""
+    Post = apps.get_model('posts', 'Post')
+    for chunk in pk_chunks(Post.objects.filter(text_html='')):
+        batch = list(Post.objects.filter(pk__in=chunk).only('text'))
+        for post in batch:
+            post.text_html, post.preview_html = render_html(post.text)
+        with transaction.atomic():
+            Post.objects.bulk_update(batch, ('text_html', 'preview_html'))
+
+
+class Migration(migrations.Migration):
+    # Каждая порция фиксируется отдельно, а не одной транзакцией на все
+    # посты.
+    atomic = False
+
+    dependencies = [
+        ('posts', '0016_comment_parent_set_null'),
+    ]
+
+    operations = [
+        migrations.RunPython(render_posts, migrations.RunPython.noop),
+    ]
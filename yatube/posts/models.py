@@ -1,14 +1,25 @@
 from django.conf import settings
 from django.contrib.auth import get_user_model
-from django.db import models
+from django.db import models, transaction
 
 User = get_user_model()
 
 
+class GroupManager(models.Manager):
+    """Группы без поставленных в очередь на удаление."""
+
+    def get_queryset(self):
+        return super().get_queryset().filter(deleted=False)
+
+
 class Group(models.Model):
     title = models.CharField(max_length=200)
     slug = models.SlugField(max_length=200, unique=True)
     description = models.TextField(max_length=400)
+    deleted = models.BooleanField(default=False, editable=False)
+
+    objects = GroupManager()
+    all_objects = models.Manager()
 
     def __str__(self) -> str:
         return self.title
@@ -34,6 +45,9 @@ class Post(models.Model):
         upload_to='posts/',
         blank=True
     )
+    # Готовый HTML текста и превью; заполняются при сохранении поста.
+    text_html = models.TextField(blank=True, editable=False)
+    preview_html = models.TextField(blank=True, editable=False)
 
     class Meta:
         ordering = ('pub_date',)
@@ -41,6 +55,10 @@ class Post(models.Model):
     def __str__(self) -> str:
         return self.text[:settings.TEXT_LENGTH]
 
+    @property
+    def is_truncated(self) -> bool:
+        return len(self.text) > settings.POST_PREVIEW_LENGTH
+
 
 class Comment(models.Model):
     post = models.ForeignKey(
@@ -55,10 +73,39 @@ class Comment(models.Model):
     )
     text = models.TextField()
     created = models.DateTimeField(auto_now_add=True)
+    parent = models.ForeignKey(
+        'self',
+        blank=True,
+        null=True,
+        on_delete=models.SET_NULL,
+        related_name='replies'
+    )
+    # Материализованный путь: первичные ключи предков и самого
+    # комментария, по COMMENT_PATH_STEP символов в base36. Сортировка по
+    # пути даёт ветку в порядке обхода в глубину (см. posts.comments).
+    # Ответы удалённого комментария остаются на месте по пути, только
+    # parent у них обнуляется.
+    path = models.CharField(max_length=255, editable=False, default='')
+    depth = models.PositiveSmallIntegerField(editable=False, default=0)
+
+    class Meta:
+        indexes = (
+            models.Index(fields=('post', 'path'), name='comment_thread'),
+        )
 
     def __str__(self) -> str:
         return self.text[:settings.TEXT_LENGTH]
 
+    def save(self, *args, **kwargs):
+        if self.pk is not None:
+            return super().save(*args, **kwargs)
+        from posts.comments import attach_to_thread, path_segment
+        attach_to_thread(self)
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            self.path += path_segment(self.pk)
+            Comment.objects.filter(pk=self.pk).update(path=self.path)
+
 
 class Follow(models.Model):
     user = models.ForeignKey(
@@ -72,5 +119,130 @@ class Follow(models.Model):
         related_name='following'
     )
 
+    class Meta:
+        indexes = (
+            models.Index(fields=('author', 'id'), name='follow_author_id'),
+            models.Index(fields=('user', 'id'), name='follow_user_id'),
+        )
+        constraints = (
+            models.UniqueConstraint(fields=('user', 'author'),
+                                    name='unique_follow'),
+        )
+
     def __str__(self) -> str:
         return f'Подписка {self.user} на {self.author}'
+
+
+class Recommendation(models.Model):
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='recommendations'
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='recommended_to'
+    )
+    score = models.FloatField()
+
+    class Meta:
+        ordering = ('-score',)
+        indexes = (
+            models.Index(fields=('user', '-score'),
+                         name='recommendation_user_score'),
+        )
+        constraints = (
+            models.UniqueConstraint(fields=('user', 'author'),
+                                    name='unique_recommendation'),
+        )
+
+    def __str__(self) -> str:
+        return f'Рекомендация {self.author} для {self.user}'
+
+
+class Reaction(models.Model):
+    """Лайк пользователя посту; счётчики — в ReactionCounter."""
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='reactions'
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='reactions'
+    )
+    created = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = (
+            models.UniqueConstraint(fields=('user', 'post'),
+                                    name='unique_reaction'),
+        )
+
+
+class ReactionCounter(models.Model):
+    """Одна из REACTION_SHARDS частей счётчика лайков поста.
+
+    Лайки разных пользователей увеличивают разные строки, поэтому
+    популярный пост не превращается в одну горячую строку; итог —
+    сумма частей (см. posts.reactions).
+    """
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='reaction_counters'
+    )
+    shard = models.PositiveSmallIntegerField()
+    count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = (
+            models.UniqueConstraint(fields=('post', 'shard'),
+                                    name='unique_reaction_shard'),
+        )
+
+
+class GroupStats(models.Model):
+    group = models.OneToOneField(
+        Group,
+        primary_key=True,
+        on_delete=models.CASCADE,
+        related_name='stats'
+    )
+    post_count = models.PositiveIntegerField(default=0)
+    last_post_date = models.DateTimeField(blank=True, null=True)
+
+    def __str__(self) -> str:
+        return f'Статистика группы {self.group}'
+
+
+class StalePage(models.Model):
+    """Страница статического экспорта, которую нужно перегенерировать."""
+    path = models.CharField(max_length=255, primary_key=True)
+
+    def __str__(self) -> str:
+        return self.path
+
+
+class Deletion(models.Model):
+    """Пользователь или группа в очереди на удаление (run_deletions)."""
+    USER = 'user'
+    GROUP = 'group'
+
+    kind = models.CharField(max_length=10,
+                            choices=((USER, 'Пользователь'),
+                                     (GROUP, 'Группа')))
+    object_id = models.PositiveIntegerField()
+    created = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ('created',)
+        constraints = (
+            models.UniqueConstraint(fields=('kind', 'object_id'),
+                                    name='unique_deletion'),
+        )
+
+    def __str__(self) -> str:
+        return f'Удаление {self.kind} {self.object_id}'
@@ -0,0 +1,112 @@
+import bisect
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from posts.models import Post
+
+CREATED_KEY = 'posts:created'
+CHANGED_KEY = 'posts:changed'
+
+
+def bump(key):
+    """Ставит в кеш новую отметку времени: incr файлового кеша не
+    атомарен, а отметка в наносекундах у каждого сдвига своя, и
+    процессы сравнивают её только на равенство."""
+    cache.set(key, time.time_ns(), None)
+
+
+class NewPostsTracker:
+    """Последние посты в памяти процесса для опроса «есть ли новое».
+
+    Хранит id, автора и слаг группы последних NEW_POSTS_BUFFER постов.
+    Общие для всех процессов отметки в кеше двигаются после коммита:
+    CREATED_KEY — при создании поста, тогда процесс дочитывает новые
+    посты; CHANGED_KEY — при переносе в другую группу или удалении,
+    тогда процесс перечитывает буфер целиком. Пока отметки не
+    сдвинулись, ответ считается без обращения к базе.
+    """
+
+    def __init__(self, size):
+        self.size = size
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.ids = []
+        self.posts = []
+        self.loaded = False
+        self.truncated = False
+        self.versions = None
+
+    @property
+    def high_water(self):
+        return self.ids[-1] if self.ids else 0
+
+    def _rows(self, queryset):
+        return queryset.values_list('id', 'author_id', 'group__slug')
+
+    def _extend(self, rows):
+        for row in rows:
+            if row[0] > self.high_water:
+                self.ids.append(row[0])
+                self.posts.append(row)
+        overflow = len(self.ids) - self.size
+        if overflow > 0:
+            del self.ids[:overflow]
+            del self.posts[:overflow]
+            self.truncated = True
+
+    def sync(self):
+        with self.lock:
+            # Отметки читаются до базы: пост, созданный во время
+            # чтения, сдвинет их ещё раз.
+            cached = cache.get_many((CREATED_KEY, CHANGED_KEY))
+            versions = (cached.get(CREATED_KEY, 0),
+                        cached.get(CHANGED_KEY, 0))
+            if not self.loaded or versions[1] != self.versions[1]:
+                self.ids, self.posts = [], []
+                rows = list(self._rows(
+                    Post.objects.order_by('-id'))[:self.size])
+                self._extend(reversed(rows))
+                self.truncated = len(rows) == self.size
+                self.loaded = True
+            elif versions[0] != self.versions[0]:
+                self._extend(self._rows(Post.objects.filter(
+                    id__gt=self.high_water).order_by('id')))
+            self.versions = versions
+
+    def count(self, cursor, group=None, authors=None):
+        """Сколько постов новее cursor — всего, в группе или у авторов."""
+        self.sync()
+        with self.lock:
+            if cursor >= self.high_water:
+                return 0
+            start = bisect.bisect_right(self.ids, cursor)
+            if not (start == 0 and self.truncated):
+                return sum(
+                    1 for _, author_id, group_slug in self.posts[start:]
+                    if (group is None or group_slug == group)
+                    and (authors is None or author_id in authors)
+                )
+        # Курсор старше буфера: считаем по базе.
+        posts = Post.objects.filter(id__gt=cursor)
+        if group is not None:
+            posts = posts.filter(group__slug=group)
+        if authors is not None:
+            posts = posts.filter(author__in=authors)
+        return posts.count()
+
+    def created(self):
+        transaction.on_commit(lambda: bump(CREATED_KEY))
+
+    def changed(self):
+        """Пост перенесён в другую группу или удалён: все процессы
+        перечитают буфер при следующем опросе."""
+        transaction.on_commit(lambda: bump(CHANGED_KEY))
+
+
+new_posts_tracker = NewPostsTracker(settings.NEW_POSTS_BUFFER)
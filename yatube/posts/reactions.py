@@ -0,0 +1,113 @@
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.db.models import F, Sum
+from django.db.models.functions import Greatest
+
+from core.db import pk_chunks, retry_on_locked
+from posts.models import Reaction, ReactionCounter
+
+
+def reactions_key(post_id):
+    return f'reactions:{post_id}'
+
+
+def shard_for(user_id):
+    """Часть счётчика пользователя: лайк и его отмена попадают в одну
+    и ту же строку, поэтому части не уходят в минус."""
+    return user_id % settings.REACTION_SHARDS
+
+
+def change_counter(post_ids, shard, delta):
+    """Меняет часть shard счётчиков постов и сбрасывает их итоги в кеше.
+
+    Кеш сбрасывается до фиксации транзакции, поэтому итог, прочитанный
+    в этот момент, может отстать не дольше REACTION_CACHE_TIMEOUT.
+    """
+    counters = ReactionCounter.objects.filter(post__in=post_ids, shard=shard)
+    if delta < 0:
+        counters.update(count=Greatest(F('count') + delta, 0))
+    elif counters.update(count=F('count') + delta) < len(post_ids):
+        # Новые части заводятся с нулём, и прибавляется только к ним:
+        # существующие уже обновлены.
+        ReactionCounter.objects.bulk_create(
+            (ReactionCounter(post_id=post_id, shard=shard)
+             for post_id in post_ids),
+            ignore_conflicts=True
+        )
+        counters.filter(count=0).update(count=F('count') + delta)
+    cache.delete_many([reactions_key(post_id) for post_id in post_ids])
+
+
+def react(user, post_id):
+    """Ставит лайк; False, если он уже стоял."""
+    try:
+        with transaction.atomic():
+            Reaction.objects.create(user=user, post_id=post_id)
+    except IntegrityError:
+        return False
+    change_counter([post_id], shard_for(user.pk), 1)
+    return True
+
+
+def unreact(user, post_id):
+    """Снимает лайк; False, если его не было."""
+    deleted, _ = Reaction.objects.filter(user=user, post=post_id).delete()
+    if not deleted:
+        return False
+    change_counter([post_id], shard_for(user.pk), -1)
+    return True
+
+
+@retry_on_locked
+def remove_reaction_chunk(user_id, chunk):
+    post_ids = list(Reaction.objects.filter(
+        pk__in=chunk).values_list('post_id', flat=True))
+    Reaction.objects.filter(pk__in=chunk).delete()
+    change_counter(post_ids, shard_for(user_id), -1)
+
+
+def remove_user_reactions(user_id, pause=0):
+    """Удаляет лайки пользователя порциями вместе с его частью
+    счётчиков; как delete_in_chunks, с паузой между порциями."""
+    for chunk in pk_chunks(Reaction.objects.filter(user=user_id)):
+        remove_reaction_chunk(user_id, chunk)
+        time.sleep(pause)
+
+
+def reaction_totals(post_ids):
+    """Число лайков постов: из кеша, недостающие — одним запросом."""
+    keys = {reactions_key(post_id): post_id for post_id in post_ids}
+    cached = cache.get_many(keys)
+    totals = {keys[key]: total for key, total in cached.items()}
+    missing = [post_id for post_id in post_ids if post_id not in totals]
+    if missing:
+        loaded = dict.fromkeys(missing, 0)
+        loaded.update(
+            ReactionCounter.objects.filter(post__in=missing)
+            .values('post').annotate(total=Sum('count'))
+            .values_list('post', 'total')
+        )
+        cache.set_many({reactions_key(post_id): total
+                        for post_id, total in loaded.items()},
+                       settings.REACTION_CACHE_TIMEOUT)
+        totals.update(loaded)
+    return totals
+
+
+def load_reactions(request, post_ids):
+    """Лайки постов и отметки текущего пользователя, один раз за запрос
+    на все посты страницы."""
+    if not hasattr(request, '_reactions'):
+        request._reactions = ({}, set())
+    totals, liked = request._reactions
+    missing = [post_id for post_id in post_ids if post_id not in totals]
+    if missing:
+        totals.update(reaction_totals(missing))
+        if request.user.is_authenticated:
+            liked.update(Reaction.objects.filter(
+                user=request.user, post__in=missing
+            ).values_list('post_id', flat=True))
+    return totals, liked
@@ -0,0 +1,77 @@
+import numpy as np
+
+
+def _csr(src, dst, size):
+    """Строит CSR-представление графа подписок: indptr и indices."""
+    order = np.argsort(src, kind='stable')
+    degree = np.bincount(src, minlength=size)
+    indptr = np.zeros(size + 1, dtype=np.int64)
+    np.cumsum(degree, out=indptr[1:])
+    return indptr, dst[order], degree
+
+
+def _top(users, candidates, scores, limit):
+    """Оставляет по limit кандидатов с наибольшим счётом на пользователя."""
+    order = np.lexsort((-scores, users))
+    users, candidates, scores = users[order], candidates[order], scores[order]
+    rank = np.arange(len(users)) - np.searchsorted(users, users)
+    keep = rank < limit
+    return users[keep], candidates[keep], scores[keep]
+
+
+def score_candidates(follows, activity, limit, chunk_size=10000):
+    """Считает рекомендации «кого читать» для всех пользователей сразу.
+
+    follows — массив пар (user_id, author_id), activity — массив пар
+    (author_id, число свежих постов). Кандидат получает очко за каждого
+    автора из подписок пользователя, который сам подписан на кандидата;
+    сумма умножается на 1 + log(1 + активность кандидата).
+    Возвращает три массива: user_id, author_id и счёт.
+    """
+    follows = np.asarray(follows, dtype=np.int64).reshape(-1, 2)
+    activity = np.asarray(activity, dtype=np.int64).reshape(-1, 2)
+    empty = (np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64),
+             np.empty(0, dtype=np.float64))
+    if not len(follows):
+        return empty
+    ids = np.unique(np.concatenate((follows.ravel(), activity[:, 0])))
+    size = len(ids)
+    src = np.searchsorted(ids, follows[:, 0])
+    dst = np.searchsorted(ids, follows[:, 1])
+    indptr, indices, degree = _csr(src, dst, size)
+    weight = np.ones(size)
+    weight[np.searchsorted(ids, activity[:, 0])] += np.log1p(activity[:, 1])
+    existing = np.unique(src * size + dst)
+
+    results = []
+    for start in range(0, size, chunk_size):
+        # Рёбра пользователей текущего блока лежат в indices подряд.
+        lo, hi = indptr[start], indptr[min(start + chunk_size, size)]
+        if lo == hi:
+            continue
+        hop_src = np.repeat(
+            np.arange(start, min(start + chunk_size, size)),
+            degree[start:start + chunk_size]
+        )
+        hop_dst = indices[lo:hi]
+        fanout = degree[hop_dst]
+        total = fanout.sum()
+        if not total:
+            continue
+        users = np.repeat(hop_src, fanout)
+        offsets = np.arange(total) - np.repeat(
+            np.cumsum(fanout) - fanout, fanout
+        )
+        candidates = indices[np.repeat(indptr[hop_dst], fanout) + offsets]
+        pairs = users * size + candidates
+        mask = (users != candidates) & ~np.isin(pairs, existing)
+        pairs, counts = np.unique(pairs[mask], return_counts=True)
+        users, candidates = pairs // size, pairs % size
+        results.append(
+            _top(users, candidates, counts * weight[candidates], limit)
+        )
+    if not results:
+        return empty
+    users, candidates, scores = (np.concatenate(part)
+                                 for part in zip(*results))
+    return ids[users], ids[candidates], scores
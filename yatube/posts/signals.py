@@ -0,0 +1,140 @@
+from django.db.models import DEFERRED
+from django.db.models.signals import (post_delete, post_init, post_save,
+                                      pre_delete, pre_save)
+from django.dispatch import receiver
+from django.urls import reverse
+
+from core.page_cache import purge_surrogate_keys
+from posts.feeds import feed_key
+from posts.follows import add_following, remove_following
+from posts.group_stats import post_added, post_removed
+from posts.markup import render_post
+from posts.models import Comment, Follow, Group, GroupStats, Post
+from posts.poll import new_posts_tracker
+from posts.sitemaps import invalidate as invalidate_sitemap
+from posts.static_export import group_paths, mark_stale, post_paths
+from users.forms import User
+
+
+@receiver(post_save, sender=Follow)
+def follow_created(sender, instance, created, **kwargs):
+    if created:
+        add_following(instance.user_id, instance.author_id)
+        purge_surrogate_keys(f'followers:{instance.author_id}',
+                             f'following:{instance.user_id}')
+
+
+@receiver(post_delete, sender=Follow)
+def follow_deleted(sender, instance, **kwargs):
+    remove_following(instance.user_id, instance.author_id)
+    purge_surrogate_keys(f'followers:{instance.author_id}',
+                         f'following:{instance.user_id}')
+
+
+@receiver(post_init, sender=Post)
+def post_loaded(sender, instance, **kwargs):
+    # Отложенное поле не читаем, чтобы не вызвать лишний запрос.
+    instance._saved_group_id = instance.__dict__.get('group_id', DEFERRED)
+
+
+@receiver(pre_save, sender=Post)
+def post_rendering(sender, instance, **kwargs):
+    render_post(instance)
+
+
+@receiver(post_save, sender=Post)
+def post_saved(sender, instance, created, **kwargs):
+    old_group_id = None if created else instance._saved_group_id
+    if created:
+        new_posts_tracker.created()
+    elif old_group_id != instance.group_id:
+        new_posts_tracker.changed()
+    keys = [f'post:{instance.pk}', feed_key('site'),
+            feed_key('author', instance.author.username)]
+    if instance.group_id:
+        keys.append(feed_key('group', instance.group.slug))
+    if created:
+        keys += ['posts', f'author:{instance.author_id}']
+        invalidate_sitemap('posts', instance.pk)
+        invalidate_sitemap('profiles', instance.author_id)
+    if old_group_id is not DEFERRED and old_group_id != instance.group_id:
+        keys += ['groups', f'group:{old_group_id}',
+                 f'group:{instance.group_id}']
+        if old_group_id:
+            post_removed(old_group_id, instance.pub_date)
+            old_slugs = Group.all_objects.filter(
+                pk=old_group_id).values_list('slug', flat=True)
+            mark_stale(reverse('posts:group_list', args=[slug])
+                       for slug in old_slugs)
+            keys += [feed_key('group', slug) for slug in old_slugs]
+        if instance.group_id:
+            post_added(instance.group_id, instance.pub_date)
+        invalidate_sitemap('groups', old_group_id)
+        invalidate_sitemap('groups', instance.group_id)
+    purge_surrogate_keys(*keys)
+    mark_stale(post_paths(instance))
+    instance._saved_group_id = instance.group_id
+
+
+@receiver(post_delete, sender=Post)
+def post_deleted(sender, instance, **kwargs):
+    new_posts_tracker.changed()
+    if instance.group_id:
+        post_removed(instance.group_id, instance.pub_date)
+    invalidate_sitemap('posts', instance.pk)
+    invalidate_sitemap('profiles', instance.author_id)
+    invalidate_sitemap('groups', instance.group_id)
+    keys = [f'post:{instance.pk}', 'posts', 'groups',
+            f'author:{instance.author_id}', f'group:{instance.group_id}',
+            feed_key('site'), feed_key('author', instance.author.username)]
+    if instance.group_id:
+        keys.append(feed_key('group', instance.group.slug))
+    purge_surrogate_keys(*keys)
+    mark_stale(post_paths(instance))
+
+
+@receiver(post_init, sender=Group)
+def group_loaded(sender, instance, **kwargs):
+    instance._saved_slug = instance.__dict__.get('slug')
+
+
+@receiver(post_save, sender=Group)
+def group_saved(sender, instance, created, **kwargs):
+    if created:
+        GroupStats.objects.create(group=instance)
+    paths = group_paths(instance)
+    keys = ['groups', f'group:{instance.pk}', feed_key('group', instance.slug)]
+    if instance._saved_slug and instance._saved_slug != instance.slug:
+        paths.append(reverse('posts:group_list', args=[instance._saved_slug]))
+        keys.append(feed_key('group', instance._saved_slug))
+    mark_stale(paths)
+    purge_surrogate_keys(*keys)
+    invalidate_sitemap('groups', instance.pk)
+    instance._saved_slug = instance.slug
+
+
+@receiver(pre_delete, sender=Group)
+def group_deleted(sender, instance, **kwargs):
+    # После удаления посты группы уже не найти, поэтому до него.
+    mark_stale(group_paths(instance))
+    purge_surrogate_keys('groups', f'group:{instance.pk}',
+                         feed_key('group', instance.slug))
+    invalidate_sitemap('groups', instance.pk)
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def comment_changed(sender, instance, **kwargs):
+    mark_stale([reverse('posts:post_detail', args=[instance.post_id])])
+    purge_surrogate_keys(f'post:{instance.post_id}')
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, created, **kwargs):
+    if created:
+        invalidate_sitemap('profiles', instance.pk)
+
+
+@receiver(post_delete, sender=User)
+def user_deleted(sender, instance, **kwargs):
+    invalidate_sitemap('profiles', instance.pk)
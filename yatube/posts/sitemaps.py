@@ -0,0 +1,152 @@
+import math
+import time
+from collections import namedtuple
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Max
+
+from core.routers import cache_timeout
+from posts.cards import UrlPattern
+from posts.models import Group, GroupStats, Post
+from users.forms import User
+
+XML_HEADER = '<?xml version="1.0" encoding="UTF-8"?>\n'
+XMLNS = 'http://www.sitemaps.org/schemas/sitemap/0.9'
+
+Section = namedtuple('Section', ('model', 'rows', 'lastmod', 'url_name',
+                                 'numeric'))
+
+SECTIONS = {
+    'posts': Section(
+        Post,
+        lambda lo, hi: Post.objects.filter(
+            pk__range=(lo, hi), author__is_active=True
+        ).values_list('pk', 'pub_date'),
+        lambda lo, hi: Post.objects.filter(
+            pk__range=(lo, hi), author__is_active=True
+        ).aggregate(lastmod=Max('pub_date'))['lastmod'],
+        'posts:post_detail',
+        True
+    ),
+    'profiles': Section(
+        User,
+        lambda lo, hi: User.objects.filter(
+            pk__range=(lo, hi), is_active=True
+        ).annotate(lastmod=Max('posts__pub_date')).values_list('username',
+                                                               'lastmod'),
+        lambda lo, hi: Post.objects.filter(
+            author__gte=lo, author__lte=hi, author__is_active=True
+        ).aggregate(lastmod=Max('pub_date'))['lastmod'],
+        'posts:profile',
+        False
+    ),
+    'groups': Section(
+        Group,
+        lambda lo, hi: Group.objects.filter(pk__range=(lo, hi)).values_list(
+            'slug', 'stats__last_post_date'),
+        lambda lo, hi: GroupStats.objects.filter(
+            group__gte=lo, group__lte=hi).aggregate(
+            lastmod=Max('last_post_date'))['lastmod'],
+        'posts:group_list',
+        False
+    ),
+}
+
+
+def chunk_bounds(chunk):
+    size = settings.SITEMAP_CHUNK_SIZE
+    return chunk * size + 1, (chunk + 1) * size
+
+
+def chunk_count(section):
+    """Число частей раздела: части нарезаны по диапазонам ключей."""
+    max_pk = SECTIONS[section].model.objects.aggregate(
+        Max('pk'))['pk__max'] or 0
+    return math.ceil(max_pk / settings.SITEMAP_CHUNK_SIZE)
+
+
+def version_key(section, chunk):
+    return f'sitemap:version:{section}:{chunk}'
+
+
+def invalidate(section, *pks):
+    """Сбрасывает части раздела, в которые попадают объекты с ключами pks.
+
+    Версия части — отметка времени, как в poll.bump: простой set не
+    зависит ни от вытеснения ключа, ни от неатомарного incr.
+    """
+    chunks = {(pk - 1) // settings.SITEMAP_CHUNK_SIZE
+              for pk in pks if pk is not None}
+    cache.set_many({version_key(section, chunk): time.time_ns()
+                    for chunk in chunks}, None)
+
+
+def render_chunk(section, chunk, base_url):
+    """XML части раздела и дата самого свежего изменения в ней.
+
+    Строки читаются курсором через iterator(), без создания объектов
+    моделей, в порядке ключа внутри диапазона части.
+    """
+    rows = SECTIONS[section].rows(*chunk_bounds(chunk)).order_by('pk')
+    url = UrlPattern(SECTIONS[section].url_name,
+                     numeric=SECTIONS[section].numeric)
+    parts = [XML_HEADER, f'<urlset xmlns="{XMLNS}">\n']
+    lastmod = None
+    for key, modified in rows.iterator():
+        parts.append(f'<url><loc>{base_url}{url(key)}</loc>')
+        if modified:
+            parts.append(f'<lastmod>{modified.date().isoformat()}</lastmod>')
+            lastmod = max(lastmod or modified, modified)
+        parts.append('</url>\n')
+    parts.append('</urlset>\n')
+    return ''.join(parts), lastmod
+
+
+def get_chunk(section, chunk, base_url):
+    """Закешированный XML части; сбрасывается сменой её версии."""
+    version = cache.get(version_key(section, chunk), 0)
+    key = f'sitemap:{section}:{chunk}:{version}:{base_url}'
+    content = cache.get(key)
+    if content is None:
+        content, lastmod = render_chunk(section, chunk, base_url)
+        cache.set_many({
+            key: content,
+            f'sitemap:lastmod:{section}:{chunk}:{version}': lastmod,
+        }, cache_timeout(settings.SITEMAP_CACHE_TIMEOUT))
+    return content
+
+
+def render_index(base_url, sitemap_url):
+    """Индекс всех частей всех разделов с датами их изменения.
+
+    Даты берутся из кеша частей; для незакешированных части считаются
+    одним агрегатом по диапазону ключей.
+    """
+    parts = [XML_HEADER, f'<sitemapindex xmlns="{XMLNS}">\n']
+    for section in SECTIONS:
+        chunks = range(chunk_count(section))
+        versions = cache.get_many(
+            [version_key(section, chunk) for chunk in chunks])
+        keys = {
+            chunk: 'sitemap:lastmod:{}:{}:{}'.format(
+                section, chunk, versions.get(version_key(section, chunk), 0))
+            for chunk in chunks
+        }
+        lastmods = cache.get_many(keys.values())
+        for chunk in chunks:
+            if keys[chunk] in lastmods:
+                lastmod = lastmods[keys[chunk]]
+            else:
+                lastmod = SECTIONS[section].lastmod(*chunk_bounds(chunk))
+                cache.set(keys[chunk], lastmod,
+                          cache_timeout(settings.SITEMAP_CACHE_TIMEOUT))
+            parts.append(
+                f'<sitemap><loc>{base_url}{sitemap_url(section, chunk)}</loc>'
+            )
+            if lastmod:
+                parts.append(
+                    f'<lastmod>{lastmod.date().isoformat()}</lastmod>')
+            parts.append('</sitemap>\n')
+    parts.append('</sitemapindex>\n')
+    return ''.join(parts)
@@ -0,0 +1,100 @@
+import os
+from urllib.parse import unquote
+
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.http import Http404
+from django.test import RequestFactory
+from django.urls import resolve, reverse
+
+from posts.models import Group, Post, StalePage
+from users.forms import User
+
+
+def mark_stale(paths):
+    """Помечает страницы экспорта для перегенерации."""
+    StalePage.objects.bulk_create(
+        (StalePage(path=path) for path in set(paths)),
+        ignore_conflicts=True
+    )
+
+
+def post_paths(post):
+    paths = [
+        reverse('posts:index'),
+        reverse('posts:profile', args=[post.author.username]),
+        reverse('posts:post_detail', args=[post.pk]),
+    ]
+    if post.group_id:
+        paths.append(reverse('posts:group_index'))
+        paths.append(reverse('posts:group_list', args=[post.group.slug]))
+    return paths
+
+
+def group_paths(group):
+    return [reverse('posts:group_index'),
+            reverse('posts:group_list', args=[group.slug])] + [
+        reverse('posts:post_detail', args=[pk])
+        for pk in group.posts.values_list('pk', flat=True).iterator()
+    ]
+
+
+def all_paths():
+    """Все страницы, одинаковые для любого анонимного посетителя."""
+    yield reverse('about:author')
+    yield reverse('about:tech')
+    yield reverse('posts:index')
+    yield reverse('posts:group_index')
+    for slug in Group.objects.values_list('slug', flat=True).iterator():
+        yield reverse('posts:group_list', args=[slug])
+    for username in User.objects.filter(is_active=True).values_list(
+            'username', flat=True).iterator():
+        yield reverse('posts:profile', args=[username])
+    for pk in Post.objects.values_list('pk', flat=True).iterator():
+        yield reverse('posts:post_detail', args=[pk])
+
+
+def render_path(path):
+    """Рендерит страницу так, как её видит анонимный посетитель.
+
+    Возвращает None, если страницы больше нет.
+    """
+    request = RequestFactory().get(path)
+    request.user = AnonymousUser()
+    request.resolver_match = resolve(path)
+    func, args, kwargs = request.resolver_match
+    try:
+        response = func(request, *args, **kwargs)
+    except Http404:
+        return None
+    if hasattr(response, 'render'):
+        response.render()
+    if response.status_code != 200:
+        return None
+    return response.content
+
+
+def file_path(path):
+    """Файл, который файловый сервер отдаст по адресу path."""
+    root = os.path.abspath(settings.STATIC_EXPORT_ROOT)
+    target = os.path.normpath(
+        os.path.join(root, unquote(path).strip('/'), 'index.html')
+    )
+    if not target.startswith(root + os.sep):
+        raise ValueError(f'Путь {path} выходит за пределы экспорта')
+    return target
+
+
+def export_path(path):
+    """Записывает страницу в файл или удаляет файл исчезнувшей страницы."""
+    target = file_path(path)
+    content = render_path(path)
+    if content is None:
+        if os.path.exists(target):
+            os.remove(target)
+        return False
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    with open(target + '.tmp', 'wb') as file:
+        file.write(content)
+    os.replace(target + '.tmp', target)
+    return True
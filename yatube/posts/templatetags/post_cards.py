@@ -0,0 +1,14 @@
+from django import template
+
+from posts.cards import render_cards
+
+register = template.Library()
+
+
+@register.simple_tag(takes_context=True)
+def post_cards(context, posts):
+    """Список готовых карточек постов ленты, см. posts.cards.render_cards.
+
+    Использование: {% post_cards page_obj as cards %}
+    """
+    return render_cards(posts, context)
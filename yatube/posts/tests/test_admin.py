@@ -0,0 +1,82 @@
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from core.admin import EstimatedCountPaginator
+from posts.models import Group, GroupStats, Post
+from users.forms import User
+
+
+class PostAdminTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.admin = User.objects.create_superuser(
+            username='Admin', email='admin@example.com', password='pass')
+        cls.author = User.objects.create(username='Author')
+        cls.groups = [
+            Group.objects.create(title=f'Группа {i}', slug=f'group-{i}',
+                                 description='Описание')
+            for i in range(3)
+        ]
+        cls.CHANGELIST_REVERSE = reverse('admin:posts_post_changelist')
+
+    def setUp(self):
+        cache.clear()
+        self.admin_client = Client()
+        self.admin_client.force_login(self.admin)
+
+    def create_posts(self, amount, group=None):
+        return Post.objects.bulk_create(
+            Post(author=self.author, text='Пост', group=group)
+            for _ in range(amount)
+        )
+
+    def changelist_queries(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.admin_client.get(self.CHANGELIST_REVERSE)
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def test_changelist_queries_do_not_grow_with_rows(self):
+        """Число запросов списка постов не зависит от числа строк."""
+        self.create_posts(2, self.groups[0])
+        few = self.changelist_queries()
+        self.create_posts(8, self.groups[1])
+        self.assertEqual(self.changelist_queries(), few)
+
+    @override_settings(ADMIN_COUNT_ESTIMATE_THRESHOLD=5)
+    def test_large_table_count_is_estimated(self):
+        """Выше порога число постов оценивается, с фильтром — считается."""
+        self.create_posts(10)
+        Post.objects.filter(pk__in=Post.objects.order_by(
+            'pk').values_list('pk', flat=True)[:3]).delete()
+        paginator = EstimatedCountPaginator(
+            Post.objects.order_by('pk'), 10)
+        self.assertGreaterEqual(paginator.count, 7)
+        paginator = EstimatedCountPaginator(
+            Post.objects.filter(group=None).order_by('pk'), 10)
+        self.assertEqual(paginator.count, 7)
+
+    @override_settings(BULK_CHUNK_SIZE=2)
+    def test_move_to_group_action(self):
+        """Действие переносит посты порциями и обновляет статистику."""
+        source, target = self.groups[0], self.groups[1]
+        self.create_posts(5, source)
+        post = Post.objects.create(author=self.author, text='Пост',
+                                   group=source)
+        pks = list(Post.objects.values_list('pk', flat=True))
+        response = self.admin_client.post(self.CHANGELIST_REVERSE, {
+            'action': 'move_to_group',
+            'group': target.pk,
+            '_selected_action': pks,
+        })
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(target.posts.count(), 6)
+        self.assertEqual(GroupStats.objects.get(group=source).post_count, 0)
+        stats = GroupStats.objects.get(group=target)
+        self.assertEqual(stats.post_count, 6)
+        self.assertEqual(stats.last_post_date,
+                         Post.objects.get(pk=post.pk).pub_date)
@@ -0,0 +1,284 @@
+import os
+import re
+import shutil
+import tempfile
+from importlib import import_module
+from io import StringIO
+
+from django.apps import apps
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from posts.deletion import schedule_group_deletion, schedule_user_deletion
+from posts.follows import get_recommendations
+from posts.models import (Comment, Deletion, Follow, Group, GroupStats, Post,
+                          Reaction, ReactionCounter, Recommendation,
+                          StalePage)
+from posts.reactions import react, reaction_totals
+from posts.recommendations import score_candidates
+from users.forms import User
+
+
+class RecommendFollowsCommandTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create(username='Reader')
+        cls.friend = User.objects.create(username='Friend')
+        cls.friend_2 = User.objects.create(username='Friend 2')
+        cls.active = User.objects.create(username='Active')
+        cls.quiet = User.objects.create(username='Quiet')
+        for user, author in ((cls.user, cls.friend),
+                             (cls.user, cls.friend_2),
+                             (cls.friend, cls.active),
+                             (cls.friend_2, cls.active),
+                             (cls.friend, cls.quiet),
+                             (cls.friend, cls.user)):
+            Follow.objects.create(user=user, author=author)
+        Post.objects.create(author=cls.quiet, text='Тестовый пост')
+
+    def setUp(self):
+        cache.clear()
+
+    def test_scores_cofollowed_authors(self):
+        """Кандидат ранжируется по числу общих подписок и активности."""
+        follows = [(1, 2), (1, 3), (2, 4), (3, 4), (2, 5), (2, 1)]
+        users, authors, scores = score_candidates(follows, [(5, 1)], limit=2)
+        self.assertEqual(list(zip(users.tolist(), authors.tolist())),
+                         [(1, 4), (1, 5), (2, 3)])
+        self.assertGreater(scores[0], scores[1])
+
+    def test_command_saves_top_recommendations(self):
+        """Команда сохраняет рекомендации, которые видны на странице ленты."""
+        call_command('recommend_follows', limit=2, stdout=StringIO())
+        recommended = list(Recommendation.objects.filter(
+            user=self.user).values_list('author', flat=True))
+        self.assertEqual(recommended, [self.active.pk, self.quiet.pk])
+        self.assertFalse(Recommendation.objects.filter(
+            user=self.user, author__in=(self.friend, self.friend_2)
+        ).exists())
+        client = Client()
+        client.force_login(self.user)
+        content = client.get(reverse('posts:follow_index')).content.decode()
+        block = content[content.index('Кого почитать'):]
+        self.assertEqual(
+            re.findall(r'<a href="/profile/([^/]+)/">', block)[:2],
+            [self.active.username, self.quiet.username]
+        )
+
+    def test_hidden_author_not_recommended(self):
+        """Скрытый автор пропадает из блока «Кого почитать»."""
+        call_command('recommend_follows', limit=2, stdout=StringIO())
+        schedule_user_deletion(self.active)
+        self.assertEqual(
+            [recommendation.author
+             for recommendation in get_recommendations(self.user)],
+            [self.quiet]
+        )
+
+
+EXPORT_ROOT = tempfile.mkdtemp()
+
+
+@override_settings(STATIC_EXPORT_ROOT=EXPORT_ROOT)
+class ExportStaticCommandTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create(username='Author')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        cls.post = Post.objects.create(author=cls.author, group=cls.group,
+                                       text='Тестовый пост')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(EXPORT_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+
+    def export(self, *args):
+        call_command('export_static', *args, stdout=StringIO())
+
+    def read(self, path):
+        with open(os.path.join(EXPORT_ROOT, path, 'index.html'),
+                  encoding='utf-8') as file:
+            return file.read()
+
+    def test_full_export_writes_anonymous_pages(self):
+        """Полная выгрузка пишет страницы, как их видит аноним."""
+        self.export('--all')
+        for path in ('', 'about/author', 'group/test-slug', 'profile/Author',
+                     f'posts/{self.post.pk}'):
+            with self.subTest(path=path):
+                self.assertIn('Войти', self.read(path))
+        self.assertFalse(StalePage.objects.exists())
+
+    def test_export_regenerates_only_touched_pages(self):
+        """Комментарий помечает к выгрузке только страницу поста."""
+        self.export('--all')
+        Comment.objects.create(post=self.post, author=self.author,
+                               text='Свежий комментарий')
+        self.assertEqual(list(StalePage.objects.values_list('path',
+                                                            flat=True)),
+                         [f'/posts/{self.post.pk}/'])
+        self.export()
+        self.assertIn('Свежий комментарий',
+                      self.read(f'posts/{self.post.pk}'))
+        Post.objects.get(pk=self.post.pk).delete()
+        self.export()
+        self.assertFalse(os.path.exists(
+            os.path.join(EXPORT_ROOT, f'posts/{self.post.pk}', 'index.html')
+        ))
+
+
+@override_settings(POST_PREVIEW_LENGTH=20)
+class RenderPostsCommandTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create(username='Author')
+        cls.short = Post.objects.create(author=cls.author, text='<b>Пост</b>')
+        cls.long = Post.objects.create(author=cls.author,
+                                       text='Очень длинный пост\n' * 5)
+
+    def test_post_html_rendered_on_save(self):
+        """При сохранении поста сохраняются его HTML и превью."""
+        self.assertEqual(self.short.text_html,
+                         '<p>&lt;b&gt;Пост&lt;/b&gt;</p>')
+        self.assertEqual(self.short.preview_html, self.short.text_html)
+        self.assertEqual(self.long.preview_html,
+                         '<p>Очень длинный пост<br>…</p>')
+
+    def test_backfills_missing_html(self):
+        """Команда заполняет HTML только у постов без него."""
+        Post.objects.filter(pk=self.short.pk).update(text_html='',
+                                                     preview_html='')
+        Post.objects.filter(pk=self.long.pk).update(text_html='<p>old</p>')
+        out = StringIO()
+        call_command('render_posts', stdout=out)
+        self.assertIn('Отрендерено постов: 1', out.getvalue())
+        short = Post.objects.get(pk=self.short.pk)
+        self.assertEqual(short.text_html, '<p>&lt;b&gt;Пост&lt;/b&gt;</p>')
+        self.assertEqual(short.preview_html, short.text_html)
+        self.assertEqual(Post.objects.get(pk=self.long.pk).text_html,
+                         '<p>old</p>')
+        call_command('render_posts', '--all', stdout=out)
+        self.assertNotEqual(Post.objects.get(pk=self.long.pk).text_html,
+                            '<p>old</p>')
+
+    def test_migration_backfills_html(self):
+        """Миграция заполняет HTML постов, созданных до его появления."""
+        Post.objects.update(text_html='', preview_html='')
+        migration = import_module('posts.migrations.0017_backfill_post_html')
+        migration.render_posts(apps, None)
+        long = Post.objects.get(pk=self.long.pk)
+        self.assertEqual(long.text_html, self.long.text_html)
+        self.assertEqual(long.preview_html, '<p>Очень длинный пост<br>…</p>')
+        self.assertEqual(Post.objects.get(pk=self.short.pk).preview_html,
+                         '<p>&lt;b&gt;Пост&lt;/b&gt;</p>')
+
+
+@override_settings(BULK_CHUNK_SIZE=2)
+class RunDeletionsCommandTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create(username='Author')
+        cls.reader = User.objects.create(username='Reader')
+        cls.group = Group.objects.create(title='Группа', slug='group',
+                                         description='Описание')
+
+    def setUp(self):
+        cache.clear()
+        self.posts = [
+            Post.objects.create(author=self.author, group=self.group,
+                                text=f'Пост {i}')
+            for i in range(5)
+        ]
+        self.reader_post = Post.objects.create(
+            author=self.reader, group=self.group, text='Пост читателя')
+        Comment.objects.create(post=self.posts[0], author=self.reader,
+                               text='Комментарий')
+        Comment.objects.create(post=self.reader_post, author=self.author,
+                               text='Комментарий автора')
+        Follow.objects.create(user=self.reader, author=self.author)
+        Follow.objects.create(user=self.author, author=self.reader)
+
+    def run_deletions(self):
+        out = StringIO()
+        call_command('run_deletions', '--pause', '0', stdout=out)
+        return out.getvalue()
+
+    def test_user_hidden_then_deleted(self):
+        """Пользователь скрыт сразу, а его записи удаляет команда."""
+        react(self.reader, self.posts[0].pk)
+        react(self.author, self.reader_post.pk)
+        react(self.reader, self.reader_post.pk)
+        schedule_user_deletion(self.author)
+        profile = reverse('posts:profile', args=[self.author.username])
+        self.assertEqual(self.client.get(profile).status_code, 404)
+        self.assertEqual(Post.objects.filter(author=self.author).count(), 5)
+        self.assertIn('Удалено объектов: 1', self.run_deletions())
+        self.assertFalse(User.objects.filter(pk=self.author.pk).exists())
+        self.assertFalse(Follow.objects.exists())
+        self.assertEqual(list(Post.objects.all()), [self.reader_post])
+        self.assertEqual(Comment.objects.count(), 0)
+        self.assertEqual(list(Reaction.objects.values_list('user', 'post')),
+                         [(self.reader.pk, self.reader_post.pk)])
+        self.assertEqual(reaction_totals([self.reader_post.pk]),
+                         {self.reader_post.pk: 1})
+        self.assertFalse(ReactionCounter.objects.exclude(
+            post=self.reader_post).exists())
+        self.assertEqual(GroupStats.objects.get(group=self.group).post_count,
+                         1)
+        self.assertFalse(Deletion.objects.exists())
+
+    def test_hidden_author_posts_disappear(self):
+        """Посты скрытого автора сразу пропадают из закешированных лент,
+        а их страницы отвечают 404."""
+        detail = reverse('posts:post_detail', args=[self.posts[0].pk])
+        pages = (reverse('posts:index'),
+                 reverse('posts:group_list', args=[self.group.slug]),
+                 reverse('posts:feed_rss'))
+        self.assertEqual(self.client.get(detail).status_code, 200)
+        for page in pages:
+            self.assertContains(self.client.get(page), 'Пост 0')
+        schedule_user_deletion(self.author)
+        self.assertEqual(self.client.get(detail).status_code, 404)
+        for page in pages:
+            with self.subTest(page=page):
+                response = self.client.get(page)
+                self.assertNotContains(response, 'Пост 0')
+                self.assertContains(response, 'Пост читателя')
+
+    def test_group_hidden_then_deleted(self):
+        """Группа скрыта сразу, а команда отвязывает посты и удаляет её."""
+        schedule_group_deletion(self.group)
+        group_url = reverse('posts:group_list', args=[self.group.slug])
+        self.assertEqual(self.client.get(group_url).status_code, 404)
+        self.assertFalse(Group.objects.exists())
+        self.run_deletions()
+        self.assertFalse(Group.all_objects.exists())
+        self.assertEqual(Post.objects.filter(group=None).count(), 6)
+
+
+class BenchCardsCommandTest(TestCase):
+    def test_measures_both_renderers(self):
+        """Команда рендерит карточки обоими способами без обращений
+        к базе и печатает строку на каждую ленту."""
+        out = StringIO()
+        with self.assertNumQueries(0):
+            call_command('bench_cards', '--repeat', '1', stdout=out)
+        lines = out.getvalue().splitlines()
+        self.assertEqual([line.split()[0] for line in lines],
+                         ['index', 'group_posts', 'profile', 'follow'])
+        for line in lines:
+            self.assertIn('ускорение', line)
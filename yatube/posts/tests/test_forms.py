@@ -1,10 +1,12 @@
 import shutil
 import tempfile
+from io import BytesIO
 
 from django.conf import settings
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.test import Client, TestCase, override_settings
 from django.urls import reverse
+from PIL import Image
 
 from posts.forms import PostForm
 from posts.models import Group, Post, Comment
@@ -136,3 +138,93 @@ class PostFormTests(TestCase):
                 text=form_data['text']
             ).exists()
         )
+
+
+def image_file(size, image_format='PNG', name='image.png'):
+    buffer = BytesIO()
+    Image.new('RGB', size).save(buffer, image_format)
+    return SimpleUploadedFile(name, buffer.getvalue())
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ImageUploadTests(TestCase):
+    """Неподходящая картинка отклоняется ещё во время загрузки."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='Author')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.author = Client()
+        self.author.force_login(self.user)
+
+    def post(self, image):
+        return self.author.post(reverse('posts:post_create'),
+                                data={'text': 'Пост', 'image': image})
+
+    def assertRejected(self, response, message):
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(message, response.context['form'].errors['image'][0])
+        self.assertFalse(Post.objects.exists())
+
+    def test_valid_image_accepted(self):
+        response = self.post(image_file((40, 20)))
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(Post.objects.get().image.width, 40)
+
+    @override_settings(POST_IMAGE_HEADER_LIMIT=64)
+    def test_not_an_image(self):
+        """Файл без заголовка картинки отклоняет обработчик загрузки,
+        а не ImageField после неё."""
+        response = self.post(
+            SimpleUploadedFile('image.png', b'<html>' * 100))
+        self.assertRejected(response, 'Файл не является изображением')
+        self.assertEqual(response.wsgi_request.upload_error,
+                         'Файл не является изображением')
+
+    @override_settings(POST_IMAGE_FORMATS=('JPEG',))
+    def test_wrong_format(self):
+        self.assertRejected(self.post(image_file((40, 20))),
+                            'Поддерживаются только JPEG')
+
+    @override_settings(POST_IMAGE_MAX_SIDE=30)
+    def test_too_many_pixels(self):
+        self.assertRejected(self.post(image_file((40, 20))),
+                            'Изображение 40×20 слишком велико')
+
+    @override_settings(POST_IMAGE_MAX_SIZE=100,
+                       DATA_UPLOAD_MAX_MEMORY_SIZE=100)
+    def test_too_large_body_not_read(self):
+        self.assertRejected(self.post(image_file((400, 400), 'BMP')),
+                            'Файл больше')
+
+    @override_settings(POST_IMAGE_MAX_SIZE=100,
+                       DATA_UPLOAD_MAX_MEMORY_SIZE=100)
+    def test_too_large_body_keeps_csrf_token(self):
+        """Токен из полей до файла проходит проверку CSRF, и автор видит
+        ошибку размера, а не страницу 403."""
+        client = Client(enforce_csrf_checks=True)
+        client.force_login(self.user)
+        client.get(reverse('posts:post_create'))
+        response = client.post(reverse('posts:post_create'), data={
+            'csrfmiddlewaretoken': client.cookies['csrftoken'].value,
+            'text': 'Пост',
+            'image': image_file((400, 400), 'BMP')
+        })
+        self.assertTemplateNotUsed(response, 'core/403csrf.html')
+        self.assertRejected(response, 'Файл больше')
+        self.assertEqual(response.context['form']['text'].value(), 'Пост')
+
+    def test_csrf_still_checked(self):
+        client = Client(enforce_csrf_checks=True)
+        client.force_login(self.user)
+        response = client.post(reverse('posts:post_create'),
+                               data={'text': 'Пост'})
+        self.assertTemplateUsed(response, 'core/403csrf.html')
+        self.assertFalse(Post.objects.exists())
@@ -1,18 +1,49 @@
+import os
+import re
 import shutil
+import sqlite3
 import tempfile
+import warnings
 
 from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
 from django.core.cache import cache
+from django.core.cache.backends.base import CacheKeyWarning
 from django.core.files.uploadedfile import SimpleUploadedFile
-from django.test import Client, TestCase, override_settings
+from django.db import (OperationalError, connection, connections,
+                       transaction)
+from django.db.models.signals import post_delete
+from django.test import (Client, RequestFactory, TestCase,
+                         TransactionTestCase, override_settings)
+from django.template import Context, Template
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
+from core.db import retry_on_locked
+from posts.cards import render_compiled
+from posts.comments import subtree
+from posts.deletion import schedule_user_deletion
+from posts.follows import following_key, get_following_ids
 from posts.forms import PostForm
-from posts.models import Group, Post, Follow
+from posts.models import (Comment, Group, GroupStats, Post, Follow,
+                          Reaction)
+from posts.poll import NewPostsTracker, new_posts_tracker
+from posts.reactions import reaction_totals, remove_user_reactions
 from users.forms import User
 
 POSTS_AMOUNT_FOR_TEST = 13
+SMALL_GIF = (b'\x47\x49\x46\x38\x39\x61\x02\x00'
+             b'\x01\x00\x80\x00\x00\x00\x00\x00'
+             b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+             b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+             b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+             b'\x0A\x00\x3B')
 TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+CSRF_TOKEN = re.compile(rb'name="csrfmiddlewaretoken" value="[^"]+"')
+
+
+def strip_csrf(content):
+    return CSRF_TOKEN.sub(b'', content)
 
 
 @override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
@@ -87,6 +118,7 @@ class PostsPagesTests(TestCase):
         shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
 
     def setUp(self):
+        cache.clear()
         self.guest_client = Client()
         self.author_client = Client()
         self.author_client.force_login(self.author)
@@ -192,13 +224,39 @@ class PostsPagesTests(TestCase):
     def test_index_cache(self):
         """Тесты, которые проверяют работу кеша."""
         response_1 = self.author_client.get(self.INDEX_REVERSE)
-        Post.objects.all().delete()
+        # update() не шлёт сигналов и не сбрасывает страницу.
+        Post.objects.update(text='Текст, которого нет в кеше',
+                            preview_html='Текст, которого нет в кеше')
         response_2 = self.author_client.get(self.INDEX_REVERSE)
-        self.assertEqual(response_1.content, response_2.content)
+        # Кнопки лайков — персональные дыры с CSRF-токеном, который
+        # маскируется заново на каждый запрос.
+        self.assertEqual(strip_csrf(response_1.content),
+                         strip_csrf(response_2.content))
         cache.clear()
         response_3 = self.author_client.get(self.INDEX_REVERSE)
         self.assertNotEqual(response_2.content, response_3.content)
 
+    def test_index_shows_edited_post(self):
+        """Правка поста сбрасывает главную, и на ней новый текст."""
+        self.guest_client.get(self.INDEX_REVERSE)
+        post = Post.objects.get(pk=self.post.pk)
+        post.text = 'Исправленный текст'
+        post.save()
+        response = self.guest_client.get(self.INDEX_REVERSE)
+        self.assertContains(response, 'Исправленный текст')
+
+    def test_pinned_render_not_shared(self):
+        """Страница, отрендеренная для клиента с cookie основной базы,
+        не попадает к другим посетителям с его ссылками."""
+        Follow.objects.create(user=self.user, author=self.author)
+        self.authorized_client.cookies[settings.REPLICA_PIN_COOKIE] = '1'
+        response = self.authorized_client.get(self.INDEX_REVERSE)
+        self.assertContains(response, 'Отписаться')
+        for client in (self.guest_client, self.authorized_client_2):
+            with self.subTest(client=client):
+                response = client.get(self.INDEX_REVERSE)
+                self.assertNotContains(response, 'Отписаться')
+
     def test_404_page_uses_correct_template(self):
         """URL-адрес 404 использует шаблон core/404.html."""
         response = self.authorized_client.get('/unexisting_page/')
@@ -287,3 +345,908 @@ class PaginatorViewsTest(TestCase):
                     len(response.context['page_obj']),
                     POSTS_AMOUNT_FOR_TEST - settings.POSTS_AMOUNT
                 )
+
+
+class FollowCacheTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create(username='Follower')
+        cls.author = User.objects.create(username='Author')
+        Post.objects.create(author=cls.author, text='Тестовый пост')
+        cls.PROFILE_REVERSE = reverse(
+            'posts:profile', kwargs={'username': cls.author}
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def test_follow_and_unfollow_update_cached_set(self):
+        """Подписка и отписка обновляют закешированное множество авторов."""
+        self.assertEqual(get_following_ids(self.user), frozenset())
+        self.authorized_client.get(
+            reverse('posts:profile_follow', kwargs={'username': self.author})
+        )
+        self.assertEqual(cache.get(following_key(self.user.pk)),
+                         {self.author.pk})
+        self.authorized_client.get(
+            reverse('posts:profile_unfollow',
+                    kwargs={'username': self.author})
+        )
+        self.assertEqual(cache.get(following_key(self.user.pk)), set())
+
+    def test_follow_state_is_read_from_cache(self):
+        """Состояние подписки берётся из кеша, а не из базы."""
+        Follow.objects.create(user=self.user, author=self.author)
+        self.authorized_client.get(self.PROFILE_REVERSE)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.authorized_client.get(self.PROFILE_REVERSE)
+        self.assertContains(response, reverse(
+            'posts:profile_unfollow', kwargs={'username': self.author}))
+        self.assertFalse(any('posts_follow' in query['sql']
+                             for query in queries.captured_queries))
+        response = self.authorized_client.get(
+            reverse('posts:follow_index')
+        )
+        self.assertEqual(len(response.context['page_obj']), 1)
+
+
+@override_settings(DB_WRITE_BACKOFF=0)
+class RetryOnLockedTests(TransactionTestCase):
+    def test_locked_write_is_retried(self):
+        """Запись повторяется, пока база заблокирована."""
+        attempts = []
+
+        @retry_on_locked
+        def write():
+            attempts.append(1)
+            if len(attempts) < 3:
+                raise OperationalError('database is locked')
+            return User.objects.create(username='Writer')
+
+        self.assertEqual(write().username, 'Writer')
+        self.assertEqual(len(attempts), 3)
+
+    def test_other_errors_are_not_retried(self):
+        """Прочие ошибки базы пробрасываются сразу."""
+        attempts = []
+
+        @retry_on_locked
+        def write():
+            attempts.append(1)
+            raise OperationalError('no such table')
+
+        with self.assertRaises(OperationalError):
+            write()
+        self.assertEqual(len(attempts), 1)
+
+
+class ReplicaRouterTests(TransactionTestCase):
+    """Чтения ленты идут на копию базы, а после записи — на основную."""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create(username='Author')
+        self.old_post = Post.objects.create(author=self.user,
+                                            text='Старый пост')
+        self.replica_dir = tempfile.mkdtemp()
+        path = os.path.join(self.replica_dir, 'replica.sqlite3')
+        replica = sqlite3.connect(path)
+        connection.ensure_connection()
+        connection.connection.backup(replica)
+        replica.close()
+        connections.databases['replica'] = dict(
+            connections.databases['default'], NAME=path
+        )
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def tearDown(self):
+        connections['replica'].close()
+        del connections.databases['replica']
+        delattr(connections._connections, 'replica')
+        shutil.rmtree(self.replica_dir, ignore_errors=True)
+
+    def feed_texts(self, client):
+        response = client.get(reverse('posts:profile',
+                                      kwargs={'username': self.user}))
+        self.assertEqual(response.context['user'].is_authenticated,
+                         client is self.authorized_client)
+        return [post.text for post in response.context['page_obj']]
+
+    @override_settings(DATABASE_REPLICAS=['replica'])
+    def test_feed_reads_replica_until_user_writes(self):
+        Post.objects.create(author=self.user, text='Новый пост')
+        self.assertEqual(self.feed_texts(self.authorized_client),
+                         ['Старый пост'])
+        response = self.authorized_client.post(
+            reverse('posts:add_comment',
+                    kwargs={'post_id': self.old_post.id}),
+            {'text': 'Комментарий'}
+        )
+        self.assertIn(settings.REPLICA_PIN_COOKIE, response.cookies)
+        self.assertEqual(self.feed_texts(self.authorized_client),
+                         ['Старый пост', 'Новый пост'])
+        self.assertEqual(self.feed_texts(Client()), ['Старый пост'])
+
+
+class NewPostsTests(TransactionTestCase):
+    """Счётчики трекера двигаются после коммита, поэтому транзакции
+    здесь настоящие."""
+
+    def setUp(self):
+        cache.clear()
+        new_posts_tracker.reset()
+        self.user = User.objects.create(username='Reader')
+        self.author = User.objects.create(username='Author')
+        self.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        self.post = Post.objects.create(author=self.user,
+                                        text='Тестовый пост')
+        Follow.objects.create(user=self.user, author=self.author)
+        self.NEW_POSTS_REVERSE = reverse('posts:new_posts')
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def poll(self, **params):
+        return self.authorized_client.get(self.NEW_POSTS_REVERSE,
+                                          params).json()
+
+    def test_counts_new_posts_by_scope(self):
+        """Новые посты считаются по всему сайту, группе и подпискам."""
+        latest = self.poll()['latest']
+        self.assertEqual(latest, self.post.pk)
+        Post.objects.create(author=self.author, text='Пост автора')
+        Post.objects.create(author=self.user, group=self.group,
+                            text='Пост в группе')
+        self.assertEqual(self.poll(since=latest)['count'], 2)
+        self.assertEqual(self.poll(since=latest, group='test-slug')['count'],
+                         1)
+        self.assertEqual(self.poll(since=latest, feed='follow')['count'], 1)
+
+    def test_poll_without_new_posts_skips_database(self):
+        """Если новых постов нет, база не запрашивается."""
+        latest = self.poll()['latest']
+        with self.assertNumQueries(0):
+            response = self.client.get(self.NEW_POSTS_REVERSE,
+                                       {'since': latest})
+        self.assertEqual(response.json(), {'count': 0, 'latest': latest})
+
+    def test_bad_cursor(self):
+        """Некорректный курсор отклоняется."""
+        response = self.client.get(self.NEW_POSTS_REVERSE, {'since': 'x'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_rolled_back_post_not_announced(self):
+        """Отметка двигается только после коммита."""
+        latest = self.poll()['latest']
+        with self.assertRaises(ValueError):
+            with transaction.atomic():
+                Post.objects.create(author=self.author, text='Откат')
+                raise ValueError
+        with self.assertNumQueries(0):
+            self.assertEqual(new_posts_tracker.count(latest), 0)
+
+    def test_changes_reach_other_processes(self):
+        """Перенос и удаление поста видит буфер другого процесса."""
+        other = NewPostsTracker(settings.NEW_POSTS_BUFFER)
+        latest = self.poll()['latest']
+        post = Post.objects.create(author=self.author, text='Пост')
+        self.assertEqual(other.count(latest, group='test-slug'), 0)
+        post.group = self.group
+        post.save()
+        self.assertEqual(other.count(latest, group='test-slug'), 1)
+        post.delete()
+        self.assertEqual(other.count(latest), 0)
+
+
+class GroupIndexTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create(username='Author')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        cls.group_2 = Group.objects.create(
+            title='Тестовая группа 2',
+            slug='test-slug-2',
+            description='Тестовое описание 2',
+        )
+
+    def setUp(self):
+        self.author_client = Client()
+        self.author_client.force_login(self.author)
+
+    def stats(self, group):
+        return GroupStats.objects.get(group=group)
+
+    def test_stats_follow_post_changes(self):
+        """Статистика групп обновляется при создании, переносе и удалении."""
+        self.author_client.post(reverse('posts:post_create'),
+                                {'text': 'Пост', 'group': self.group.pk})
+        post = Post.objects.get()
+        self.assertEqual(self.stats(self.group).post_count, 1)
+        self.assertEqual(self.stats(self.group).last_post_date,
+                         post.pub_date)
+        self.author_client.post(
+            reverse('posts:post_edit', kwargs={'post_id': post.pk}),
+            {'text': 'Пост', 'group': self.group_2.pk}
+        )
+        self.assertEqual(self.stats(self.group).post_count, 0)
+        self.assertIsNone(self.stats(self.group).last_post_date)
+        self.assertEqual(self.stats(self.group_2).post_count, 1)
+        post.refresh_from_db()
+        post.delete()
+        self.assertEqual(self.stats(self.group_2).post_count, 0)
+
+    def test_group_index_uses_one_query(self):
+        """Каталог групп строится одним запросом."""
+        Post.objects.create(author=self.author, group=self.group_2,
+                            text='Пост')
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('posts:group_index'))
+        self.assertEqual(
+            [stats.group for stats in response.context['groups']],
+            [self.group_2, self.group]
+        )
+
+
+class FollowListTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create(username='Author')
+        cls.followers = [User.objects.create(username=f'Follower {number}')
+                         for number in range(settings.POSTS_AMOUNT + 2)]
+        for follower in cls.followers:
+            Follow.objects.create(user=follower, author=cls.author)
+        cls.FOLLOWERS_REVERSE = reverse(
+            'posts:profile_followers', kwargs={'username': cls.author}
+        )
+
+    def test_followers_keyset_pages(self):
+        """Подписчики листаются по курсору двумя запросами на страницу."""
+        with self.assertNumQueries(2):
+            response = self.client.get(self.FOLLOWERS_REVERSE)
+        page = response.context['page']
+        self.assertEqual(response.context['users'],
+                         self.followers[::-1][:settings.POSTS_AMOUNT])
+        response = self.client.get(self.FOLLOWERS_REVERSE,
+                                   {'before': page.next_cursor})
+        self.assertEqual(response.context['users'],
+                         self.followers[1::-1])
+        self.assertIsNone(response.context['page'].next_cursor)
+
+    def test_following_page(self):
+        """Страница подписок показывает авторов, на которых подписан."""
+        response = self.client.get(reverse(
+            'posts:profile_following',
+            kwargs={'username': self.followers[0]}
+        ))
+        self.assertEqual(response.context['users'], [self.author])
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class PostCardsTests(TestCase):
+    """Скомпилированные карточки совпадают с шаблоном posts_list.html."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create(
+            username='author@mail.ru', first_name='<Иван>', last_name='Ли'
+        )
+        cls.user = User.objects.create(username='Reader')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        Post.objects.create(author=cls.author, group=cls.group,
+                            text='Первая строка\n\nвторая <b>строка</b>')
+        Post.objects.create(author=cls.user, text='Пост & пост')
+        Post.objects.create(author=cls.user, group=cls.group,
+                            text='Длинный <пост>\n' * 100)
+        Post.objects.create(
+            author=cls.author, text='С картинкой',
+            image=SimpleUploadedFile('small.gif', SMALL_GIF,
+                                     content_type='image/gif')
+        )
+        cls.posts = list(Post.objects.select_related('author', 'group'))
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def test_compiled_cards_match_template(self):
+        template = Template(
+            "{% for post in posts %}"
+            "{% include 'posts/includes/posts_list.html' %}"
+            "{% endfor %}"
+        )
+        for user, following_ids in ((AnonymousUser(), frozenset()),
+                                    (self.user, frozenset()),
+                                    (self.user, {self.author.pk})):
+            with self.subTest(user=user, following_ids=following_ids):
+                request = RequestFactory().get('/')
+                request.user = user
+                request._following_ids = following_ids
+                expected = template.render(Context({
+                    'posts': self.posts,
+                    'request': request
+                }))
+                compiled = ''.join(render_compiled(self.posts, request))
+                self.assertEqual(strip_csrf(compiled.encode()),
+                                 strip_csrf(expected.encode()))
+
+    def test_renderer_setting_keeps_pages(self):
+        """Ленты одинаковы при обоих значениях FEED_CARD_RENDERER."""
+        Follow.objects.create(user=self.user, author=self.author)
+        reader = Client()
+        reader.force_login(self.user)
+        urls = (reverse('posts:index'),
+                reverse('posts:group_list', args=[self.group.slug]),
+                reverse('posts:profile', args=[self.author.username]))
+        cases = [(self.client, url) for url in urls] + [
+            (reader, url) for url in urls + (reverse('posts:follow_index'),)
+        ]
+        for client, url in cases:
+            with self.subTest(url=url, user=client is reader):
+                pages = []
+                for renderer in ('compiled', 'template'):
+                    cache.clear()
+                    with self.settings(FEED_CARD_RENDERER=renderer):
+                        response = client.get(url)
+                    self.assertEqual(response.status_code, 200)
+                    pages.append(strip_csrf(response.content))
+                self.assertEqual(pages[0], pages[1])
+
+
+class AnonymousPageCacheTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create(username='Author')
+        cls.post = Post.objects.create(author=cls.author, text='Пост')
+        cls.post_2 = Post.objects.create(author=cls.author, text='Пост 2')
+        cls.DETAIL_REVERSE = reverse('posts:post_detail',
+                                     kwargs={'post_id': cls.post.pk})
+        cls.DETAIL_2_REVERSE = reverse('posts:post_detail',
+                                       kwargs={'post_id': cls.post_2.pk})
+
+    def setUp(self):
+        cache.clear()
+        self.author_client = Client()
+        self.author_client.force_login(self.author)
+
+    def test_anonymous_page_is_cached(self):
+        """Повторный запрос анонима отдаётся из кеша без запросов к базе."""
+        response = self.client.get(self.DETAIL_REVERSE)
+        self.assertIn(f'post:{self.post.pk}', response['Surrogate-Key'])
+        with self.assertNumQueries(0):
+            cached = self.client.get(self.DETAIL_REVERSE)
+        self.assertEqual(cached.content, response.content)
+        response = self.author_client.get(self.DETAIL_REVERSE)
+        self.assertNotIn('Surrogate-Key', response)
+
+    def test_comment_purges_only_its_post(self):
+        """Комментарий сбрасывает только страницу своего поста."""
+        self.client.get(self.DETAIL_REVERSE)
+        self.client.get(self.DETAIL_2_REVERSE)
+        Comment.objects.create(post=self.post, author=self.author,
+                               text='Новый комментарий')
+        self.assertContains(self.client.get(self.DETAIL_REVERSE),
+                            'Новый комментарий')
+        with self.assertNumQueries(0):
+            self.client.get(self.DETAIL_2_REVERSE)
+
+    def test_shared_page_fills_personal_holes(self):
+        """Общая копия страницы дополняется частями каждого пользователя."""
+        reader = User.objects.create(username='Reader')
+        reader_client = Client()
+        reader_client.force_login(reader)
+        self.client.get(self.DETAIL_REVERSE)
+        edit_url = reverse('posts:post_edit',
+                           kwargs={'post_id': self.post.pk})
+        response = self.author_client.get(self.DETAIL_REVERSE)
+        self.assertContains(response, 'Пользователь: Author')
+        self.assertContains(response, edit_url)
+        response = reader_client.get(self.DETAIL_REVERSE)
+        self.assertContains(response, 'Пользователь: Reader')
+        self.assertNotContains(response, edit_url)
+        self.assertNotContains(response, '<!--hole:')
+        response = self.client.get(self.DETAIL_REVERSE)
+        self.assertNotContains(response, 'Пользователь:')
+        self.assertNotContains(response, edit_url)
+
+    def test_switcher_marks_active_tab(self):
+        """Переключатель лент в общей странице отмечает текущую вкладку."""
+        for name, active in (('posts:index', 'Все авторы'),
+                             ('posts:follow_index', 'Избранные авторы')):
+            with self.subTest(name=name):
+                response = self.author_client.get(reverse(name))
+                tab = re.search(r'class="nav-link active"\s*href="[^"]*"'
+                                r'\s*>\s*([^<]+?)\s*<',
+                                response.content.decode())
+                self.assertEqual(tab.group(1), active)
+
+
+@override_settings(RATE_LIMITS={
+    'posts:add_comment': {'user': (2, 60), 'ip': (3, 60)},
+    'posts:index': {'ip': (1, 60)},
+}, RATE_LIMIT_FREE_PAGES=1)
+class RateLimitTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create(username='Author')
+        cls.reader = User.objects.create(username='Reader')
+        cls.post = Post.objects.create(author=cls.author, text='Пост')
+        cls.COMMENT_REVERSE = reverse('posts:add_comment',
+                                      kwargs={'post_id': cls.post.pk})
+
+    def setUp(self):
+        cache.clear()
+        self.author_client = Client()
+        self.author_client.force_login(self.author)
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+
+    def comment(self, client):
+        return client.post(self.COMMENT_REVERSE, {'text': 'Комментарий'})
+
+    def test_user_and_ip_buckets(self):
+        """Пользователь и IP ограничиваются каждый своей корзиной."""
+        self.assertEqual(self.comment(self.author_client).status_code, 302)
+        self.assertEqual(self.comment(self.author_client).status_code, 302)
+        response = self.comment(self.author_client)
+        self.assertEqual(response.status_code, 429)
+        self.assertGreaterEqual(int(response['Retry-After']), 1)
+        self.assertEqual(self.comment(self.reader_client).status_code, 302)
+        self.assertEqual(self.comment(self.reader_client).status_code, 429)
+        self.assertEqual(self.post.comments.count(), 3)
+
+    def test_only_deep_pages_are_charged(self):
+        """Первые страницы ленты не ограничиваются, дальние — да."""
+        for _ in range(3):
+            self.assertEqual(
+                self.client.get(reverse('posts:index')).status_code, 200)
+        deep = reverse('posts:index') + '?page=2'
+        self.assertEqual(self.client.get(deep).status_code, 200)
+        self.assertEqual(self.client.get(deep).status_code, 429)
+
+    @override_settings(RATE_LIMIT_PROXY_HOPS=1)
+    def test_ip_taken_from_trusted_proxy(self):
+        """Адрес берётся из записи доверенного прокси, а подставленные
+        клиентом адреса левее не дают новую корзину."""
+        deep = reverse('posts:index') + '?page=2'
+        for spoofed in ('1.1.1.1', '2.2.2.2'):
+            response = self.client.get(
+                deep, HTTP_X_FORWARDED_FOR=f'{spoofed}, 10.0.0.1')
+        self.assertEqual(response.status_code, 429)
+        response = self.client.get(deep, HTTP_X_FORWARDED_FOR='10.0.0.2')
+        self.assertEqual(response.status_code, 200)
+
+    @override_settings(RATE_LIMITS={
+        'posts:profile_follow': {'user': (2, 60)},
+    })
+    def test_follow_link_is_charged(self):
+        """Подписка ставится GET-ссылкой, но жетоны всё равно тратит."""
+        url = reverse('posts:profile_follow', args=[self.author.username])
+        for _ in range(2):
+            self.assertEqual(self.reader_client.get(url).status_code, 302)
+        self.assertEqual(self.reader_client.get(url).status_code, 429)
+
+
+@override_settings(SITEMAP_CHUNK_SIZE=2)
+class SitemapTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create(username='Author')
+        cls.group = Group.objects.create(title='Группа', slug='group',
+                                         description='Описание')
+        cls.posts = [
+            Post.objects.create(author=cls.author, text=f'Пост {i}',
+                                group=cls.group)
+            for i in range(3)
+        ]
+
+    def setUp(self):
+        cache.clear()
+
+    def chunk_url(self, section, chunk):
+        return reverse('posts:sitemap', args=[section, chunk])
+
+    def test_index_lists_chunks(self):
+        """Индекс ссылается на каждую часть каждого раздела."""
+        response = self.client.get(reverse('posts:sitemap_index'))
+        self.assertEqual(response['Content-Type'], 'application/xml')
+        for section, chunk in (('posts', 0), ('posts', 1), ('groups', 0)):
+            self.assertContains(
+                response, f'http://testserver{self.chunk_url(section, chunk)}'
+            )
+        self.assertNotContains(response, self.chunk_url('posts', 2))
+        self.assertContains(
+            response,
+            f'<lastmod>{self.posts[2].pub_date.date().isoformat()}</lastmod>'
+        )
+
+    def test_chunk_is_cached_until_changed(self):
+        """Часть кешируется и сбрасывается, когда в ней меняются посты."""
+        url = self.chunk_url('posts', 1)
+        detail_url = reverse('posts:post_detail',
+                             kwargs={'post_id': self.posts[2].pk})
+        self.assertContains(self.client.get(url), detail_url)
+        with self.assertNumQueries(1):
+            self.client.get(url)
+        post = Post.objects.create(author=self.author, text='Новый пост')
+        new_url = reverse('posts:post_detail', kwargs={'post_id': post.pk})
+        response = self.client.get(url)
+        self.assertContains(response, detail_url)
+        self.assertContains(response, new_url)
+        self.assertEqual(
+            self.client.get(self.chunk_url('posts', 2)).status_code, 404)
+        self.assertEqual(
+            self.client.get(self.chunk_url('videos', 0)).status_code, 404)
+
+    def test_hidden_author_leaves_sitemap(self):
+        """Посты и дата профиля скрытого автора пропадают из карты."""
+        url = self.chunk_url('posts', 0)
+        detail_url = reverse('posts:post_detail',
+                             kwargs={'post_id': self.posts[0].pk})
+        self.assertContains(self.client.get(url), detail_url)
+        schedule_user_deletion(self.author)
+        self.assertNotContains(self.client.get(url), detail_url)
+        response = self.client.get(reverse('posts:sitemap_index'))
+        self.assertEqual(
+            re.findall(r'sitemap-(\w+)-\d+\.xml</loc><lastmod>',
+                       response.content.decode()),
+            ['groups']
+        )
+
+
+class FeedTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create(username='Author')
+        cls.other = User.objects.create(username='Other')
+        cls.group = Group.objects.create(title='Группа', slug='group',
+                                         description='Описание')
+        cls.post = Post.objects.create(author=cls.author, group=cls.group,
+                                       text='Пост <в группе>')
+        Post.objects.create(author=cls.other, text='Пост другого автора')
+
+    def setUp(self):
+        cache.clear()
+
+    def test_feeds_list_posts(self):
+        """Ленты сайта, группы и автора показывают свои посты."""
+        feeds = (
+            (reverse('posts:feed_rss'), 2, 'application/rss+xml'),
+            (reverse('posts:feed_atom'), 2, 'application/atom+xml'),
+            (reverse('posts:group_feed_rss', args=[self.group.slug]), 1,
+             'application/rss+xml'),
+            (reverse('posts:profile_feed_atom', args=[self.other.username]),
+             1, 'application/atom+xml'),
+        )
+        for url, amount, content_type in feeds:
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertTrue(response['Content-Type'].startswith(
+                    content_type))
+                self.assertEqual(
+                    response.content.count(b'<item>')
+                    + response.content.count(b'<entry>'), amount)
+        self.assertEqual(
+            self.client.get(reverse('posts:group_feed_rss',
+                                    args=['missing'])).status_code, 404)
+
+    def test_cached_feed_and_etag(self):
+        """Неизменившаяся лента отдаётся из кеша и по ETag — 304."""
+        url = reverse('posts:group_feed_rss', args=[self.group.slug])
+        response = self.client.get(url)
+        etag = response['ETag']
+        with self.assertNumQueries(0):
+            cached = self.client.get(url)
+            not_modified = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(cached.content, response.content)
+        self.assertEqual(not_modified.status_code, 304)
+        Post.objects.create(author=self.other, group=self.group,
+                            text='Новый пост в группе')
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Новый пост в группе')
+
+    def test_feed_keys_safe_for_any_username(self):
+        """Имя автора с пробелом не попадает в ключи кеша как есть."""
+        author = User.objects.create(username='Иван Ли')
+        Post.objects.create(author=author, text='Пост Ивана')
+        url = reverse('posts:profile_feed_rss', args=[author.username])
+        with warnings.catch_warnings(record=True) as caught:
+            warnings.simplefilter('always', CacheKeyWarning)
+            self.assertContains(self.client.get(url), 'Пост Ивана')
+            self.client.get(url)
+        self.assertFalse([warning for warning in caught
+                          if issubclass(warning.category, CacheKeyWarning)])
+
+
+class FollowBatchTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create(username='Reader')
+        cls.authors = [User.objects.create(username=f'author{i}')
+                       for i in range(3)]
+        Follow.objects.create(user=cls.user, author=cls.authors[0])
+
+    def setUp(self):
+        cache.clear()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def batch(self, action, usernames):
+        return self.authorized_client.post(reverse('posts:follow_batch'), {
+            'action': action,
+            'usernames': usernames,
+        })
+
+    def test_import_follows_list(self):
+        """Импорт подписывает на всех найденных авторов разом."""
+        get_following_ids(self.user)
+        response = self.authorized_client.post(
+            reverse('posts:follow_import'),
+            {'usernames': '@author0, author1\nauthor2 ghost Reader'}
+        )
+        self.assertEqual(response.context['followed'], 2)
+        self.assertEqual(response.context['unknown'], ['ghost'])
+        self.assertEqual(Follow.objects.filter(user=self.user).count(), 3)
+        self.assertEqual(get_following_ids(self.user),
+                         {author.pk for author in self.authors})
+
+    def test_import_counts_follows_from_database(self):
+        """Новые подписки считаются по базе, даже если кеш отстал, а
+        показ формы не закрепляет клиента за основной базой."""
+        url = reverse('posts:follow_import')
+        response = self.authorized_client.get(url)
+        self.assertNotIn(settings.REPLICA_PIN_COOKIE, response.cookies)
+        cache.set(following_key(self.user.pk),
+                  frozenset(author.pk for author in self.authors))
+        response = self.authorized_client.post(url,
+                                               {'usernames': 'author1'})
+        self.assertEqual(response.context['followed'], 1)
+        self.assertIn(settings.REPLICA_PIN_COOKIE, response.cookies)
+        self.assertTrue(Follow.objects.filter(
+            user=self.user, author=self.authors[1]).exists())
+
+    def test_batch_follow_and_unfollow(self):
+        """Пакетная подписка и отписка обновляют базу и кеш подписок."""
+        get_following_ids(self.user)
+        response = self.batch('follow', 'author1 author2')
+        self.assertEqual(response.json(), {
+            'action': 'follow', 'count': 2, 'unknown': []
+        })
+        response = self.batch('unfollow', 'author0 author1')
+        self.assertEqual(response.json()['count'], 2)
+        self.assertEqual(
+            list(Follow.objects.filter(user=self.user).values_list(
+                'author_id', flat=True)), [self.authors[2].pk])
+        self.assertEqual(get_following_ids(self.user), {self.authors[2].pk})
+
+    def test_batch_unfollow_purges_once(self):
+        """Пакетная отписка не шлёт post_delete на каждую подписку, но
+        сбрасывает закешированную страницу подписок."""
+        Follow.objects.create(user=self.user, author=self.authors[1])
+        deleted = []
+
+        def receiver(sender, instance, **kwargs):
+            deleted.append(instance)
+
+        post_delete.connect(receiver, sender=Follow)
+        self.addCleanup(post_delete.disconnect, receiver, sender=Follow)
+        page = reverse('posts:profile_following', args=[self.user.username])
+        self.assertContains(self.client.get(page), 'author1')
+        response = self.batch('unfollow', 'author0 author1')
+        self.assertEqual(response.json()['count'], 2)
+        self.assertEqual(deleted, [])
+        self.assertNotContains(self.client.get(page), 'author1')
+
+    @override_settings(FOLLOW_IMPORT_LIMIT=2)
+    def test_batch_rejects_long_list(self):
+        """Слишком длинный список имён отклоняется целиком."""
+        response = self.batch('follow', 'author0 author1 author2')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('usernames', response.json()['errors'])
+
+
+class ThreadedCommentsTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create(username='Author')
+        cls.post = Post.objects.create(author=cls.author, text='Пост')
+        cls.other_post = Post.objects.create(author=cls.author, text='Ещё')
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.author)
+        self.first = self.comment('Первая ветка')
+        self.reply = self.comment('Ответ', self.first)
+        self.nested = self.comment('Ответ на ответ', self.reply)
+        self.second = self.comment('Вторая ветка')
+        self.late_reply = self.comment('Поздний ответ', self.first)
+
+    def comment(self, text, parent=None):
+        return Comment.objects.create(post=self.post, author=self.author,
+                                      text=text, parent=parent)
+
+    def test_thread_order_and_depth(self):
+        response = self.client.get(
+            reverse('posts:post_detail', args=[self.post.pk]))
+        comments = list(response.context['comments'])
+        self.assertEqual(comments, [self.first, self.reply, self.nested,
+                                    self.late_reply, self.second])
+        self.assertEqual([comment.depth for comment in comments],
+                         [0, 1, 2, 1, 0])
+        self.assertContains(response, f'id="comment-{self.nested.pk}"')
+
+    @override_settings(COMMENT_THREADS_PER_PAGE=1)
+    def test_threads_paginated_by_top_level(self):
+        response = self.client.get(
+            reverse('posts:post_detail', args=[self.post.pk]),
+            {'page': 2})
+        self.assertEqual(list(response.context['comments']), [self.second])
+
+    def test_subtree_is_one_query(self):
+        with self.assertNumQueries(1):
+            self.assertEqual(list(subtree(self.first)),
+                             [self.first, self.reply, self.nested,
+                              self.late_reply])
+
+    @override_settings(COMMENT_MAX_DEPTH=1)
+    def test_deep_reply_attached_to_last_level(self):
+        reply = self.comment('Слишком глубоко', self.nested)
+        self.assertEqual(reply.parent_id, self.first.pk)
+        self.assertEqual(reply.depth, 1)
+        self.assertTrue(reply.path.startswith(self.first.path))
+
+    @override_settings(COMMENT_THREADS_PER_PAGE=1)
+    def test_deleting_comment_keeps_replies(self):
+        """Удаление комментария оставляет ответы на своих местах в ветке
+        под заглушкой."""
+        self.first.delete()
+        response = self.client.get(
+            reverse('posts:post_detail', args=[self.post.pk]))
+        comments = list(response.context['comments'])
+        self.assertEqual(comments, [self.reply, self.nested,
+                                    self.late_reply])
+        self.assertIsNone(comments[0].parent_id)
+        self.assertEqual(comments[1].parent_id, self.reply.pk)
+        self.assertEqual([comment.tombstone for comment in comments],
+                         [True, False, False])
+        self.assertContains(response, 'Комментарий удалён', count=1)
+
+    def test_reply_view(self):
+        url = reverse('posts:comment_reply',
+                      args=[self.post.pk, self.reply.pk])
+        response = self.client.get(url)
+        self.assertEqual(list(response.context['comments']),
+                         [self.reply, self.nested])
+        response = self.client.post(url, {'text': 'Новый ответ'})
+        reply = Comment.objects.get(text='Новый ответ')
+        self.assertRedirects(
+            response,
+            reverse('posts:post_detail', args=[self.post.pk])
+            + f'#comment-{reply.pk}',
+            fetch_redirect_response=False
+        )
+        self.assertEqual(list(subtree(self.reply)),
+                         [self.reply, self.nested, reply])
+        response = self.client.get(
+            reverse('posts:comment_reply',
+                    args=[self.other_post.pk, self.reply.pk]))
+        self.assertEqual(response.status_code, 404)
+
+
+@override_settings(REACTION_SHARDS=2)
+class ReactionTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create(username='Author')
+        cls.readers = [User.objects.create(username=f'Reader {number}')
+                       for number in range(3)]
+        Post.objects.bulk_create(
+            Post(author=cls.author, text=f'Пост {number}')
+            for number in range(settings.POSTS_AMOUNT)
+        )
+        cls.post = Post.objects.order_by('pk').last()
+
+    def setUp(self):
+        cache.clear()
+
+    def like(self, user, url_name='posts:post_like'):
+        self.client.force_login(user)
+        return self.client.post(reverse(url_name, args=[self.post.pk]),
+                                {'next': reverse('posts:index')})
+
+    def test_like_and_unlike(self):
+        for reader in self.readers:
+            self.assertRedirects(self.like(reader), reverse('posts:index'))
+        self.like(self.readers[0])
+        self.assertEqual(reaction_totals([self.post.pk]),
+                         {self.post.pk: 3})
+        self.assertEqual(self.post.reaction_counters.count(), 2)
+        self.like(self.readers[1], 'posts:post_unlike')
+        self.like(self.readers[1], 'posts:post_unlike')
+        self.assertEqual(reaction_totals([self.post.pk]),
+                         {self.post.pk: 2})
+        remove_user_reactions(self.readers[0].pk)
+        self.assertEqual(reaction_totals([self.post.pk]),
+                         {self.post.pk: 1})
+        self.assertEqual(Reaction.objects.count(), 1)
+
+    def test_foreign_next_ignored(self):
+        self.client.force_login(self.readers[0])
+        response = self.client.post(
+            reverse('posts:post_like', args=[self.post.pk]),
+            {'next': 'https://example.com/'})
+        self.assertRedirects(
+            response, reverse('posts:post_detail', args=[self.post.pk]))
+
+    def test_feed_loads_reactions_in_one_batch(self):
+        """Лайки всех карточек ленты — один запрос на итоги и один на
+        отметки пользователя, и для общей страницы из кеша тоже."""
+        self.like(self.readers[0])
+        self.client.logout()
+        cache.clear()
+        for client, counters, marks in ((self.client, 1, 0),
+                                        (self.client, 0, 0),
+                                        (self.reader_client(), 0, 1)):
+            with CaptureQueriesContext(connection) as queries:
+                response = client.get(reverse('posts:index'))
+            sql = [query['sql'] for query in queries]
+            self.assertEqual(
+                sum('"posts_reactioncounter"' in query for query in sql),
+                counters)
+            self.assertEqual(
+                sum('FROM "posts_reaction" ' in query for query in sql),
+                marks)
+        self.assertContains(response, 'Нравится: 1')
+        self.assertContains(response, 'Убрать', count=1)
+
+    @override_settings(RATE_LIMITS={'posts:post_like': {'user': (1, 60)}})
+    def test_like_rate_limited(self):
+        self.like(self.readers[0])
+        self.assertEqual(self.like(self.readers[0]).status_code, 429)
+
+    def test_like_requires_post_with_csrf(self):
+        """Лайк ставится только POST-запросом с CSRF-токеном из формы."""
+        client = Client(enforce_csrf_checks=True)
+        client.force_login(self.readers[0])
+        url = reverse('posts:post_like', args=[self.post.pk])
+        self.assertEqual(client.get(url).status_code, 405)
+        response = client.post(url)
+        self.assertTemplateUsed(response, 'core/403csrf.html')
+        self.assertFalse(Reaction.objects.exists())
+        response = client.get(reverse('posts:post_detail',
+                                      args=[self.post.pk]))
+        token = re.search(r'name="csrfmiddlewaretoken" value="([^"]+)"',
+                          response.content.decode()).group(1)
+        client.post(url, {'csrfmiddlewaretoken': token})
+        self.assertTrue(Reaction.objects.filter(post=self.post).exists())
+
+    def reader_client(self):
+        client = Client()
+        client.force_login(self.readers[0])
+        return client
@@ -0,0 +1,98 @@
+import functools
+
+from django.conf import settings
+from django.core.files.uploadhandler import (StopUpload,
+                                             TemporaryFileUploadHandler)
+from django.template.defaultfilters import filesizeformat
+from django.views.decorators.csrf import csrf_exempt, csrf_protect
+from PIL import ImageFile
+
+
+class ImageUploadHandler(TemporaryFileUploadHandler):
+    """Пишет загрузку во временный файл и проверяет картинку на лету.
+
+    Формат и размеры в пикселях берутся из заголовка картинки, как
+    только он пришёл, обычно из первого куска. Слишком большое тело
+    запроса, не картинка, чужой формат или огромные размеры прерывают
+    разбор запроса сразу: остаток тела не читается и не ложится на диск.
+    Поля формы до файла, в том числе CSRF-токен, при этом остаются
+    в POST. Причина отказа остаётся в request.upload_error.
+    """
+
+    def __init__(self, request=None, field_name='image'):
+        super().__init__(request)
+        self.image_field = field_name
+        self.parser = None
+        self.oversized = False
+
+    def handle_raw_input(self, input_data, META, content_length, boundary,
+                         encoding=None):
+        limit = (settings.POST_IMAGE_MAX_SIZE
+                 + (settings.DATA_UPLOAD_MAX_MEMORY_SIZE or 0))
+        # Текстовые поля ограничены DATA_UPLOAD_MAX_MEMORY_SIZE, поэтому
+        # их можно дочитать, а разбор прервётся на первом же файле.
+        self.oversized = content_length > limit
+
+    def new_file(self, field_name, *args, **kwargs):
+        if self.oversized:
+            self.reject(self.too_large())
+        super().new_file(field_name, *args, **kwargs)
+        self.received = 0
+        self.parser = (ImageFile.Parser() if field_name == self.image_field
+                       else None)
+
+    def receive_data_chunk(self, raw_data, start):
+        if self.field_name == self.image_field:
+            self.received += len(raw_data)
+            if self.received > settings.POST_IMAGE_MAX_SIZE:
+                self.reject(self.too_large())
+            if self.parser is not None:
+                self.sniff(raw_data)
+        return super().receive_data_chunk(raw_data, start)
+
+    def sniff(self, data):
+        try:
+            self.parser.feed(data)
+        except Exception:
+            self.reject('Файл не является изображением')
+        image = self.parser.image
+        if image is None:
+            if self.received > settings.POST_IMAGE_HEADER_LIMIT:
+                self.reject('Файл не является изображением')
+            return
+        # Остальное проверит ImageField, когда файл придёт целиком.
+        self.parser = None
+        if image.format not in settings.POST_IMAGE_FORMATS:
+            self.reject('Поддерживаются только '
+                        + ', '.join(settings.POST_IMAGE_FORMATS))
+        width, height = image.size
+        if (max(width, height) > settings.POST_IMAGE_MAX_SIDE
+                or width * height > settings.POST_IMAGE_MAX_PIXELS):
+            self.reject(f'Изображение {width}×{height} слишком велико')
+
+    def reject(self, message):
+        self.request.upload_error = message
+        raise StopUpload(connection_reset=True)
+
+    @staticmethod
+    def too_large():
+        return (f'Файл больше '
+                f'{filesizeformat(settings.POST_IMAGE_MAX_SIZE)}')
+
+
+def stream_image_uploads(view):
+    """Подключает ImageUploadHandler к представлению.
+
+    Обработчики загрузки меняются до первого обращения к request.POST,
+    а его делает CsrfViewMiddleware, поэтому CSRF проверяется уже
+    внутри обёртки. Токен идёт в форме раньше файла и доходит до
+    проверки, даже если загрузка прервана.
+    """
+    protected = csrf_protect(view)
+
+    @csrf_exempt
+    @functools.wraps(view)
+    def wrapper(request, *args, **kwargs):
+        request.upload_handlers = [ImageUploadHandler(request)]
+        return protected(request, *args, **kwargs)
+    return wrapper
@@ -1,21 +1,77 @@
 from django.urls import path
 
-from posts import views
+from posts import feeds, views
 
 
 app_name = 'posts'
 
 urlpatterns = [
     path('', views.index, name='index'),
+    path('group/', views.group_index, name='group_index'),
     path('group/<slug:slug>/', views.group_posts, name='group_list'),
     path('profile/<str:username>/', views.profile, name='profile'),
+    path(
+        'profile/<str:username>/followers/',
+        views.profile_followers,
+        name='profile_followers'
+    ),
+    path(
+        'profile/<str:username>/following/',
+        views.profile_following,
+        name='profile_following'
+    ),
     path('posts/<int:post_id>/', views.post_detail, name='post_detail'),
+    path('posts/new/', views.new_posts, name='new_posts'),
+    path(
+        'feed/rss/',
+        feeds.cached_feed(feeds.SiteFeed(), 'site'),
+        name='feed_rss'
+    ),
+    path(
+        'feed/atom/',
+        feeds.cached_feed(feeds.SiteAtomFeed(), 'site'),
+        name='feed_atom'
+    ),
+    path(
+        'group/<slug:slug>/feed/rss/',
+        feeds.cached_feed(feeds.GroupFeed(), 'group'),
+        name='group_feed_rss'
+    ),
+    path(
+        'group/<slug:slug>/feed/atom/',
+        feeds.cached_feed(feeds.GroupAtomFeed(), 'group'),
+        name='group_feed_atom'
+    ),
+    path(
+        'profile/<str:username>/feed/rss/',
+        feeds.cached_feed(feeds.AuthorFeed(), 'author'),
+        name='profile_feed_rss'
+    ),
+    path(
+        'profile/<str:username>/feed/atom/',
+        feeds.cached_feed(feeds.AuthorAtomFeed(), 'author'),
+        name='profile_feed_atom'
+    ),
+    path('sitemap.xml', views.sitemap_index, name='sitemap_index'),
+    path(
+        'sitemap-<slug:section>-<int:chunk>.xml',
+        views.sitemap,
+        name='sitemap'
+    ),
     path('create/', views.post_create, name='post_create'),
     path('posts/<int:post_id>/edit/', views.post_edit, name='post_edit'),
     path('posts/<int:post_id>/comment/',
          views.add_comment,
          name='add_comment'),
+    path('posts/<int:post_id>/like/', views.post_like, name='post_like'),
+    path('posts/<int:post_id>/unlike/', views.post_unlike,
+         name='post_unlike'),
+    path('posts/<int:post_id>/comment/<int:comment_id>/reply/',
+         views.comment_reply,
+         name='comment_reply'),
     path('follow/', views.follow_index, name='follow_index'),
+    path('follow/import/', views.follow_import, name='follow_import'),
+    path('follow/batch/', views.follow_batch, name='follow_batch'),
     path(
         'profile/<str:username>/follow/',
         views.profile_follow,
@@ -1,9 +1,32 @@
+from collections import namedtuple
+
 from django.conf import settings
 from django.core.paginator import Paginator
 
+KeysetPage = namedtuple('KeysetPage', ('object_list', 'next_cursor'))
+
 
 def paginator(request, post_list):
     paginator = Paginator(post_list, settings.POSTS_AMOUNT)
     page_number = request.GET.get('page')
     page_obj = paginator.get_page(page_number)
     return page_obj
+
+
+def keyset_paginator(request, queryset, per_page=settings.POSTS_AMOUNT):
+    """Страница записей по курсору ?before=<id>, от новых к старым.
+
+    В отличие от paginator не считает общее число записей и не делает
+    OFFSET, поэтому любая страница стоит одного индексного запроса.
+    """
+    before = request.GET.get('before', '')
+    if before.isdigit():
+        queryset = queryset.filter(pk__lt=int(before))
+    items = list(queryset.order_by('-pk')[:per_page + 1])
+    next_cursor = items[per_page - 1].pk if len(items) > per_page else None
+    return KeysetPage(items[:per_page], next_cursor)
+
+
+def post_surrogate_keys(posts):
+    """Ключи сброса кеша для постов, показанных на странице."""
+    return [f'post:{post.pk}' for post in posts]
@@ -1,57 +1,155 @@
 from django.contrib.auth.decorators import login_required
+from django.db.models import F
+from django.http import (Http404, HttpResponse, HttpResponseBadRequest,
+                         JsonResponse)
 from django.shortcuts import get_object_or_404, redirect, render
+from django.urls import reverse
+from django.utils.http import is_safe_url
+from django.views.decorators.http import require_POST
 
-from posts.forms import PostForm, CommentForm
-from posts.models import Group, Post, Follow
-from posts.utils import paginator
+from core.db import retry_on_locked
+from core.page_cache import add_surrogate_keys, cache_shared_page
+from posts import sitemaps
+from posts.comments import subtree, thread_page, with_tombstones
+from posts.follows import (follow_authors, following_filter,
+                           get_following_ids, unfollow_authors)
+from posts.forms import (CommentForm, FollowBatchForm, FollowImportForm,
+                         PostForm)
+from posts.models import Comment, Group, GroupStats, Post, Follow
+from posts.poll import new_posts_tracker
+from posts.reactions import react, unreact
+from posts.uploads import stream_image_uploads
+from posts.utils import keyset_paginator, paginator, post_surrogate_keys
 from users.forms import User
 
 
+@cache_shared_page
 def index(request):
-    post_list = Post.objects.order_by('pub_date').select_related(
-        'group', 'author'
-    )
+    post_list = Post.objects.filter(author__is_active=True).order_by(
+        'pub_date'
+    ).select_related('group', 'author')
     page_obj = paginator(request, post_list)
+    add_surrogate_keys(request, 'posts', *post_surrogate_keys(page_obj))
     return render(request, 'posts/index.html', {'page_obj': page_obj})
 
 
+@cache_shared_page
+def group_index(request):
+    groups = GroupStats.objects.filter(
+        group__deleted=False
+    ).select_related('group').order_by(
+        F('last_post_date').desc(nulls_last=True), 'group__title'
+    )
+    add_surrogate_keys(request, 'groups')
+    return render(request, 'posts/group_index.html', {'groups': groups})
+
+
+@cache_shared_page
 def group_posts(request, slug):
     group = get_object_or_404(Group, slug=slug)
-    post_list = group.posts.select_related('author')
+    post_list = group.posts.filter(
+        author__is_active=True).select_related('author')
     page_obj = paginator(request, post_list)
+    add_surrogate_keys(request, f'group:{group.pk}',
+                       *post_surrogate_keys(page_obj))
     return render(request, 'posts/group_list.html', {
         'group': group,
         'page_obj': page_obj
     })
 
 
+@cache_shared_page
 def profile(request, username):
-    author = get_object_or_404(User, username=username)
-    post_list = author.posts.select_related('group')
+    author = get_object_or_404(User, username=username, is_active=True)
+    post_list = author.posts.select_related('group', 'author')
     page_obj = paginator(request, post_list)
-    following = (request.user.is_authenticated
-                 and request.user != author
-                 and Follow.objects.filter(user=request.user,
-                                           author=author).exists())
+    add_surrogate_keys(request, f'author:{author.pk}',
+                       *post_surrogate_keys(page_obj))
     return render(request, 'posts/profile.html', {
         'page_obj': page_obj,
-        'following': following,
         'author': author
     })
 
 
+@cache_shared_page
+def profile_followers(request, username):
+    author = get_object_or_404(User, username=username, is_active=True)
+    page = keyset_paginator(
+        request, author.following.select_related('user')
+    )
+    add_surrogate_keys(request, f'followers:{author.pk}')
+    return render(request, 'posts/follow_list.html', {
+        'author': author,
+        'page': page,
+        'users': [follow.user for follow in page.object_list],
+        'is_followers': True
+    })
+
+
+@cache_shared_page
+def profile_following(request, username):
+    author = get_object_or_404(User, username=username, is_active=True)
+    page = keyset_paginator(
+        request, author.follower.select_related('author')
+    )
+    add_surrogate_keys(request, f'following:{author.pk}')
+    return render(request, 'posts/follow_list.html', {
+        'author': author,
+        'page': page,
+        'users': [follow.author for follow in page.object_list]
+    })
+
+
+@cache_shared_page
 def post_detail(request, post_id):
-    post = get_object_or_404(Post, pk=post_id)
+    post = get_object_or_404(Post, pk=post_id, author__is_active=True)
+    add_surrogate_keys(request, f'post:{post.pk}', f'author:{post.author_id}')
+    if post.group_id:
+        add_surrogate_keys(request, f'group:{post.group_id}')
     form = CommentForm()
-    comments = post.comments.all()
+    comments = thread_page(request, post)
     return render(request,
                   'posts/post_detail.html',
                   {'post': post, 'form': form, 'comments': comments})
 
 
+def new_posts(request):
+    """Сколько появилось постов новее курсора since.
+
+    Без since возвращает только текущий курсор latest. Параметр group
+    ограничивает подсчёт группой, feed=follow — подписками пользователя.
+    """
+    try:
+        since = int(request.GET['since'])
+    except KeyError:
+        since = None
+    except ValueError:
+        return HttpResponseBadRequest()
+    authors = None
+    if request.GET.get('feed') == 'follow':
+        authors = get_following_ids(request.user)
+    count = 0
+    if since is None:
+        new_posts_tracker.sync()
+    else:
+        count = new_posts_tracker.count(
+            since, group=request.GET.get('group'), authors=authors
+        )
+    return JsonResponse({
+        'count': count,
+        'latest': new_posts_tracker.high_water
+    })
+
+
 @login_required
+@stream_image_uploads
+@retry_on_locked
 def post_create(request):
-    form = PostForm(request.POST or None, files=request.FILES or None)
+    # Прерванная загрузка оставляет POST пустым, а форма всё равно
+    # должна показать ошибку.
+    data = request.POST if request.method == 'POST' else None
+    form = PostForm(data, files=request.FILES or None,
+                    upload_error=getattr(request, 'upload_error', None))
     if request.method == 'POST' and form.is_valid():
         post = form.save(commit=False)
         post.author = request.user
@@ -61,14 +159,17 @@ def post_create(request):
 
 
 @login_required
+@stream_image_uploads
+@retry_on_locked
 def post_edit(request, post_id):
     post = get_object_or_404(Post, id=post_id)
     if post_id and request.user != post.author:
         return redirect("posts:profile", post_id=post_id)
     form = PostForm(
-        request.POST or None,
+        request.POST if request.method == 'POST' else None,
         files=request.FILES or None,
-        instance=post
+        instance=post,
+        upload_error=getattr(request, 'upload_error', None)
     )
     if form.is_valid():
         form.save()
@@ -80,8 +181,9 @@ def post_edit(request, post_id):
 
 
 @login_required
+@retry_on_locked
 def add_comment(request, post_id):
-    post = get_object_or_404(Post, id=post_id)
+    post = get_object_or_404(Post, id=post_id, author__is_active=True)
     form = CommentForm(request.POST or None)
     if form.is_valid():
         comment = form.save(commit=False)
@@ -91,26 +193,139 @@ def add_comment(request, post_id):
     return redirect('posts:post_detail', post_id=post_id)
 
 
+@login_required
+@retry_on_locked
+def comment_reply(request, post_id, comment_id):
+    parent = get_object_or_404(
+        Comment.objects.select_related('post', 'author'),
+        pk=comment_id,
+        post=post_id,
+        post__author__is_active=True
+    )
+    form = CommentForm(request.POST or None)
+    if form.is_valid():
+        comment = form.save(commit=False)
+        comment.author = request.user
+        comment.post = parent.post
+        comment.parent = parent
+        comment.save()
+        return redirect(reverse('posts:post_detail', args=[post_id])
+                        + f'#comment-{comment.pk}')
+    return render(request, 'posts/comment_reply.html', {
+        'post': parent.post,
+        'parent': parent,
+        'comments': with_tombstones(subtree(parent)),
+        'form': form
+    })
+
+
 @login_required
 def follow_index(request):
-    following = Follow.objects.filter(user=request.user).values('author')
     posts_list = Post.objects.filter(
-        author__in=following).select_related('group', 'author')
+        author__is_active=True, **following_filter(request.user)
+    ).select_related('group', 'author')
     page_obj = paginator(request, posts_list)
     return render(request, 'posts/follow.html', {'page_obj': page_obj})
 
 
 @login_required
+@retry_on_locked
 def profile_follow(request, username):
-    author = get_object_or_404(User, username=username)
+    author = get_object_or_404(User, username=username, is_active=True)
     if request.user != author:
         Follow.objects.get_or_create(user=request.user, author=author)
     return redirect('posts:profile', author)
 
 
 @login_required
+@retry_on_locked
 def profile_unfollow(request, username):
-    author = get_object_or_404(User, username=username)
+    author = get_object_or_404(User, username=username, is_active=True)
     following = Follow.objects.filter(user=request.user, author=author)
     following.delete()
     return redirect('posts:profile', author)
+
+
+@login_required
+def follow_import(request):
+    """Форма импорта подписок; пишет в базу только POST."""
+    if request.method != 'POST':
+        return render(request, 'posts/follow_import.html',
+                      {'form': FollowImportForm()})
+    # Показ формы не закрепляет клиента за основной базой, запись — да.
+    request.pin_to_primary = True
+    return import_follows(request)
+
+
+@retry_on_locked
+def import_follows(request):
+    form = FollowImportForm(request.POST)
+    context = {'form': form}
+    if form.is_valid():
+        context['followed'], context['unknown'] = follow_authors(
+            request.user, form.cleaned_data['usernames'])
+    return render(request, 'posts/follow_import.html', context)
+
+
+@login_required
+@require_POST
+@retry_on_locked
+def follow_batch(request):
+    """Подписка на список авторов или отписка от него одним запросом."""
+    form = FollowBatchForm(request.POST)
+    if not form.is_valid():
+        return JsonResponse({'errors': form.errors}, status=400)
+    batch = (follow_authors if form.cleaned_data['action'] == 'follow'
+             else unfollow_authors)
+    count, unknown = batch(request.user, form.cleaned_data['usernames'])
+    return JsonResponse({
+        'action': form.cleaned_data['action'],
+        'count': count,
+        'unknown': unknown
+    })
+
+
+def reaction_redirect(request, post_id):
+    """Обратно на страницу, где нажали кнопку, если адрес свой."""
+    next_url = request.POST.get('next')
+    if is_safe_url(next_url, allowed_hosts={request.get_host()},
+                   require_https=request.is_secure()):
+        return redirect(next_url)
+    return redirect('posts:post_detail', post_id=post_id)
+
+
+@login_required
+@require_POST
+@retry_on_locked
+def post_like(request, post_id):
+    post = get_object_or_404(Post, pk=post_id, author__is_active=True)
+    react(request.user, post.pk)
+    return reaction_redirect(request, post.pk)
+
+
+@login_required
+@require_POST
+@retry_on_locked
+def post_unlike(request, post_id):
+    post = get_object_or_404(Post, pk=post_id, author__is_active=True)
+    unreact(request.user, post.pk)
+    return reaction_redirect(request, post.pk)
+
+
+def sitemap_index(request):
+    base_url = f'{request.scheme}://{request.get_host()}'
+    content = sitemaps.render_index(
+        base_url,
+        lambda section, chunk: reverse('posts:sitemap',
+                                       args=[section, chunk])
+    )
+    return HttpResponse(content, content_type='application/xml')
+
+
+def sitemap(request, section, chunk):
+    if (section not in sitemaps.SECTIONS
+            or chunk >= sitemaps.chunk_count(section)):
+        raise Http404
+    base_url = f'{request.scheme}://{request.get_host()}'
+    return HttpResponse(sitemaps.get_chunk(section, chunk, base_url),
+                        content_type='application/xml')
@@ -56,6 +56,9 @@ MIDDLEWARE = [
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'core.middleware.ProfilingMiddleware',
+    'core.middleware.RateLimitMiddleware',
+    'core.middleware.ReplicaMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -92,6 +95,76 @@ DATABASES = {
     }
 }
 
+# SQLite под конкурентной нагрузкой: PRAGMA-настройки соединения
+# и повтор пишущих транзакций при блокировке базы
+
+SQLITE_BUSY_TIMEOUT = 5000
+SQLITE_CACHE_SIZE = -20000
+DB_WRITE_RETRIES = 5
+DB_WRITE_BACKOFF = 0.05
+
+# Реплики для чтения ленты. Псевдонимы из DATABASES; пустой список —
+# все запросы идут в основную базу.
+
+DATABASE_ROUTERS = ['core.routers.ReplicaRouter']
+DATABASE_REPLICAS = []
+REPLICA_READ_VIEWS = (
+    'posts:index',
+    'posts:group_index',
+    'posts:group_list',
+    'posts:profile',
+    'posts:profile_followers',
+    'posts:profile_following',
+    'posts:post_detail',
+    'posts:follow_index',
+    'posts:sitemap_index',
+    'posts:sitemap',
+)
+REPLICA_WRITE_VIEWS = (
+    'posts:post_create',
+    'posts:post_edit',
+    'posts:add_comment',
+    'posts:comment_reply',
+    'posts:post_like',
+    'posts:post_unlike',
+    'posts:profile_follow',
+    'posts:profile_unfollow',
+    'posts:follow_batch',
+)
+REPLICA_PIN_COOKIE = 'primary_db'
+REPLICA_PIN_SECONDS = 10
+
+# Ограничение частоты запросов: для представления — ёмкость корзины
+# жетонов и время её полного наполнения в секундах, отдельно для
+# пользователя и для IP. GET-запросы расходуют жетоны, только если
+# просят страницу дальше RATE_LIMIT_FREE_PAGES или сами пишут
+# (RATE_LIMIT_GET_WRITES: подписка ставится ссылкой).
+
+RATE_LIMITS = {
+    'posts:post_create': {'user': (10, 60), 'ip': (30, 60)},
+    'posts:post_edit': {'user': (30, 60), 'ip': (60, 60)},
+    'posts:add_comment': {'user': (20, 60), 'ip': (60, 60)},
+    'posts:comment_reply': {'user': (20, 60), 'ip': (60, 60)},
+    'posts:post_like': {'user': (60, 60), 'ip': (120, 60)},
+    'posts:post_unlike': {'user': (60, 60), 'ip': (120, 60)},
+    'posts:profile_follow': {'user': (30, 60), 'ip': (60, 60)},
+    'posts:profile_unfollow': {'user': (30, 60), 'ip': (60, 60)},
+    'posts:follow_import': {'user': (5, 60), 'ip': (20, 60)},
+    'posts:follow_batch': {'user': (10, 60), 'ip': (30, 60)},
+    'posts:index': {'user': (30, 60), 'ip': (60, 60)},
+    'posts:group_list': {'user': (30, 60), 'ip': (60, 60)},
+    'posts:profile': {'user': (30, 60), 'ip': (60, 60)},
+    'posts:follow_index': {'user': (30, 60), 'ip': (60, 60)},
+}
+RATE_LIMIT_GET_WRITES = (
+    'posts:profile_follow',
+    'posts:profile_unfollow',
+)
+RATE_LIMIT_FREE_PAGES = 5
+# Сколько доверенных прокси стоит перед сайтом; 0 — адрес берётся из
+# REMOTE_ADDR, а X-Forwarded-For не читается.
+RATE_LIMIT_PROXY_HOPS = 0
+
 
 # Password validation
 # https://docs.djangoproject.com/en/2.2/ref/settings/#auth-password-validators
@@ -137,10 +210,73 @@ MEDIA_URL = '/media/'
 
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Отдача медиафайлов (core.media): None — приложением через sendfile,
+# 'x-accel-redirect' — nginx из internal-локации MEDIA_ACCEL_PREFIX,
+# 'x-sendfile' — Apache mod_xsendfile
+
+MEDIA_SENDFILE = None
+MEDIA_ACCEL_PREFIX = '/protected-media/'
+MEDIA_CACHE_MAX_AGE = 60 * 60 * 24
+# Миниатюры sorl (THUMBNAIL_PREFIX) названы хешем и не меняются
+MEDIA_IMMUTABLE_PREFIXES = ('cache/',)
+
+# Картинки постов проверяются прямо во время загрузки (posts.uploads)
+
+POST_IMAGE_MAX_SIZE = 5 * 1024 * 1024
+POST_IMAGE_MAX_SIDE = 6000
+POST_IMAGE_MAX_PIXELS = 24 * 1000 * 1000
+POST_IMAGE_FORMATS = ('JPEG', 'PNG', 'GIF', 'WEBP')
+POST_IMAGE_HEADER_LIMIT = 256 * 1024
+
+# Статический экспорт анонимных страниц (команда export_static)
+
+STATIC_EXPORT_ROOT = os.path.join(BASE_DIR, 'static_export')
+
+# Профилирование запросов: сотрудник добавляет к адресу ?_profile,
+# а PROFILE_SAMPLE_RATE задаёт долю случайно профилируемых запросов.
+# Результаты смотрятся на странице core:profile_list.
+
+PROFILE_DIR = os.path.join(BASE_DIR, 'profiles')
+PROFILE_TRIGGER_PARAM = '_profile'
+PROFILE_SAMPLE_RATE = 0
+PROFILE_TOP_FUNCTIONS = 40
+PROFILE_TOP_ALLOCATIONS = 20
+PROFILE_LIST_LIMIT = 100
+
+# Журнал запросов к базе дольше порога (None — выключен); сводка по
+# всем процессам — команда slow_queries.
+
+SLOW_QUERY_THRESHOLD_MS = 100
+SLOW_QUERY_LOG_DIR = os.path.join(BASE_DIR, 'slow_queries')
+SLOW_QUERY_LOG_SIZE = 1000
+
 # Сonstants
 
 POSTS_AMOUNT = 10
 TEXT_LENGTH = 15
+COMMENT_THREADS_PER_PAGE = 20
+COMMENT_MAX_DEPTH = 6
+REACTION_SHARDS = 8
+REACTION_CACHE_TIMEOUT = 60 * 5
+POST_PREVIEW_LENGTH = 500
+FOLLOW_CACHE_TIMEOUT = 60 * 60
+FOLLOW_IN_LIMIT = 500
+FOLLOW_IMPORT_LIMIT = 500
+RECOMMENDATIONS_AMOUNT = 5
+RECOMMENDATIONS_DAYS = 30
+NEW_POSTS_BUFFER = 1000
+BULK_CHUNK_SIZE = 1000
+DELETION_PAUSE = 0.05
+SITEMAP_CHUNK_SIZE = 50000
+SITEMAP_CACHE_TIMEOUT = 60 * 60 * 24
+FEED_POSTS_AMOUNT = 20
+FEED_TITLE_LENGTH = 60
+FEED_CACHE_TIMEOUT = 60 * 60 * 24
+ADMIN_COUNT_ESTIMATE_THRESHOLD = 100000
+
+# Карточки ленты: 'compiled' — сборка HTML в Python, 'template' — шаблоном
+
+FEED_CARD_RENDERER = 'compiled'
 
 # Redirects
 
@@ -156,8 +292,31 @@ CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
 
 # Settings for cache
 
+# Кеш общий для всех процессов сайта: сброс страниц, лент и подписок
+# после записи и корзины ограничения частоты должны быть видны каждому
+# воркеру gunicorn. Файловый кеш не требует отдельного сервера; на
+# нескольких машинах его нужно заменить на memcached.
+
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.path.join(BASE_DIR, 'cache'),
+        'OPTIONS': {
+            'MAX_ENTRIES': 10000,
+        },
     }
 }
+
+TEST_RUNNER = 'core.test_runner.TestRunner'
+
+# Страницы для анонимов сбрасываются по ключам, поэтому живут долго
+
+PAGE_CACHE_TIMEOUT = 60 * 60 * 24
+
+# Прогрев кеша после деплоя по статистике посещений (core.warmup)
+
+WARMUP_PAGES = 50
+WARMUP_DAYS = 7
+WARMUP_CONCURRENCY = 4
+WARMUP_FLUSH_HITS = 100
+WARMUP_FLUSH_SECONDS = 60